@@ -49,6 +49,7 @@ from __future__ import print_function
 import tensorflow as tf
 
 from astronet.astro_model import astro_model
+from tf_util import compute_util
 
 
 class AstroCNNModel(astro_model.AstroModel):
@@ -69,17 +70,21 @@ class AstroCNNModel(astro_model.AstroModel):
       scope: Prefix for operation names.
 
     Returns:
-      A Tensor of shape [batch_size, output_size], where the output size depends
-      on the input size, kernel size, number of filters, number of layers,
-      convolution padding type and pooling.
+      A float32 Tensor of shape [batch_size, output_size], where the output size
+      depends on the input size, kernel size, number of filters, number of
+      layers, convolution padding type and pooling.
     """
-    with tf.name_scope(scope):
+    # The convolutional layers may be compiled with XLA and computed in a
+    # low-precision dtype, depending on self.hparams.
+    dtype = compute_util.layer_dtype(self.hparams)
+    with tf.name_scope(scope), compute_util.jit_scope(self.hparams):
       net = inputs
       if net.shape.rank == 2:
         net = tf.expand_dims(net, -1)  # [batch, length] -> [batch, length, 1]
       if net.shape.rank != 3:
         raise ValueError(
             "Expected inputs to have rank 2 or 3. Got: {}".format(inputs))
+      net = compute_util.cast_to_compute_dtype(net, self.hparams)
       for i in range(hparams.cnn_num_blocks):
         num_filters = int(hparams.cnn_initial_num_filters *
                           hparams.cnn_block_filter_factor**i)
@@ -90,6 +95,7 @@ class AstroCNNModel(astro_model.AstroModel):
                 kernel_size=int(hparams.cnn_kernel_size),
                 padding=hparams.convolution_padding,
                 activation=tf.nn.relu,
+                dtype=dtype,
                 name="conv_{}".format(j + 1))
             net = conv_op(net)
 
@@ -97,6 +103,7 @@ class AstroCNNModel(astro_model.AstroModel):
             pool_op = tf.keras.layers.MaxPool1D(
                 pool_size=int(hparams.pool_size),
                 strides=int(hparams.pool_strides),
+                dtype=dtype,
                 name="pool")
             net = pool_op(net)
 
@@ -105,6 +112,7 @@ class AstroCNNModel(astro_model.AstroModel):
       net_shape = net.shape.as_list()
       output_dim = net_shape[1] * net_shape[2]
       net = tf.reshape(net, [-1, output_dim], name="flatten")
+      net = tf.cast(net, tf.float32)
 
     return net
 
@@ -219,6 +219,69 @@ class AstroCNNModelTest(tf.test.TestCase):
       predictions = sess.run(model.predictions, feed_dict=feed_dict)
       self.assertShapeEquals((16, 1), predictions)
 
+  def testMixedPrecision(self):
+    # Build config.
+    feature_spec = {
+        "time_feature_1": {
+            "length": 20,
+            "is_time_series": True,
+        }
+    }
+    hidden_spec = {
+        "time_feature_1": {
+            "cnn_num_blocks": 2,
+            "cnn_block_size": 2,
+            "cnn_initial_num_filters": 4,
+            "cnn_block_filter_factor": 1.5,
+            "cnn_kernel_size": 3,
+            "convolution_padding": "same",
+            "pool_size": 2,
+            "pool_strides": 2,
+        }
+    }
+    config = configurations.base()
+    config["inputs"]["features"] = feature_spec
+    config["hparams"]["time_series_hidden"] = hidden_spec
+    config["hparams"]["num_pre_logits_hidden_layers"] = 1
+    config["hparams"]["pre_logits_hidden_layer_size"] = 8
+    config["hparams"]["compute_dtype"] = "float16"
+    config = configdict.ConfigDict(config)
+
+    # Build model.
+    features = input_ops.build_feature_placeholders(config.inputs.features)
+    labels = input_ops.build_labels_placeholder()
+    model = astro_cnn_model.AstroCNNModel(features, labels, config.hparams,
+                                          tf.estimator.ModeKeys.TRAIN)
+    model.build()
+
+    # Variables are kept in float32.
+    for v in tf.trainable_variables():
+      self.assertEqual(tf.float32, v.dtype.base_dtype, v.op.name)
+
+    # The convolutions are computed in float16, but the hidden layer outputs,
+    # logits and losses are float32.
+    graph = tf.get_default_graph()
+    conv = graph.get_tensor_by_name(
+        "time_feature_1_hidden/block_1/conv_1/Relu:0")
+    self.assertEqual(tf.float16, conv.dtype)
+    self.assertEqual(tf.float32,
+                     model.time_series_hidden_layers["time_feature_1"].dtype)
+    self.assertEqual(tf.float32, model.logits.dtype)
+    self.assertEqual(tf.float32, model.total_loss.dtype)
+
+    # Execute the TensorFlow graph.
+    scaffold = tf.train.Scaffold()
+    scaffold.finalize()
+    with self.session() as sess:
+      sess.run([scaffold.init_op, scaffold.local_init_op])
+
+      # Fetch predictions.
+      features = testing.fake_features(feature_spec, batch_size=16)
+      labels = testing.fake_labels(config.hparams.output_dim, batch_size=16)
+      feed_dict = input_ops.prepare_feed_dict(model, features, labels)
+      predictions = sess.run(model.predictions, feed_dict=feed_dict)
+      self.assertShapeEquals((16, 1), predictions)
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -68,6 +68,8 @@ import operator
 
 import tensorflow as tf
 
+from tf_util import compute_util
+
 
 class AstroModel(object):
   """A TensorFlow model for classifying astrophysical light curves."""
@@ -208,19 +210,25 @@ class AstroModel(object):
                                     name="pre_logits_concat")
 
     net = pre_logits_concat
+    dtype = compute_util.layer_dtype(self.hparams)
     with tf.name_scope("pre_logits_hidden"):
+      net = compute_util.cast_to_compute_dtype(net, self.hparams)
       for i in range(self.hparams.num_pre_logits_hidden_layers):
         dense_op = tf.keras.layers.Dense(
             units=self.hparams.pre_logits_hidden_layer_size,
             activation=tf.nn.relu,
+            dtype=dtype,
             name="fully_connected_{}".format(i + 1))
         net = dense_op(net)
 
         if self.hparams.pre_logits_dropout_rate > 0:
           dropout_op = tf.keras.layers.Dropout(
-              self.hparams.pre_logits_dropout_rate)
+              self.hparams.pre_logits_dropout_rate, dtype=dtype)
           net = dropout_op(net, training=self.is_training)
 
+      # The logits and losses are always computed in float32.
+      net = tf.cast(net, tf.float32)
+
       # Identify the final pre-logits hidden layer as "pre_logits_hidden/final".
       tf.identity(net, "final")
 
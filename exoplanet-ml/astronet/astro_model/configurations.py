@@ -85,5 +85,11 @@ def base():
 
           # If not None, gradient norms will be clipped to this value.
           "clip_gradient_norm": None,
+
+          # XLA compilation and mixed precision. See tf_util/compute_util.py.
+          "compute_dtype": "float32",  # Or "float16", "bfloat16".
+          "loss_scale": "dynamic",  # Only used with "float16".
+          "xla_jit_scope": False,  # Compile the CNN towers.
+          "xla_auto_clustering": False,
       }
   }
@@ -0,0 +1,412 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Generates predictions for every Threshold Crossing Event in a TCE table.
+
+The input CSV file has the same format as the input to
+astronet.data.generate_input_records, e.g. the Q1-Q17 DR24 TCE table. It must
+contain at least the columns rowid, kepid, tce_plnt_num, tce_period,
+tce_time0bk and tce_duration (in hours); label columns are not required.
+
+TCEs are grouped by target star. A pool of worker processes reads and processes
+the light curve of each star once and generates the views of all of its TCEs.
+The main process feeds the views to a single restored model in batches of
+--batch_size and streams the results to --output_file, which is written in CSV
+format, or in Parquet format if its name ends in ".parquet" (requires pyarrow).
+
+Each output row contains the rowid, kepid, tce_plnt_num, tce_period,
+tce_time0bk and tce_duration of a TCE; its prediction (or one column per class,
+prediction_0, prediction_1, ..., for multi-class models); and an error message
+if the TCE could not be processed, in which case the predictions are empty. Rows
+are written in the order in which they complete, not in the order of the input.
+
+Example usage:
+
+  python -m astronet.batch_predict \
+    --input_tce_csv_file=${HOME}/astronet/dr24_tce.csv \
+    --kepler_data_dir=${HOME}/astronet/kepler \
+    --model=AstroCNNModel \
+    --config_name=local_global \
+    --model_dir=${HOME}/astronet/model \
+    --output_file=${HOME}/astronet/predictions.csv
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import csv
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from astronet import models
+from astronet.data import preprocess
+from astronet.util import predictor as predictor_lib
+from tf_util import config_util
+from tf_util import configdict
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--input_tce_csv_file",
+    type=str,
+    required=True,
+    help="CSV file containing the TCEs to predict. Must contain columns: "
+    "rowid, kepid, tce_plnt_num, tce_period, tce_duration, tce_time0bk.")
+
+parser.add_argument(
+    "--kepler_data_dir",
+    type=str,
+    required=True,
+    help="Base folder containing Kepler data.")
+
+parser.add_argument(
+    "--model",
+    type=str,
+    help="Name of the model class. Required unless --export_dir is set.")
+
+parser.add_argument(
+    "--config_name",
+    type=str,
+    help="Name of the model and training configuration. Exactly one of "
+    "--config_name or --config_json is required.")
+
+parser.add_argument(
+    "--config_json",
+    type=str,
+    help="JSON string or JSON file containing the model and training "
+    "configuration. Exactly one of --config_name or --config_json is required.")
+
+parser.add_argument(
+    "--model_dir",
+    type=str,
+    help="Directory containing a model checkpoint, or a comma-separated list "
+    "of directories containing the checkpoints of an ensemble of models whose "
+    "predictions are averaged. Exactly one of --model_dir or --export_dir is "
+    "required.")
+
+parser.add_argument(
+    "--export_dir",
+    type=str,
+    help="Directory containing a model exported by astronet.export_model.")
+
+parser.add_argument(
+    "--export_format",
+    type=str,
+    default="frozen_graph",
+    choices=predictor_lib.EXPORT_FORMATS,
+    help="Format of the exported model to load from --export_dir. "
+    "'tflite_quantized' uses int8 weights, which is faster on CPU.")
+
+parser.add_argument(
+    "--output_file",
+    type=str,
+    required=True,
+    help="Output file. Written in Parquet format if the name ends in "
+    "'.parquet', otherwise in CSV format.")
+
+parser.add_argument(
+    "--num_worker_processes",
+    type=int,
+    default=5,
+    help="Number of subprocesses for processing light curves in parallel.")
+
+parser.add_argument(
+    "--batch_size",
+    type=int,
+    default=256,
+    help="Number of TCEs to feed to the model in each batch.")
+
+# Columns of the input TCE table copied to the output.
+_TCE_COLUMNS = [
+    "rowid", "kepid", "tce_plnt_num", "tce_period", "tce_time0bk",
+    "tce_duration"
+]
+
+# Parquet types of the output columns. The prediction columns are "float64".
+_PARQUET_COLUMN_TYPES = {
+    "rowid": "int64",
+    "kepid": "int64",
+    "tce_plnt_num": "int64",
+    "tce_period": "float64",
+    "tce_time0bk": "float64",
+    "tce_duration": "float64",
+    "error": "string",
+}
+
+# Minimum number of seconds between progress reports.
+_PROGRESS_INTERVAL_SECS = 30
+
+
+def _process_star(kepid, tce_table, feature_config):
+  """Generates the views of all TCEs of a single target star.
+
+  Args:
+    kepid: Kepler ID of the target star.
+    tce_table: A Pandas DataFrame containing the TCEs of the star, with
+      tce_duration in days.
+    feature_config: ConfigDict containing the feature configurations.
+
+  Returns:
+    List of (rowid, views, error) for each TCE. Exactly one of views and error
+    is None.
+  """
+  results = []
+  try:
+    all_time, all_flux = preprocess.read_light_curve(kepid,
+                                                     FLAGS.kepler_data_dir)
+    time, flux = preprocess.process_light_curve(all_time, all_flux)
+  except preprocess.PROCESSING_ERRORS as e:
+    # Failures such as missing light curve files should not stop the remaining
+    # stars from being processed. Any other error is a bug and stops the run.
+    error = "{}: {}".format(type(e).__name__, e)
+    tf.logging.warning("Failed to process kepid=%s: %s", kepid, error)
+    return [(rowid, None, error) for rowid in tce_table.index]
+
+  for rowid, tce in tce_table.iterrows():
+    try:
+      views = predictor_lib.generate_views(time, flux, tce.tce_period,
+                                           tce.tce_time0bk, tce.tce_duration,
+                                           feature_config)
+      results.append((rowid, views, None))
+    except preprocess.PROCESSING_ERRORS as e:
+      error = "{}: {}".format(type(e).__name__, e)
+      tf.logging.warning("Failed to process TCE %s (kepid=%s): %s", rowid,
+                         kepid, error)
+      results.append((rowid, None, error))
+
+  return results
+
+
+def _process_star_star(args):
+  """Calls _process_star with a tuple of arguments."""
+  return _process_star(*args)
+
+
+class _CsvWriter(object):
+  """Writes output rows to a CSV file."""
+
+  def __init__(self, output_file, fieldnames):
+    self._file = tf.gfile.Open(output_file, "w")
+    self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+    self._writer.writeheader()
+
+  def write(self, rows):
+    self._writer.writerows(rows)
+    self._file.flush()
+
+  def close(self):
+    self._file.close()
+
+
+class _ParquetWriter(object):
+  """Writes output rows to a Parquet file, one row group per call to write()."""
+
+  def __init__(self, output_file, fieldnames):
+    try:
+      import pyarrow  # pylint:disable=g-import-not-at-top
+      import pyarrow.parquet  # pylint:disable=g-import-not-at-top
+    except ImportError:
+      raise ImportError("pyarrow is required to write Parquet output.")
+    self._pyarrow = pyarrow
+    self._fieldnames = fieldnames
+    # The schema is declared up front rather than inferred from the first
+    # batch, whose prediction columns are empty if all of its TCEs failed.
+    self._schema = pyarrow.schema([
+        (name, getattr(pyarrow, _PARQUET_COLUMN_TYPES.get(name, "float64"))())
+        for name in fieldnames
+    ])
+    self._writer = pyarrow.parquet.ParquetWriter(output_file, self._schema)
+
+  def write(self, rows):
+    table = self._pyarrow.Table.from_pandas(
+        pd.DataFrame(rows, columns=self._fieldnames),
+        schema=self._schema,
+        preserve_index=False)
+    self._writer.write_table(table)
+
+  def close(self):
+    self._writer.close()
+
+
+class _BatchPredictor(object):
+  """Accumulates views and predicts them in batches."""
+
+  def __init__(self, predictor, tce_table, writer, batch_size, output_dim):
+    self._predictor = predictor
+    self._tce_table = tce_table
+    self._writer = writer
+    self._batch_size = batch_size
+    self._output_dim = output_dim
+    self._pending = []  # List of (rowid, views).
+    self._failed_rows = []  # Output rows of TCEs that could not be processed.
+    self.num_written = 0
+    self.num_failed = 0
+    self.model_secs = 0
+
+  def _tce_row(self, rowid):
+    row = {"rowid": int(rowid)}
+    for name in _TCE_COLUMNS[1:]:
+      # Use DataFrame.at rather than a row Series, which would cast the
+      # integer columns to float.
+      row[name] = self._tce_table.at[rowid, name]
+    row["tce_duration"] *= 24  # Convert days back to hours.
+    return row
+
+  def _prediction_columns(self, prediction):
+    if self._output_dim == 1:
+      return {"prediction": float(prediction[0])}
+    return {
+        "prediction_{}".format(i): float(p) for i, p in enumerate(prediction)
+    }
+
+  def add(self, rowid, views, error):
+    """Adds the result of processing a single TCE."""
+    if error is not None:
+      row = self._tce_row(rowid)
+      row["error"] = error
+      self._failed_rows.append(row)
+      return
+
+    self._pending.append((rowid, views))
+    if len(self._pending) >= self._batch_size:
+      self.flush()
+
+  def flush(self):
+    """Predicts all pending TCEs and writes them with any failed TCEs."""
+    rows = []
+    if self._pending:
+      features = {
+          name: np.stack([views[name] for _, views in self._pending])
+          for name in self._predictor.feature_config
+      }
+      start = time.time()
+      predictions = self._predictor.predict(features)
+      self.model_secs += time.time() - start
+
+      for (rowid, _), prediction in zip(self._pending, predictions):
+        row = self._tce_row(rowid)
+        row.update(self._prediction_columns(prediction))
+        row["error"] = ""
+        rows.append(row)
+
+    rows.extend(self._failed_rows)
+    if not rows:
+      return
+
+    self._writer.write(rows)
+    self.num_written += len(rows)
+    self.num_failed += len(self._failed_rows)
+    self._pending = []
+    self._failed_rows = []
+
+
+def _create_predictor():
+  """Loads an exported model or restores the model from a checkpoint."""
+  assert (FLAGS.model_dir is None) != (FLAGS.export_dir is None), (
+      "Exactly one of --model_dir or --export_dir is required.")
+  if FLAGS.export_dir:
+    return predictor_lib.load_exported_predictor(FLAGS.export_dir,
+                                                 FLAGS.export_format)
+
+  assert FLAGS.model, "--model is required with --model_dir."
+  model_class = models.get_model_class(FLAGS.model)
+
+  # Look up the model configuration.
+  assert (FLAGS.config_name is None) != (FLAGS.config_json is None), (
+      "Exactly one of --config_name or --config_json is required.")
+  config = (
+      models.get_model_config(FLAGS.model, FLAGS.config_name)
+      if FLAGS.config_name else config_util.parse_json(FLAGS.config_json))
+  config = configdict.ConfigDict(config)
+
+  return predictor_lib.create_checkpoint_predictor(model_class, config,
+                                                   FLAGS.model_dir)
+
+
+def main(_):
+  # Read CSV file of TCEs.
+  tce_table = pd.read_csv(
+      FLAGS.input_tce_csv_file, index_col="rowid", comment="#")
+  tce_table["tce_duration"] /= 24  # Convert hours to days.
+  num_tces = len(tce_table)
+  tf.logging.info("Read TCE CSV file with %d rows.", num_tces)
+
+  # Create the worker pool before loading the model, so that the workers do
+  # not inherit the TensorFlow session.
+  num_stars = tce_table["kepid"].nunique()
+  num_processes = min(num_stars, FLAGS.num_worker_processes)
+  tf.logging.info("Launching %d subprocesses for %d target stars",
+                  num_processes, num_stars)
+  pool = multiprocessing.Pool(processes=num_processes)
+
+  predictor = _create_predictor()
+
+  # Group TCEs by target star, so that each light curve is read and processed
+  # once.
+  stars = [(kepid, star_tces, predictor.feature_config)
+           for kepid, star_tces in tce_table.groupby("kepid")]
+
+  output_dim = predictor.config.hparams.output_dim
+  prediction_columns = (["prediction"] if output_dim == 1 else
+                        ["prediction_{}".format(i) for i in range(output_dim)])
+  fieldnames = _TCE_COLUMNS + prediction_columns + ["error"]
+  if FLAGS.output_file.endswith(".parquet"):
+    writer = _ParquetWriter(FLAGS.output_file, fieldnames)
+  else:
+    writer = _CsvWriter(FLAGS.output_file, fieldnames)
+  batch_predictor = _BatchPredictor(predictor, tce_table, writer,
+                                    FLAGS.batch_size, output_dim)
+
+  start_time = time.time()
+  last_report_time = start_time
+  try:
+    # Any exception raised by a worker process is re-raised here.
+    for results in pool.imap_unordered(_process_star_star, stars):
+      for rowid, views, error in results:
+        batch_predictor.add(rowid, views, error)
+
+      now = time.time()
+      if now - last_report_time >= _PROGRESS_INTERVAL_SECS:
+        last_report_time = now
+        tf.logging.info(
+            "Predicted %d/%d TCEs (%.1f TCEs/sec, %.1f sec in model)",
+            batch_predictor.num_written, num_tces,
+            batch_predictor.num_written / (now - start_time),
+            batch_predictor.model_secs)
+
+    batch_predictor.flush()
+  finally:
+    pool.terminate()
+    writer.close()
+    predictor.close()
+
+  elapsed = time.time() - start_time
+  tf.logging.info(
+      "Wrote %d predictions (%d failed TCEs) to %s in %.1f sec (%.1f TCEs/sec, "
+      "%.1f sec in model)", batch_predictor.num_written,
+      batch_predictor.num_failed, FLAGS.output_file, elapsed,
+      batch_predictor.num_written / elapsed, batch_predictor.model_secs)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
@@ -0,0 +1,252 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for batch_predict.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from astronet import batch_predict
+from astronet.data import preprocess
+from astronet.util import predictor as predictor_lib
+from tf_util import configdict
+
+# pylint:disable=protected-access
+_BasePredictor = predictor_lib._BasePredictor
+_BatchPredictor = batch_predict._BatchPredictor
+_ParquetWriter = batch_predict._ParquetWriter
+# pylint:enable=protected-access
+
+# Kepler ID of the target star whose light curve is missing.
+_MISSING_KEPID = 1001
+
+
+class _FakePredictor(_BasePredictor):
+  """Predicts the mean of each view, and records the size of each batch."""
+
+  def __init__(self, output_dim):
+    super(_FakePredictor, self).__init__(
+        configdict.ConfigDict({
+            "inputs": {
+                "features": {
+                    "global_view": {
+                        "length": 4,
+                        "is_time_series": True,
+                    },
+                },
+            },
+            "hparams": {
+                "output_dim": output_dim,
+            },
+        }))
+    self.batch_sizes = []
+
+  def predict(self, features):
+    views = features["global_view"]
+    self.batch_sizes.append(len(views))
+    output_dim = self.config.hparams.output_dim
+    return np.tile(np.mean(views, axis=1, keepdims=True), [1, output_dim])
+
+  def close(self):
+    pass
+
+
+def _fake_process_star(kepid, tce_table, feature_config):
+  """Returns views whose values are the rowid of each TCE."""
+  if kepid == _MISSING_KEPID:
+    return [(rowid, None, "IOError: Missing") for rowid in tce_table.index]
+  return [(rowid, {
+      name: np.full([feature.length], rowid, np.float32)
+      for name, feature in feature_config.items()
+  }, None) for rowid in tce_table.index]
+
+
+class BatchPredictTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(BatchPredictTest, self).setUp()
+    # 3 target stars with 2 TCEs each.
+    self._tce_csv_file = os.path.join(self.get_temp_dir(), "tces.csv")
+    pd.DataFrame({
+        "rowid": range(1, 7),
+        "kepid": [1000, 1000, 1001, 1001, 1002, 1002],
+        "tce_plnt_num": [1, 2, 1, 2, 1, 2],
+        "tce_period": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        "tce_time0bk": 1.5,
+        "tce_duration": 2.4,
+    }).to_csv(self._tce_csv_file, index=False)
+
+  def _run(self,
+           output_file,
+           predictor,
+           batch_size=2,
+           process_star_fn=_fake_process_star):
+    """Runs batch_predict with a fake predictor and light curve processing."""
+    batch_predict.FLAGS = batch_predict.parser.parse_args([
+        "--input_tce_csv_file={}".format(self._tce_csv_file),
+        "--kepler_data_dir={}".format(self.get_temp_dir()),
+        "--model_dir={}".format(self.get_temp_dir()),
+        "--output_file={}".format(output_file),
+        "--num_worker_processes=2",
+        "--batch_size={}".format(batch_size),
+    ])
+    # Worker processes are forked, so they inherit the patched function.
+    with tf.test.mock.patch.object(batch_predict, "_process_star",
+                                   process_star_fn):
+      with tf.test.mock.patch.object(
+          batch_predict, "_create_predictor", return_value=predictor):
+        batch_predict.main(None)
+
+  def _check_output(self, output):
+    output = output.sort_values("rowid").reset_index(drop=True)
+    self.assertEqual([1, 2, 3, 4, 5, 6], list(output.rowid))
+    self.assertEqual([1000, 1000, 1001, 1001, 1002, 1002], list(output.kepid))
+    self.assertEqual([1, 2, 1, 2, 1, 2], list(output.tce_plnt_num))
+    self.assertAllClose([10, 20, 30, 40, 50, 60], output.tce_period)
+    self.assertAllClose([2.4] * 6, output.tce_duration)
+
+    # The predictions of the failed TCEs are empty.
+    self.assertAllClose([1, 2, np.nan, np.nan, 5, 6], output.prediction)
+    self.assertEqual(["", "", "IOError: Missing", "IOError: Missing", "", ""],
+                     list(output.error.fillna("")))
+
+  def testCsvOutput(self):
+    output_file = os.path.join(self.get_temp_dir(), "predictions.csv")
+    predictor = _FakePredictor(output_dim=1)
+    self._run(output_file, predictor)
+    self._check_output(pd.read_csv(output_file))
+
+  def testParquetOutput(self):
+    output_file = os.path.join(self.get_temp_dir(), "predictions.parquet")
+    predictor = _FakePredictor(output_dim=1)
+    self._run(output_file, predictor)
+    self._check_output(pd.read_parquet(output_file))
+
+  def testParquetOutputMultiClass(self):
+    output_file = os.path.join(self.get_temp_dir(), "predictions.parquet")
+    predictor = _FakePredictor(output_dim=3)
+    self._run(output_file, predictor)
+    output = pd.read_parquet(output_file).sort_values("rowid")
+    for i in range(3):
+      self.assertAllClose([1, 2, np.nan, np.nan, 5, 6],
+                          output["prediction_{}".format(i)])
+
+  def testParquetFirstBatchFailed(self):
+    import pyarrow.parquet  # pylint:disable=g-import-not-at-top
+
+    # The schema does not depend on the first batch, even if all of its TCEs
+    # failed.
+    output_file = os.path.join(self.get_temp_dir(), "predictions.parquet")
+    predictor = _FakePredictor(output_dim=1)
+    writer = _ParquetWriter(output_file, [
+        "rowid", "kepid", "tce_plnt_num", "tce_period", "tce_time0bk",
+        "tce_duration", "prediction", "error"
+    ])
+    tce_table = pd.read_csv(self._tce_csv_file, index_col="rowid")
+    batch_predictor = _BatchPredictor(
+        predictor, tce_table, writer, batch_size=2, output_dim=1)
+    batch_predictor.add(3, None, "IOError: Missing")
+    batch_predictor.flush()
+    batch_predictor.add(1, {"global_view": np.ones([4])}, None)
+    batch_predictor.add(2, {"global_view": np.full([4], 2.0)}, None)
+    batch_predictor.flush()
+    writer.close()
+
+    self.assertEqual([2], predictor.batch_sizes)
+    self.assertEqual(3, batch_predictor.num_written)
+    self.assertEqual(1, batch_predictor.num_failed)
+    schema = pyarrow.parquet.read_schema(output_file)
+    self.assertEqual("int64", str(schema.field("rowid").type))
+    self.assertEqual("double", str(schema.field("prediction").type))
+    self.assertEqual("string", str(schema.field("error").type))
+    output = pd.read_parquet(output_file)
+    self.assertEqual([3, 1, 2], list(output.rowid))
+    self.assertAllClose([np.nan, 1, 2], output.prediction)
+
+  def testProcessStarErrors(self):
+    batch_predict.FLAGS = batch_predict.parser.parse_args([
+        "--input_tce_csv_file=", "--kepler_data_dir=", "--model_dir=",
+        "--output_file="
+    ])
+    tce_table = pd.read_csv(self._tce_csv_file, index_col="rowid")
+    tce_table = tce_table[tce_table.kepid == 1000]
+    feature_config = _FakePredictor(output_dim=1).config.inputs.features
+
+    def _read_light_curve(kepid, kepler_data_dir):
+      del kepler_data_dir  # Unused.
+      raise IOError("Failed to find .fits files for Kepler ID {}".format(kepid))
+
+    # Errors reading the light curve are recorded for every TCE of the star.
+    with tf.test.mock.patch.object(preprocess, "read_light_curve",
+                                   _read_light_curve):
+      results = batch_predict._process_star(1000, tce_table, feature_config)  # pylint:disable=protected-access
+    self.assertEqual([1, 2], [rowid for rowid, _, _ in results])
+    for _, views, error in results:
+      self.assertIsNone(views)
+      self.assertIn("Failed to find .fits files for Kepler ID 1000", error)
+
+    def _generate_views(time, flux, period, t0, duration, feature_config):
+      del time, flux, t0, duration, feature_config  # Unused.
+      if period == 20:
+        raise ValueError("Too few points")
+      return {"global_view": np.zeros([4])}
+
+    # Errors generating the views are recorded for that TCE only.
+    with tf.test.mock.patch.object(
+        preprocess, "read_light_curve", return_value=([], [])):
+      with tf.test.mock.patch.object(
+          preprocess, "process_light_curve", return_value=([], [])):
+        with tf.test.mock.patch.object(predictor_lib, "generate_views",
+                                       _generate_views):
+          results = batch_predict._process_star(1000, tce_table, feature_config)  # pylint:disable=protected-access
+    self.assertEqual([1, 2], [rowid for rowid, _, _ in results])
+    self.assertIsNotNone(results[0][1])
+    self.assertIsNone(results[0][2])
+    self.assertIsNone(results[1][1])
+    self.assertEqual("ValueError: Too few points", results[1][2])
+
+  def testUnexpectedError(self):
+
+    def _read_light_curve(kepid, kepler_data_dir):
+      del kepid, kepler_data_dir  # Unused.
+      raise RuntimeError("Bug")
+
+    # Errors other than processing errors stop the run.
+    output_file = os.path.join(self.get_temp_dir(), "predictions.csv")
+    with tf.test.mock.patch.object(preprocess, "read_light_curve",
+                                   _read_light_curve):
+      with self.assertRaisesRegexp(RuntimeError, "Bug"):
+        self._run(
+            output_file,
+            _FakePredictor(output_dim=1),
+            process_star_fn=batch_predict._process_star)  # pylint:disable=protected-access
+
+  def testEmptyParquetOutput(self):
+    import pyarrow.parquet  # pylint:disable=g-import-not-at-top
+
+    output_file = os.path.join(self.get_temp_dir(), "predictions.parquet")
+    fieldnames = ["rowid", "prediction", "error"]
+    _ParquetWriter(output_file, fieldnames).close()
+    self.assertEqual(fieldnames, pyarrow.parquet.read_schema(output_file).names)
+
+
+if __name__ == "__main__":
+  tf.test.main()
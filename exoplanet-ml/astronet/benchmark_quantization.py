@@ -0,0 +1,202 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Compares the accuracy and throughput of the formats of an exported model.
+
+Reads an evaluation set (e.g. the test split written by
+astronet.data.generate_input_records) into memory and generates predictions
+with each format exported by astronet.export_model with --export_tflite. For
+each format, the following are reported:
+  model_mb: Size of the model file, in megabytes.
+  accuracy: Accuracy of the predicted labels.
+  auc: Area under the ROC curve (binary classification only).
+  max_delta: Maximum absolute difference between the predictions and the
+    predictions of the frozen float32 graph.
+  agreement: Fraction of predicted labels equal to those of the frozen graph.
+  examples_per_sec: Prediction throughput in batches of --batch_size, excluding
+    input processing.
+
+Example usage:
+
+  python -m astronet.benchmark_quantization \
+    --export_dir=${HOME}/astronet/exported_model \
+    --eval_files=${HOME}/astronet/tfrecord/test*
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn import metrics
+import tensorflow as tf
+
+from astronet.ops import dataset_ops
+from astronet.util import predictor as predictor_lib
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--export_dir",
+    type=str,
+    required=True,
+    help="Directory containing a model exported by astronet.export_model with "
+    "--export_tflite.")
+
+parser.add_argument(
+    "--eval_files",
+    type=str,
+    required=True,
+    help="Comma-separated list of file patterns matching the TFRecord files in "
+    "the evaluation dataset.")
+
+parser.add_argument(
+    "--batch_size",
+    type=int,
+    default=256,
+    help="Batch size for generating predictions.")
+
+parser.add_argument(
+    "--min_benchmark_secs",
+    type=float,
+    default=10,
+    help="Minimum time to spend measuring the throughput of each format.")
+
+# Model file of each export format.
+_MODEL_FILE_NAMES = {
+    "frozen_graph": predictor_lib.FROZEN_GRAPH_FILE_NAME,
+    "tflite": predictor_lib.TFLITE_FILE_NAME,
+    "tflite_quantized": predictor_lib.QUANTIZED_TFLITE_FILE_NAME,
+}
+
+
+def _read_features(file_pattern, config):
+  """Reads the features and labels of an evaluation set into memory.
+
+  Args:
+    file_pattern: Comma-separated list of file patterns.
+    config: ConfigDict containing the model configuration.
+
+  Returns:
+    features: Dictionary of numpy arrays with shape [num_examples, length].
+    labels: Numpy array of label ids with shape [num_examples].
+  """
+  values = dataset_ops.load_dataset(file_pattern, config.inputs)
+  features = {}
+  for name, feature in config.inputs.features.items():
+    if feature.is_time_series:
+      # Reshape [num_examples, length, 1] -> [num_examples, length].
+      features[name] = np.squeeze(values["time_series_features"][name], 2)
+    else:
+      features[name] = values["aux_features"][name]
+  return features, values["labels"]
+
+
+def _predict_all(predictor, features, batch_size):
+  """Generates predictions for all examples in batches."""
+  num_examples = len(next(iter(features.values())))
+  predictions = []
+  for start in range(0, num_examples, batch_size):
+    batch = {
+        name: value[start:start + batch_size]
+        for name, value in features.items()
+    }
+    predictions.append(predictor.predict(batch))
+  return np.concatenate(predictions)
+
+
+def _predicted_labels(predictions):
+  if predictions.shape[1] == 1:
+    return (predictions[:, 0] > 0.5).astype(np.int32)
+  return np.argmax(predictions, axis=1)
+
+
+def _measure_throughput(predictor, features, batch_size, min_secs):
+  """Returns the examples per second of generating predictions."""
+  num_examples = len(next(iter(features.values())))
+  _predict_all(predictor, features, batch_size)  # Warm up.
+  num_predicted = 0
+  start = time.time()
+  while time.time() - start < min_secs:
+    _predict_all(predictor, features, batch_size)
+    num_predicted += num_examples
+  return num_predicted / (time.time() - start)
+
+
+def main(_):
+  results = []
+  reference_predictions = None
+  for export_format in predictor_lib.EXPORT_FORMATS:
+    model_file = os.path.join(FLAGS.export_dir,
+                              _MODEL_FILE_NAMES[export_format])
+    if not tf.gfile.Exists(model_file):
+      # The frozen graph is the reference for max_delta and agreement.
+      if export_format == "frozen_graph":
+        raise ValueError(
+            "Frozen graph not found: {}. It is required as the reference for "
+            "the other formats.".format(model_file))
+      tf.logging.info("Skipping %s: %s does not exist", export_format,
+                      model_file)
+      continue
+
+    predictor = predictor_lib.load_exported_predictor(FLAGS.export_dir,
+                                                      export_format)
+    if reference_predictions is None:
+      # The evaluation set is read using the configuration of the frozen graph,
+      # which is loaded first.
+      features, labels = _read_features(FLAGS.eval_files, predictor.config)
+      tf.logging.info("Read %d evaluation examples", len(labels))
+
+    predictions = _predict_all(predictor, features, FLAGS.batch_size)
+    predicted_labels = _predicted_labels(predictions)
+    if reference_predictions is None:
+      reference_predictions = predictions
+    examples_per_sec = _measure_throughput(predictor, features,
+                                           FLAGS.batch_size,
+                                           FLAGS.min_benchmark_secs)
+    predictor.close()
+
+    auc = float("nan")
+    if predictions.shape[1] == 1:
+      auc = metrics.roc_auc_score(labels, predictions[:, 0])
+    results.append((
+        export_format,
+        tf.gfile.Stat(model_file).length / 1e6,
+        np.mean(predicted_labels == labels),
+        auc,
+        np.max(np.abs(predictions - reference_predictions)),
+        np.mean(predicted_labels == _predicted_labels(reference_predictions)),
+        examples_per_sec,
+    ))
+    tf.logging.info(
+        "%s: %.2f MB, accuracy %.4f, auc %.4f, max delta %.2e, agreement "
+        "%.4f, %.1f examples/sec", *results[-1])
+
+  print("{:<18}{:>10}{:>10}{:>10}{:>12}{:>11}{:>18}".format(
+      "format", "model_mb", "accuracy", "auc", "max_delta", "agreement",
+      "examples_per_sec"))
+  for result in results:
+    print("{:<18}{:>10.2f}{:>10.4f}{:>10.4f}{:>12.2e}{:>11.4f}{:>18.1f}".format(
+        *result))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
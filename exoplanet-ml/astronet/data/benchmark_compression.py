@@ -0,0 +1,176 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Script to compare TFRecord compression types for AstroNet input data.
+
+For each compression type, the input files are rewritten to a scratch directory
+and the following are reported:
+  disk_mb: Total size of the rewritten files, in megabytes.
+  write_secs: Time taken to write the files.
+  examples_per_sec: Throughput of the AstroNet training input pipeline
+    (dataset_ops.build_dataset) reading the files for one epoch.
+
+Example usage:
+
+  python -m astronet.data.benchmark_compression \
+    --input_file_pattern="${HOME}/astronet/tfrecord/train-*" \
+    --scratch_dir="/tmp/astronet/compression_benchmark" \
+    --model=AstroCNNModel \
+    --config_name=local_global
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+import tensorflow as tf
+
+from astronet import models
+from astronet.ops import dataset_ops
+from tf_util import configdict
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--input_file_pattern",
+    type=str,
+    required=True,
+    help="Comma-separated list of file patterns matching the uncompressed "
+    "input TFRecord files.")
+
+parser.add_argument(
+    "--scratch_dir",
+    type=str,
+    required=True,
+    help="Directory in which to write the compressed copies of the input.")
+
+parser.add_argument(
+    "--model", type=str, required=True, help="Name of the model class.")
+
+parser.add_argument(
+    "--config_name",
+    type=str,
+    required=True,
+    help="Name of the model and training configuration. Its input "
+    "configuration is used to parse the input files.")
+
+parser.add_argument(
+    "--compression_types",
+    type=str,
+    default="NONE,GZIP,ZLIB",
+    help="Comma-separated list of compression types to compare. NONE means no "
+    "compression.")
+
+parser.add_argument(
+    "--batch_size", type=int, default=64, help="Batch size for reading.")
+
+
+def _rewrite_files(input_files, output_dir, compression_type):
+  """Copies TFRecord files with the given compression type.
+
+  Args:
+    input_files: List of uncompressed input TFRecord files.
+    output_dir: Directory in which to write the output files.
+    compression_type: One of "", "GZIP" or "ZLIB".
+
+  Returns:
+    output_files: List of output files.
+    write_secs: Time taken to write the output files.
+    disk_bytes: Total size of the output files.
+  """
+  tf.gfile.MakeDirs(output_dir)
+  output_files = []
+  write_secs = 0
+  for input_file in input_files:
+    records = list(tf.python_io.tf_record_iterator(input_file))
+    output_file = os.path.join(output_dir, os.path.basename(input_file))
+    start = time.time()
+    with tf.python_io.TFRecordWriter(
+        output_file, options=compression_type) as writer:
+      for record in records:
+        writer.write(record)
+    write_secs += time.time() - start
+    output_files.append(output_file)
+
+  disk_bytes = sum(tf.gfile.Stat(f).length for f in output_files)
+  return output_files, write_secs, disk_bytes
+
+
+def _measure_input_throughput(file_pattern, input_config, batch_size):
+  """Returns the examples per second of one epoch of the input pipeline."""
+  with tf.Graph().as_default():
+    dataset = dataset_ops.build_dataset(
+        file_pattern=file_pattern,
+        input_config=input_config,
+        batch_size=batch_size,
+        include_labels=False,
+        reverse_time_series_prob=0.5,
+        shuffle_filenames=True)
+    features = dataset.make_one_shot_iterator().get_next()
+    time_series = next(iter(features["time_series_features"].values()))
+    batch_size_tensor = tf.shape(time_series)[0]
+
+    with tf.Session() as sess:
+      num_examples = 0
+      start = time.time()
+      try:
+        while True:
+          num_examples += sess.run(batch_size_tensor)
+      except tf.errors.OutOfRangeError:
+        pass
+      return num_examples / (time.time() - start)
+
+
+def main(_):
+  config = configdict.ConfigDict(
+      models.get_model_config(FLAGS.model, FLAGS.config_name))
+
+  input_files = []
+  for pattern in FLAGS.input_file_pattern.split(","):
+    matches = tf.gfile.Glob(pattern)
+    if not matches:
+      raise ValueError("Found no input files matching {}".format(pattern))
+    input_files.extend(matches)
+  tf.logging.info("Benchmarking %d input files", len(input_files))
+
+  results = []
+  for name in FLAGS.compression_types.split(","):
+    compression_type = "" if name == "NONE" else name
+    output_files, write_secs, disk_bytes = _rewrite_files(
+        input_files, os.path.join(FLAGS.scratch_dir, name), compression_type)
+
+    input_config = configdict.ConfigDict(config.inputs)
+    input_config.compression_type = compression_type
+    examples_per_sec = _measure_input_throughput(
+        ",".join(output_files), input_config, FLAGS.batch_size)
+
+    results.append((name, disk_bytes / 1e6, write_secs, examples_per_sec))
+    tf.logging.info("%s: %.1f MB, wrote in %.1f sec, read %.1f examples/sec",
+                    *results[-1])
+
+  print("{:<10}{:>12}{:>12}{:>18}".format("codec", "disk_mb", "write_secs",
+                                           "examples_per_sec"))
+  for result in results:
+    print("{:<10}{:>12.1f}{:>12.2f}{:>18.1f}".format(*result))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
@@ -0,0 +1,174 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Script to convert the time series encoding of existing TFRecord shards.
+
+Rewrites the time series features of each tensorflow.train.Example in the input
+files to the requested format (see preprocess.TIME_SERIES_FORMATS). All other
+features, such as the auxiliary features and labels, are copied unchanged. The
+output files can optionally be written with a different compression type.
+
+Each input file is written to a file of the same name in --output_dir, so the
+output can be used in place of the input by pointing the model's
+--train_files / --eval_files at it and setting inputs.time_series_format in the
+model configuration.
+
+Example usage:
+
+  python -m astronet.data.convert_time_series_format \
+    --input_file_pattern="${HOME}/astronet/tfrecord/*" \
+    --output_dir="${HOME}/astronet/tfrecord_raw" \
+    --time_series_format=raw_float32
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+import tensorflow as tf
+
+from astronet.data import preprocess
+from tf_util import example_util
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--input_file_pattern",
+    type=str,
+    required=True,
+    help="Comma-separated list of file patterns matching the input TFRecord "
+    "files.")
+
+parser.add_argument(
+    "--output_dir",
+    type=str,
+    required=True,
+    help="Directory in which to save the output.")
+
+parser.add_argument(
+    "--time_series_format",
+    type=str,
+    default="raw_float32",
+    choices=preprocess.TIME_SERIES_FORMATS,
+    help="Encoding of the time series features in the output.")
+
+parser.add_argument(
+    "--input_compression_type",
+    type=str,
+    default="",
+    choices=["", "GZIP", "ZLIB"],
+    help="Compression type of the input TFRecord files.")
+
+parser.add_argument(
+    "--compression_type",
+    type=str,
+    default="",
+    choices=["", "GZIP", "ZLIB"],
+    help="Compression type of the output TFRecord files.")
+
+parser.add_argument(
+    "--time_series_features",
+    type=str,
+    default="global_view,local_view",
+    help="Comma-separated list of time series features to convert.")
+
+parser.add_argument(
+    "--num_worker_processes",
+    type=int,
+    default=5,
+    help="Number of subprocesses for converting files in parallel.")
+
+
+def _get_time_series_feature(ex, name):
+  """Reads a time series feature in either format as a float32 numpy array."""
+  feature_map = ex.features.feature
+  if name in feature_map and feature_map[name].HasField("bytes_list"):
+    return example_util.get_raw_float_feature(ex, name)
+  return example_util.get_float_array_feature(ex, name)
+
+
+def _convert_file(input_file, output_file):
+  """Converts the time series features of all Examples in a single file.
+
+  Args:
+    input_file: The input TFRecord file.
+    output_file: The output TFRecord file.
+  """
+  process_name = multiprocessing.current_process().name
+  file_name = os.path.basename(input_file)
+  feature_names = FLAGS.time_series_features.split(",")
+  tf.logging.info("%s: Converting file %s", process_name, file_name)
+
+  num_converted = 0
+  with tf.python_io.TFRecordWriter(
+      output_file, options=FLAGS.compression_type) as writer:
+    for record in tf.python_io.tf_record_iterator(
+        input_file, options=FLAGS.input_compression_type):
+      ex = tf.train.Example.FromString(record)
+      for name in feature_names:
+        value = _get_time_series_feature(ex, name)
+        del ex.features.feature[name]
+        preprocess.set_time_series_feature(ex, name, value,
+                                           FLAGS.time_series_format)
+      writer.write(ex.SerializeToString())
+      num_converted += 1
+
+  tf.logging.info("%s: Wrote %d items in file %s", process_name, num_converted,
+                  file_name)
+
+
+def main(argv):
+  del argv  # Unused.
+
+  input_files = []
+  for pattern in FLAGS.input_file_pattern.split(","):
+    matches = tf.gfile.Glob(pattern)
+    if not matches:
+      raise ValueError("Found no input files matching {}".format(pattern))
+    input_files.extend(matches)
+
+  # Make the output directory if it doesn't already exist.
+  tf.gfile.MakeDirs(FLAGS.output_dir)
+
+  files = [(input_file,
+            os.path.join(FLAGS.output_dir, os.path.basename(input_file)))
+           for input_file in input_files]
+  num_files = len(files)
+
+  # Launch subprocesses for the files.
+  num_processes = min(num_files, FLAGS.num_worker_processes)
+  tf.logging.info("Launching %d subprocesses for %d total files",
+                  num_processes, num_files)
+
+  pool = multiprocessing.Pool(processes=num_processes)
+  async_results = [pool.apply_async(_convert_file, f) for f in files]
+  pool.close()
+
+  # Instead of pool.join(), we call async_result.get() to ensure any exceptions
+  # raised by the worker processes are also raised here.
+  for async_result in async_results:
+    async_result.get()
+
+  tf.logging.info("Finished converting %d total files", num_files)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
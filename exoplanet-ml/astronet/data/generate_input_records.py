@@ -63,6 +63,9 @@ following light curve representations:
   global_view: Vector of length 2001; the Global View of the TCE.
   local_view: Vector of length 201; the Local View of the TCE.
 
+By default these are float_list features. With --time_series_format=raw_float32
+each view is instead a single bytes value of little-endian float32 values.
+
 In addition, each Example contains the value of each column in the input TCE CSV
 file. Some of these features may be useful as auxiliary features to the model.
 The columns include:
@@ -72,15 +75,21 @@ The columns include:
   av_training_set: Autovetter training set label.
   tce_period: Orbital period of the detected event, in days.
   ...
+
+TCEs that cannot be processed, for example because their light curve files are
+missing, are listed in failed_tces.csv in the output directory. Long runs can be
+made resumable by passing --journal_dir; see the flag description.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
 import argparse
+import json
 import multiprocessing
 import os
 import sys
+import time
 
 import numpy as np
 import pandas as pd
@@ -125,10 +134,55 @@ parser.add_argument(
     default=5,
     help="Number of subprocesses for processing the TCEs in parallel.")
 
+parser.add_argument(
+    "--num_writer_processes",
+    type=int,
+    default=2,
+    help="Number of subprocesses for writing the output shards. Each shard is "
+    "written by a single process.")
+
+parser.add_argument(
+    "--work_unit_size",
+    type=int,
+    default=10,
+    help="Number of TCEs in each unit of work given to a worker process.")
+
+parser.add_argument(
+    "--compression_type",
+    type=str,
+    default="",
+    choices=["", "GZIP", "ZLIB"],
+    help="Compression type of the output TFRecord files.")
+
+parser.add_argument(
+    "--journal_dir",
+    type=str,
+    default=None,
+    help="Optional directory in which to journal completed work units. If "
+    "set, rerunning with the same arguments and --journal_dir after an "
+    "interruption skips the TCEs that were already processed and only "
+    "rewrites the incomplete shards.")
+
+parser.add_argument(
+    "--time_series_format",
+    type=str,
+    default="float_list",
+    choices=preprocess.TIME_SERIES_FORMATS,
+    help="Encoding of the light curve views in the output. 'raw_float32' "
+    "stores each view as a single bytes value, which is cheaper to parse. "
+    "Models reading 'raw_float32' records must set "
+    "inputs.time_series_format accordingly.")
+
 # Name and values of the column in the input CSV file to use as training labels.
 _LABEL_COLUMN = "av_training_set"
 _ALLOWED_LABELS = {"PC", "AFP", "NTP"}
 
+# Minimum number of seconds between progress reports.
+_PROGRESS_INTERVAL_SECS = 30
+
+# Name of the CSV file in the output directory listing the TCEs that could not
+# be processed.
+_FAILURE_MANIFEST_NAME = "failed_tces.csv"
 
 def _process_tce(tce):
   """Processes the light curve for a Kepler TCE and returns an Example proto.
@@ -142,36 +196,263 @@ def _process_tce(tce):
   all_time, all_flux = preprocess.read_light_curve(tce.kepid,
                                                    FLAGS.kepler_data_dir)
   time, flux = preprocess.process_light_curve(all_time, all_flux)
-  return preprocess.generate_example_for_tce(time, flux, tce)
+  return preprocess.generate_example_for_tce(time, flux, tce,
+                                             FLAGS.time_series_format)
+
+
+def _process_work_unit(shard_index, unit_index, tce_table):
+  """Processes a work unit of TCEs.
+
+  Args:
+    shard_index: Index of the output shard that the work unit belongs to.
+    unit_index: Index of the work unit within its shard.
+    tce_table: A Pandas DataFrame containing the TCEs in the work unit.
+
+  Returns:
+    shard_index: Index of the output shard that the work unit belongs to.
+    unit_index: Index of the work unit within its shard.
+    serialized_examples: List of serialized Example protos.
+    failures: List of dicts describing the TCEs that could not be processed,
+      with keys 'rowid', 'kepid', 'tce_plnt_num' and 'error'.
+  """
+  serialized_examples = []
+  failures = []
+  for rowid, tce in tce_table.iterrows():
+    try:
+      example = _process_tce(tce)
+    except preprocess.PROCESSING_ERRORS as e:
+      error = "{}: {}".format(type(e).__name__, e)
+      tf.logging.warning("Failed to process TCE %s (kepid=%s): %s", rowid,
+                         tce.kepid, error)
+      failures.append({
+          "rowid": int(rowid),
+          "kepid": int(tce.kepid),
+          "tce_plnt_num": int(tce.tce_plnt_num),
+          "error": error,
+      })
+      continue
+    if example is not None:
+      serialized_examples.append(example.SerializeToString())
+
+  return shard_index, unit_index, serialized_examples, failures
 
 
-def _process_file_shard(tce_table, file_name):
-  """Processes a single file shard.
+def _process_work_unit_star(args):
+  """Calls _process_work_unit with a tuple of arguments."""
+  return _process_work_unit(*args)
+
+
+def _write_shards(shards, queue):
+  """Writes processed work units to a subset of the output shards.
+
+  Work units may arrive in any order, but are written to each shard in order of
+  their unit index so that the output does not depend on worker scheduling.
 
   Args:
-    tce_table: A Pandas DateFrame containing the TCEs in the shard.
-    file_name: The output TFRecord file.
+    shards: Dict mapping shard index to (file_name, num_work_units).
+    queue: A multiprocessing.Queue of (shard_index, unit_index,
+      journal_entry, serialized_examples) tuples. None signals that there are
+      no more work units.
   """
   process_name = multiprocessing.current_process().name
+  writers = {}
+  pending = {}  # Shard index -> {unit index: serialized examples}.
+  next_unit = {}  # Shard index -> index of the next work unit to write.
+  num_written = {}  # Shard index -> number of Examples written.
+  for shard_index, (file_name, _) in shards.items():
+    writers[shard_index] = tf.python_io.TFRecordWriter(
+        file_name, options=FLAGS.compression_type)
+    pending[shard_index] = {}
+    next_unit[shard_index] = 0
+    num_written[shard_index] = 0
+
+  def _maybe_close(shard_index):
+    file_name, num_work_units = shards[shard_index]
+    if next_unit[shard_index] == num_work_units:
+      writers.pop(shard_index).close()
+      tf.logging.info("%s: Wrote %d items in shard %s", process_name,
+                      num_written[shard_index], os.path.basename(file_name))
+
+  for shard_index in shards:
+    _maybe_close(shard_index)  # Empty shards.
+
+  while True:
+    item = queue.get()
+    if item is None:
+      break
+    shard_index, unit_index, _, serialized_examples = item
+    pending[shard_index][unit_index] = serialized_examples
+    while next_unit[shard_index] in pending[shard_index]:
+      writer = writers[shard_index]
+      for serialized_example in pending[shard_index].pop(
+          next_unit[shard_index]):
+        writer.write(serialized_example)
+        num_written[shard_index] += 1
+      next_unit[shard_index] += 1
+      _maybe_close(shard_index)
+
+  if writers:
+    raise ValueError("Incomplete shards: {}".format(
+        [os.path.basename(shards[i][0]) for i in writers]))
+
+
+def _journal_paths(journal_dir, file_name):
+  """Returns the journal file, unit directory and done file for a shard."""
   shard_name = os.path.basename(file_name)
-  shard_size = len(tce_table)
-  tf.logging.info("%s: Processing %d items in shard %s", process_name,
-                  shard_size, shard_name)
+  return (os.path.join(journal_dir, shard_name + ".journal"),
+          os.path.join(journal_dir, shard_name),
+          os.path.join(journal_dir, shard_name + ".done"))
 
-  with tf.python_io.TFRecordWriter(file_name) as writer:
-    num_processed = 0
-    for _, tce in tce_table.iterrows():
-      example = _process_tce(tce)
-      if example is not None:
-        writer.write(example.SerializeToString())
 
-      num_processed += 1
-      if not num_processed % 10:
-        tf.logging.info("%s: Processed %d/%d items in shard %s", process_name,
-                        num_processed, shard_size, shard_name)
+def _unit_file_name(unit_dir, unit_index):
+  return os.path.join(unit_dir, "unit-{:05d}".format(unit_index))
 
-  tf.logging.info("%s: Wrote %d items in shard %s", process_name, shard_size,
-                  shard_name)
+
+def _read_journal(journal_file):
+  """Reads the journal of a shard.
+
+  Args:
+    journal_file: The journal file of the shard.
+
+  Returns:
+    A dict mapping the index of each completed work unit to its journal entry,
+    which is a dict with keys 'unit_index', 'rowids' and 'failures'.
+  """
+  entries = {}
+  if not tf.gfile.Exists(journal_file):
+    return entries
+
+  with tf.gfile.GFile(journal_file) as f:
+    for line in f:
+      try:
+        entry = json.loads(line)
+      except ValueError:
+        # The last line is truncated if the previous run was interrupted while
+        # writing it. That work unit will be processed again.
+        continue
+      entries[entry["unit_index"]] = entry
+  return entries
+
+
+def _terminate_journal(journal_file):
+  """Ends a journal truncated by an interrupted run with a newline.
+
+  Otherwise the next journal entry would be appended to the truncated line and
+  be skipped by _read_journal().
+  """
+  if not tf.gfile.Exists(journal_file):
+    return
+  with tf.gfile.GFile(journal_file) as f:
+    contents = f.read()
+  if contents and not contents.endswith("\n"):
+    with tf.gfile.GFile(journal_file, "a") as f:
+      f.write("\n")
+
+
+def _write_records(file_name, serialized_examples):
+  """Atomically writes serialized Examples to an uncompressed TFRecord file."""
+  tmp_file_name = file_name + ".tmp"
+  with tf.python_io.TFRecordWriter(tmp_file_name) as writer:
+    for serialized_example in serialized_examples:
+      writer.write(serialized_example)
+  tf.gfile.Rename(tmp_file_name, file_name, overwrite=True)
+
+
+def _assemble_shard(file_name, num_work_units, journal_dir):
+  """Copies the work units of a completed shard into the output file."""
+  _, unit_dir, done_file = _journal_paths(journal_dir, file_name)
+  tmp_file_name = file_name + ".tmp"
+  with tf.python_io.TFRecordWriter(
+      tmp_file_name, options=FLAGS.compression_type) as writer:
+    for unit_index in range(num_work_units):
+      for serialized_example in tf.python_io.tf_record_iterator(
+          _unit_file_name(unit_dir, unit_index)):
+        writer.write(serialized_example)
+  tf.gfile.Rename(tmp_file_name, file_name, overwrite=True)
+
+  with tf.gfile.GFile(done_file, "w") as f:
+    f.write("")
+  tf.gfile.DeleteRecursively(unit_dir)
+  tf.logging.info("%s: Assembled shard %s from %d work units",
+                  multiprocessing.current_process().name,
+                  os.path.basename(file_name), num_work_units)
+
+
+def _write_journaled_shards(shards, queue, journal_dir):
+  """Writes processed work units to a subset of the output shards.
+
+  Each work unit is written to its own file and then recorded in the journal of
+  its shard. Once every work unit of a shard is complete, including those
+  completed by previous runs, they are concatenated into the output file.
+
+  Args:
+    shards: Dict mapping shard index to (file_name, num_work_units,
+      num_completed_units), where num_completed_units is the number of work
+      units completed by previous runs.
+    queue: A multiprocessing.Queue of (shard_index, unit_index,
+      journal_entry, serialized_examples) tuples. None signals that there are
+      no more work units.
+    journal_dir: The journal directory.
+  """
+  num_remaining = {}  # Shard index -> number of incomplete work units.
+  for shard_index, (file_name, num_work_units,
+                    num_completed_units) in shards.items():
+    journal_file, unit_dir, _ = _journal_paths(journal_dir, file_name)
+    tf.gfile.MakeDirs(unit_dir)
+    _terminate_journal(journal_file)
+    num_remaining[shard_index] = num_work_units - num_completed_units
+    if not num_remaining[shard_index]:
+      _assemble_shard(file_name, num_work_units, journal_dir)
+
+  while True:
+    item = queue.get()
+    if item is None:
+      break
+    shard_index, unit_index, journal_entry, serialized_examples = item
+    file_name, num_work_units, _ = shards[shard_index]
+    journal_file, unit_dir, _ = _journal_paths(journal_dir, file_name)
+
+    # Write the work unit before journaling it, so that every work unit in the
+    # journal exists on disk.
+    _write_records(_unit_file_name(unit_dir, unit_index), serialized_examples)
+    with tf.gfile.GFile(journal_file, "a") as f:
+      f.write(json.dumps(journal_entry) + "\n")
+
+    num_remaining[shard_index] -= 1
+    if not num_remaining[shard_index]:
+      _assemble_shard(file_name, num_work_units, journal_dir)
+
+  incomplete = [i for i, n in num_remaining.items() if n]
+  if incomplete:
+    raise ValueError("Incomplete shards: {}".format(
+        [os.path.basename(shards[i][0]) for i in incomplete]))
+
+
+class _ProgressReporter(object):
+  """Periodically logs the number of processed TCEs and the throughput."""
+
+  def __init__(self, num_tces, interval_secs=_PROGRESS_INTERVAL_SECS):
+    self._num_tces = num_tces
+    self._interval_secs = interval_secs
+    self._num_processed = 0
+    self._start_time = time.time()
+    self._last_report_time = self._start_time
+
+  def update(self, num_processed, force=False):
+    """Records newly processed TCEs and logs progress if it is due."""
+    self._num_processed += num_processed
+    now = time.time()
+    if not force and now - self._last_report_time < self._interval_secs:
+      return
+    self._last_report_time = now
+
+    elapsed = now - self._start_time
+    tces_per_sec = self._num_processed / elapsed if elapsed else 0
+    remaining = self._num_tces - self._num_processed
+    eta_secs = remaining / tces_per_sec if tces_per_sec else float("inf")
+    tf.logging.info("Processed %d/%d TCEs (%.1f TCEs/sec, %.0f sec remaining)",
+                    self._num_processed, self._num_tces, tces_per_sec,
+                    eta_secs)
 
 
 def main(argv):
@@ -230,22 +511,115 @@ def main(argv):
                       os.path.join(FLAGS.output_dir, "test-00000-of-00001")))
   num_file_shards = len(file_shards)
 
-  # Launch subprocesses for the file shards.
-  num_processes = min(num_file_shards, FLAGS.num_worker_processes)
-  tf.logging.info("Launching %d subprocesses for %d total file shards",
-                  num_processes, num_file_shards)
-
-  pool = multiprocessing.Pool(processes=num_processes)
-  async_results = [
-      pool.apply_async(_process_file_shard, file_shard)
-      for file_shard in file_shards
-  ]
-  pool.close()
-
-  # Instead of pool.join(), we call async_result.get() to ensure any exceptions
-  # raised by the worker processes are also raised here.
-  for async_result in async_results:
-    async_result.get()
+  # Split each shard into small work units, which are processed by a pool of
+  # workers in any order. Each shard is owned by a single writer process, which
+  # writes the work units of the shard in their original order.
+  work_units = []  # List of (shard_index, unit_index, tce_table_unit).
+  unit_rowids = {}  # (shard_index, unit_index) -> list of rowids.
+  failures = []  # TCEs that could not be processed.
+  num_writers = min(num_file_shards, FLAGS.num_writer_processes)
+  writer_shards = [{} for _ in range(num_writers)]
+  if FLAGS.journal_dir:
+    tf.gfile.MakeDirs(FLAGS.journal_dir)
+  for shard_index, (shard_tces, file_name) in enumerate(file_shards):
+    journal = {}
+    if FLAGS.journal_dir:
+      journal_file, _, done_file = _journal_paths(FLAGS.journal_dir, file_name)
+      journal = _read_journal(journal_file)
+
+    unit_starts = range(0, len(shard_tces), FLAGS.work_unit_size)
+    num_completed_units = 0
+    for unit_index, start in enumerate(unit_starts):
+      tce_table_unit = shard_tces[start:start + FLAGS.work_unit_size]
+      rowids = [int(rowid) for rowid in tce_table_unit.index]
+      journal_entry = journal.get(unit_index)
+      if journal_entry and journal_entry["rowids"] == rowids:
+        # Completed by a previous run.
+        failures.extend(journal_entry["failures"])
+        num_completed_units += 1
+        continue
+      work_units.append((shard_index, unit_index, tce_table_unit))
+      unit_rowids[(shard_index, unit_index)] = rowids
+
+    if not FLAGS.journal_dir:
+      writer_shard = (file_name, len(unit_starts))
+    elif tf.gfile.Exists(done_file):
+      if num_completed_units < len(unit_starts):
+        raise ValueError(
+            "Journal for completed shard {} does not match the TCE table. Use "
+            "a new --journal_dir.".format(os.path.basename(file_name)))
+      continue
+    else:
+      writer_shard = (file_name, len(unit_starts), num_completed_units)
+    writer_shards[shard_index % num_writers][shard_index] = writer_shard
+
+  num_remaining_tces = sum(len(rowids) for rowids in unit_rowids.values())
+  if num_remaining_tces < num_tces:
+    tf.logging.info("Skipping %d TCEs completed by a previous run",
+                    num_tces - num_remaining_tces)
+
+  # Launch the writer processes.
+  writer_queues = []
+  writer_processes = []
+  for shards in writer_shards:
+    queue = multiprocessing.Queue()
+    if FLAGS.journal_dir:
+      process = multiprocessing.Process(
+          target=_write_journaled_shards,
+          args=(shards, queue, FLAGS.journal_dir))
+    else:
+      process = multiprocessing.Process(
+          target=_write_shards, args=(shards, queue))
+    process.start()
+    writer_queues.append(queue)
+    writer_processes.append(process)
+
+  # Launch the worker processes.
+  tf.logging.info(
+      "Launching %d worker processes and %d writer processes for %d work units "
+      "in %d file shards", FLAGS.num_worker_processes, num_writers,
+      len(work_units), num_file_shards)
+  pool = multiprocessing.Pool(processes=FLAGS.num_worker_processes)
+  progress = _ProgressReporter(num_remaining_tces)
+  try:
+    # Any exception raised by a worker process is re-raised here.
+    for (shard_index, unit_index, serialized_examples,
+         unit_failures) in pool.imap_unordered(_process_work_unit_star,
+                                               work_units):
+      rowids = unit_rowids[(shard_index, unit_index)]
+      journal_entry = {
+          "unit_index": unit_index,
+          "rowids": rowids,
+          "failures": unit_failures,
+      }
+      writer_queues[shard_index % num_writers].put(
+          (shard_index, unit_index, journal_entry, serialized_examples))
+      failures.extend(unit_failures)
+      progress.update(len(rowids))
+  finally:
+    pool.terminate()
+    pool.join()
+    for queue in writer_queues:
+      queue.put(None)
+    for process in writer_processes:
+      process.join()
+  progress.update(0, force=True)
+
+  for process in writer_processes:
+    if process.exitcode:
+      raise RuntimeError("Writer process {} exited with code {}".format(
+          process.name, process.exitcode))
+
+  # Write the failure manifest.
+  failures.sort(key=lambda failure: failure["rowid"])
+  failure_manifest = os.path.join(FLAGS.output_dir, _FAILURE_MANIFEST_NAME)
+  with tf.gfile.GFile(failure_manifest, "w") as f:
+    pd.DataFrame(
+        failures, columns=["rowid", "kepid", "tce_plnt_num", "error"]).to_csv(
+            f, index=False)
+  if failures:
+    tf.logging.warning("Failed to process %d TCEs. See %s", len(failures),
+                       failure_manifest)
 
   tf.logging.info("Finished processing %d total file shards", num_file_shards)
 
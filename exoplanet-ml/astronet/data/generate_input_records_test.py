@@ -0,0 +1,239 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for generate_input_records.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import pandas as pd
+from six.moves import queue as queue_lib
+import tensorflow as tf
+
+from astronet.data import generate_input_records
+from tf_util import example_util
+
+_FAILURE_MANIFEST_NAME = (
+    generate_input_records._FAILURE_MANIFEST_NAME)  # pylint:disable=protected-access
+
+# Kepler ID of the TCEs whose light curve files are missing.
+_MISSING_KEPID = 1003
+
+
+def _fake_process_tce(tce):
+  """Returns an Example containing the rowid and kepid of a TCE."""
+  if tce.kepid == _MISSING_KEPID:
+    raise IOError("Failed to find .fits files for Kepler ID {}".format(
+        tce.kepid))
+  ex = tf.train.Example()
+  example_util.set_int64_feature(ex, "rowid", [tce.name])
+  example_util.set_int64_feature(ex, "kepid", [tce.kepid])
+  return ex
+
+
+def _read_rowids(file_name):
+  """Returns the rowids of the Examples in a TFRecord file."""
+  return [
+      example_util.get_int64_feature(
+          tf.train.Example.FromString(record), "rowid")[0]
+      for record in tf.python_io.tf_record_iterator(file_name)
+  ]
+
+
+def _write_tce_table(file_name, num_tces):
+  """Writes a TCE table in which every fifth TCE has an unknown label."""
+  labels = ["PC", "AFP", "NTP", "PC", "UNK"]
+  pd.DataFrame({
+      "rowid": range(1, num_tces + 1),
+      "kepid": [1000 + i // 2 for i in range(num_tces)],
+      "tce_plnt_num": [1 + i % 2 for i in range(num_tces)],
+      "tce_period": 10.0,
+      "tce_time0bk": 1.0,
+      "tce_duration": 2.4,
+      "av_training_set": [labels[i % 5] for i in range(num_tces)],
+  }).to_csv(file_name, index=False)
+
+
+class GenerateInputRecordsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(GenerateInputRecordsTest, self).setUp()
+    self._tce_csv_file = os.path.join(self.get_temp_dir(), "tces.csv")
+    _write_tce_table(self._tce_csv_file, num_tces=100)
+
+  def _run(self, output_name, process_tce_fn, journal_dir=None):
+    """Runs generate_input_records with the given function to process TCEs."""
+    output_dir = os.path.join(self.get_temp_dir(), output_name)
+    args = [
+        "--input_tce_csv_file={}".format(self._tce_csv_file),
+        "--kepler_data_dir={}".format(self.get_temp_dir()),
+        "--output_dir={}".format(output_dir),
+        "--num_train_shards=2",
+        "--num_worker_processes=1",
+        "--num_writer_processes=2",
+        "--work_unit_size=3",
+    ]
+    if journal_dir:
+      args.append("--journal_dir={}".format(journal_dir))
+    generate_input_records.FLAGS = generate_input_records.parser.parse_args(
+        args)
+    # Worker processes are forked, so they inherit the patched function.
+    with tf.test.mock.patch.object(generate_input_records, "_process_tce",
+                                   process_tce_fn):
+      generate_input_records.main(None)
+    return output_dir
+
+  def _read_shards(self, output_dir):
+    """Returns a dict mapping each shard name to the rowids it contains."""
+    return {
+        name: _read_rowids(os.path.join(output_dir, name))
+        for name in tf.gfile.ListDirectory(output_dir)
+        if name.endswith("-of-00001") or name.startswith("train-")
+    }
+
+  def testWriteShardsInOrder(self):
+    generate_input_records.FLAGS = generate_input_records.parser.parse_args([
+        "--input_tce_csv_file=", "--kepler_data_dir=", "--output_dir="
+    ])
+    tce_table = pd.read_csv(self._tce_csv_file, index_col="rowid")
+
+    # Two shards, whose TCEs are not in rowid order, split into work units of
+    # 3 TCEs.
+    shard_tces = [tce_table.iloc[40:0:-2], tce_table.iloc[41:60:2]]
+    work_units = []
+    shards = {}
+    for shard_index, tces in enumerate(shard_tces):
+      unit_starts = range(0, len(tces), 3)
+      for unit_index, start in enumerate(unit_starts):
+        work_units.append((shard_index, unit_index, tces[start:start + 3]))
+      file_name = os.path.join(self.get_temp_dir(),
+                               "shard-{}".format(shard_index))
+      shards[shard_index] = (file_name, len(unit_starts))
+
+    # Work units finish in reverse order.
+    queue = queue_lib.Queue()
+    with tf.test.mock.patch.object(generate_input_records, "_process_tce",
+                                   _fake_process_tce):
+      for work_unit in reversed(work_units):
+        shard_index, unit_index, serialized_examples, _ = (
+            generate_input_records._process_work_unit_star(work_unit))  # pylint:disable=protected-access
+        queue.put((shard_index, unit_index, None, serialized_examples))
+    queue.put(None)
+    generate_input_records._write_shards(shards, queue)  # pylint:disable=protected-access
+
+    # Each shard contains its TCEs in table order, except for the TCEs that
+    # failed.
+    for shard_index, tces in enumerate(shard_tces):
+      expected_rowids = [
+          rowid for rowid, tce in tces.iterrows()
+          if tce.kepid != _MISSING_KEPID
+      ]
+      self.assertEqual(expected_rowids, _read_rowids(shards[shard_index][0]))
+
+  def testFailedTces(self):
+    output_dir = self._run("output", _fake_process_tce)
+
+    shards = self._read_shards(output_dir)
+    self.assertCountEqual([
+        "train-00000-of-00002", "train-00001-of-00002", "val-00000-of-00001",
+        "test-00000-of-00001"
+    ], shards)
+
+    # Every TCE with an allowed label is written exactly once, except for the
+    # TCEs that failed.
+    all_rowids = sum(shards.values(), [])
+    expected_rowids = [
+        i for i in range(1, 101) if i % 5 and 1000 + (i - 1) // 2 != 1003
+    ]
+    self.assertCountEqual(expected_rowids, all_rowids)
+
+    failures = pd.read_csv(os.path.join(output_dir, _FAILURE_MANIFEST_NAME))
+    self.assertEqual([7, 8], list(failures.rowid))
+    self.assertEqual([1003, 1003], list(failures.kepid))
+    self.assertEqual([1, 2], list(failures.tce_plnt_num))
+    for error in failures.error:
+      self.assertIn("Failed to find .fits files for Kepler ID 1003", error)
+
+  def testUnexpectedError(self):
+
+    def _process_tce(tce):
+      if tce.name == 1:
+        raise RuntimeError("Bug")
+      return _fake_process_tce(tce)
+
+    # Errors other than processing errors stop the run.
+    with self.assertRaisesRegexp(RuntimeError, "Bug"):
+      self._run("output", _process_tce)
+
+  def testResume(self):
+    expected_shards = self._read_shards(self._run("clean", _fake_process_tce))
+    expected_failures = pd.read_csv(
+        os.path.join(self.get_temp_dir(), "clean", _FAILURE_MANIFEST_NAME))
+
+    # Interrupt the first run in the middle of the validation shard. The single
+    # worker process processes the shards in order, so the training shards are
+    # complete and the validation shard is partially journaled.
+    val_rowids = expected_shards["val-00000-of-00001"]
+    interrupt_rowid = val_rowids[4]
+
+    def _interrupted_process_tce(tce):
+      if tce.name == interrupt_rowid:
+        raise RuntimeError("Interrupted")
+      return _fake_process_tce(tce)
+
+    journal_dir = os.path.join(self.get_temp_dir(), "journal")
+    with self.assertRaisesRegexp(RuntimeError, "Interrupted"):
+      self._run("resumed", _interrupted_process_tce, journal_dir)
+
+    # Simulate a run that was interrupted while writing a journal entry.
+    val_journal_file = os.path.join(journal_dir, "val-00000-of-00001.journal")
+    with tf.gfile.GFile(val_journal_file, "a") as f:
+      f.write('{"unit_index": 1, "rowi')
+
+    # The resumed run only processes the TCEs that were not completed. The
+    # worker process appends the rowid of each processed TCE to a file.
+    processed_file = os.path.join(self.get_temp_dir(), "processed.txt")
+
+    def _resumed_process_tce(tce):
+      with open(processed_file, "a") as f:
+        f.write("{}\n".format(tce.name))
+      return _fake_process_tce(tce)
+
+    output_dir = self._run("resumed", _resumed_process_tce, journal_dir)
+    self.assertEqual(expected_shards, self._read_shards(output_dir))
+    pd.testing.assert_frame_equal(
+        expected_failures,
+        pd.read_csv(os.path.join(output_dir, _FAILURE_MANIFEST_NAME)))
+
+    with open(processed_file) as f:
+      processed_rowids = [int(line) for line in f]
+    self.assertIn(interrupt_rowid, processed_rowids)
+    self.assertNotIn(val_rowids[0], processed_rowids)
+    for name in ["train-00000-of-00002", "train-00001-of-00002"]:
+      for rowid in expected_shards[name]:
+        self.assertNotIn(rowid, processed_rowids)
+
+    # A third run finds every shard complete.
+    def _unexpected_process_tce(tce):
+      raise RuntimeError("Unexpected TCE {}".format(tce.name))
+
+    output_dir = self._run("resumed", _unexpected_process_tce, journal_dir)
+    self.assertEqual(expected_shards, self._read_shards(output_dir))
+
+
+if __name__ == "__main__":
+  tf.test.main()
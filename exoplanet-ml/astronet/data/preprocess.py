@@ -27,6 +27,13 @@ from light_curve import util
 from tf_util import example_util
 from third_party.kepler_spline import kepler_spline
 
+# Errors raised when a light curve or TCE cannot be processed, for example
+# because its light curve files are missing or unreadable, or because too few
+# points remain for the spline fit. Any other error indicates a bug.
+PROCESSING_ERRORS = (IOError, OSError, KeyError, ValueError,
+                     kepler_spline.InsufficientPointsError,
+                     kepler_spline.SplineError)
+
 
 def read_light_curve(kepid, kepler_data_dir):
   """Reads a Kepler light curve.
@@ -218,7 +225,34 @@ def local_view(time,
       t_max=min(period / 2, duration * num_durations))
 
 
-def generate_example_for_tce(time, flux, tce):
+# Encodings of time series features in output tf.train.Examples.
+#   float_list: A repeated float feature with one value per bin.
+#   raw_float32: A single bytes value containing little-endian float32 values.
+TIME_SERIES_FORMATS = ("float_list", "raw_float32")
+
+
+def set_time_series_feature(ex, name, value, time_series_format="float_list"):
+  """Sets a time series feature in a tf.train.Example.
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to set.
+    value: 1D NumPy array; the time series values.
+    time_series_format: One of TIME_SERIES_FORMATS.
+
+  Raises:
+    ValueError: If time_series_format is unrecognized.
+  """
+  if time_series_format == "float_list":
+    example_util.set_float_array_feature(ex, name, value)
+  elif time_series_format == "raw_float32":
+    example_util.set_raw_float_feature(ex, name, value)
+  else:
+    raise ValueError(
+        "Unrecognized time_series_format: {}".format(time_series_format))
+
+
+def generate_example_for_tce(time, flux, tce, time_series_format="float_list"):
   """Generates a tf.train.Example representing an input TCE.
 
   Args:
@@ -226,6 +260,8 @@ def generate_example_for_tce(time, flux, tce):
     flux: 1D NumPy array; the normalized flux values of the light curve.
     tce: Dict-like object containing at least 'tce_period', 'tce_duration', and
       'tce_time0bk'. Additional items are included as features in the output.
+    time_series_format: Encoding of the 'global_view' and 'local_view'
+      features; one of TIME_SERIES_FORMATS.
 
   Returns:
     A tf.train.Example containing features 'global_view', 'local_view', and all
@@ -241,10 +277,11 @@ def generate_example_for_tce(time, flux, tce):
   ex = tf.train.Example()
 
   # Set time series features.
-  example_util.set_float_feature(ex, "global_view",
-                                 global_view(time, flux, period))
-  example_util.set_float_feature(ex, "local_view",
-                                 local_view(time, flux, period, duration))
+  set_time_series_feature(ex, "global_view", global_view(time, flux, period),
+                          time_series_format)
+  set_time_series_feature(ex, "local_view",
+                          local_view(time, flux, period, duration),
+                          time_series_format)
 
   # Set other features in `tce`.
   for name, value in tce.items():
@@ -0,0 +1,207 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Exports a trained AstroNet model for inference.
+
+The latest checkpoint in --model_dir is restored into an inference-only graph
+(the model in PREDICT mode, fed by a float32 placeholder per input feature, with
+no optimizer slots, losses or input pipeline). Its variables are converted to
+constants and the graph is optimized by folding constants and stripping unused
+nodes. The output directory contains:
+  frozen_graph.pb: The serialized GraphDef.
+  signature.json: The names of the input and output tensors, and the model
+    configuration.
+
+With --export_tflite, the frozen graph is also converted to TensorFlow Lite
+models with float32 weights (model.tflite) and with dynamic-range quantized int8
+weights (model_quantized.tflite). The quantized model is about 4x smaller and
+its matrix multiplications and convolutions use int8 weights on CPU; use
+astronet.benchmark_quantization to measure its accuracy and throughput.
+
+The exported models can be loaded with predictor.load_exported_predictor(), e.g.
+by passing --export_dir and --export_format to astronet.predict or
+astronet.batch_predict.
+
+Example usage:
+
+  python -m astronet.export_model \
+    --model=AstroCNNModel \
+    --config_name=local_global \
+    --model_dir=${HOME}/astronet/model \
+    --output_dir=${HOME}/astronet/exported_model
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os.path
+import sys
+
+import tensorflow as tf
+from tensorflow.tools.graph_transforms import TransformGraph
+
+from astronet import models
+from astronet.util import predictor
+from tf_util import config_util
+from tf_util import configdict
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--model", type=str, required=True, help="Name of the model class.")
+
+parser.add_argument(
+    "--config_name",
+    type=str,
+    help="Name of the model and training configuration. Exactly one of "
+    "--config_name or --config_json is required.")
+
+parser.add_argument(
+    "--config_json",
+    type=str,
+    help="JSON string or JSON file containing the model and training "
+    "configuration. Exactly one of --config_name or --config_json is required.")
+
+parser.add_argument(
+    "--model_dir",
+    type=str,
+    required=True,
+    help="Directory containing a model checkpoint.")
+
+parser.add_argument(
+    "--output_dir",
+    type=str,
+    required=True,
+    help="Directory in which to save the exported model.")
+
+parser.add_argument(
+    "--export_tflite",
+    action="store_true",
+    help="Whether to also convert the exported graph to TensorFlow Lite models "
+    "with float32 weights and with dynamic-range quantized (int8) weights.")
+
+# Graph transforms applied to the frozen graph.
+_GRAPH_TRANSFORMS = [
+    "strip_unused_nodes(type=float)",
+    "remove_nodes(op=Identity, op=CheckNumerics)",
+    "fold_constants(ignore_errors=true)",
+    "sort_by_execution_order",
+]
+
+
+def export_frozen_graph(model_class, config, checkpoint_file, output_dir):
+  """Exports an optimized inference graph with the variables as constants.
+
+  Args:
+    model_class: Model class.
+    config: ConfigDict containing the model configuration.
+    checkpoint_file: Checkpoint to restore.
+    output_dir: Directory in which to save the exported model.
+  """
+  with tf.Graph().as_default() as graph:
+    placeholders, model = predictor.build_inference_graph(model_class, config)
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+      saver.restore(sess, checkpoint_file)
+      graph_def = tf.graph_util.convert_variables_to_constants(
+          sess, graph.as_graph_def(), [model.predictions.op.name])
+
+  input_names = [placeholder.op.name for placeholder in placeholders.values()]
+  graph_def = TransformGraph(graph_def, input_names,
+                             [model.predictions.op.name], _GRAPH_TRANSFORMS)
+  tf.logging.info("Exported graph has %d nodes", len(graph_def.node))
+
+  tf.gfile.MakeDirs(output_dir)
+  with tf.gfile.Open(
+      os.path.join(output_dir, predictor.FROZEN_GRAPH_FILE_NAME), "wb") as f:
+    f.write(graph_def.SerializeToString())
+
+  signature = {
+      "inputs": {
+          name: placeholder.name for name, placeholder in placeholders.items()
+      },
+      "predictions": model.predictions.name,
+      "config": config,
+  }
+  with tf.gfile.Open(
+      os.path.join(output_dir, predictor.SIGNATURE_FILE_NAME), "w") as f:
+    json.dump(signature, f, indent=2)
+
+
+def export_tflite(output_dir, feature_config, quantize):
+  """Converts an exported frozen graph to a TensorFlow Lite model.
+
+  Args:
+    output_dir: Directory containing the output of export_frozen_graph().
+    feature_config: ConfigDict containing the feature configurations.
+    quantize: Whether to quantize the weights to int8 (dynamic-range
+      quantization). Activations are computed in float32.
+  """
+  with tf.gfile.Open(
+      os.path.join(output_dir, predictor.SIGNATURE_FILE_NAME)) as f:
+    signature = json.load(f)
+  input_arrays = [signature["inputs"][name].split(":")[0]
+                  for name in feature_config]
+  # TensorFlow Lite requires a fixed batch size. The model is converted with a
+  # batch size of 1 and TFLitePredictor predicts one example at a time.
+  input_shapes = {
+      signature["inputs"][name].split(":")[0]: [1, feature.length]
+      for name, feature in feature_config.items()
+  }
+  converter = tf.lite.TFLiteConverter.from_frozen_graph(
+      os.path.join(output_dir, predictor.FROZEN_GRAPH_FILE_NAME),
+      input_arrays=input_arrays,
+      output_arrays=[signature["predictions"].split(":")[0]],
+      input_shapes=input_shapes)
+  if quantize:
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+  tflite_model = converter.convert()
+
+  file_name = (
+      predictor.QUANTIZED_TFLITE_FILE_NAME
+      if quantize else predictor.TFLITE_FILE_NAME)
+  with tf.gfile.Open(os.path.join(output_dir, file_name), "wb") as f:
+    f.write(tflite_model)
+  tf.logging.info("Wrote %s (%d bytes)", file_name, len(tflite_model))
+
+
+def main(_):
+  model_class = models.get_model_class(FLAGS.model)
+
+  # Look up the model configuration.
+  assert (FLAGS.config_name is None) != (FLAGS.config_json is None), (
+      "Exactly one of --config_name or --config_json is required.")
+  config = (
+      models.get_model_config(FLAGS.model, FLAGS.config_name)
+      if FLAGS.config_name else config_util.parse_json(FLAGS.config_json))
+  config = configdict.ConfigDict(config)
+
+  checkpoint_file = tf.train.latest_checkpoint(FLAGS.model_dir)
+  if not checkpoint_file:
+    raise ValueError("No checkpoint file found in: {}".format(FLAGS.model_dir))
+
+  export_frozen_graph(model_class, config, checkpoint_file, FLAGS.output_dir)
+  if FLAGS.export_tflite:
+    for quantize in [False, True]:
+      export_tflite(FLAGS.output_dir, config.inputs.features, quantize)
+  tf.logging.info("Exported %s to %s", checkpoint_file, FLAGS.output_dir)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
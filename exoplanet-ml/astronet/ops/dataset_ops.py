@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+
+import numpy as np
 import six
 import tensorflow as tf
 
@@ -129,6 +131,38 @@ def set_batch_size(dataset, batch_size):
   return dataset.map(lambda t: _recursive_set_batch_size(t, batch_size))
 
 
+def _decode_quantized_array(serialized, encoding, length, ndims):
+  """Decodes a batch of arrays encoded by set_quantized_array_feature().
+
+  Args:
+    serialized: String Tensor of shape [batch_size]; the encoded arrays.
+    encoding: One of tf_util.example_util.QUANTIZED_ENCODINGS.
+    length: Length of each array.
+    ndims: Number of channels of each array.
+
+  Returns:
+    float32 Tensor of shape [batch_size, length, ndims].
+
+  Raises:
+    ValueError: If encoding is unrecognized.
+  """
+  if encoding == "float16":
+    value = tf.decode_raw(serialized, tf.float16, little_endian=True)
+    return tf.cast(tf.reshape(value, [-1, length, ndims]), tf.float32)
+
+  if encoding == "int8":
+    # The per-channel float32 scales precede the int8 values.
+    scale_size = 4 * ndims
+    scale = tf.decode_raw(
+        tf.substr(serialized, 0, scale_size), tf.float32, little_endian=True)
+    quantized = tf.decode_raw(
+        tf.substr(serialized, scale_size, length * ndims), tf.int8)
+    value = tf.cast(tf.reshape(quantized, [-1, length, ndims]), tf.float32)
+    return value * tf.expand_dims(tf.reshape(scale, [-1, ndims]), 1)
+
+  raise ValueError("Unrecognized encoding: {}".format(encoding))
+
+
 def build_dataset(file_pattern,
                   input_config,
                   batch_size,
@@ -137,14 +171,21 @@ def build_dataset(file_pattern,
                   shuffle_filenames=False,
                   shuffle_values_buffer=0,
                   repeat=1,
-                  use_tpu=False):
+                  use_tpu=False,
+                  cache_filename=None):
   """Builds an input pipeline that reads a dataset from sharded TFRecord files.
 
   Args:
     file_pattern: File pattern matching input TFRecord files, e.g.
       "/tmp/train-?????-of-00100". May also be a comma-separated list of file
       patterns.
-    input_config: ConfigDict containing feature and label specifications.
+    input_config: ConfigDict containing feature and label specifications. May
+      contain 'time_series_format', which is 'float_list' (the default) or
+      'raw_float32'; see astronet.data.preprocess.TIME_SERIES_FORMATS. May also
+      contain 'compression_type' of the input files: '' (the default), 'GZIP'
+      or 'ZLIB'. A subcomponent of a time series feature may set 'encoding' to
+      one of tf_util.example_util.QUANTIZED_ENCODINGS, in which case all of
+      its dimensions are read from a single bytes feature.
     batch_size: The number of examples per batch.
     include_labels: Whether to read labels from the input files.
     reverse_time_series_prob: If > 0, the time series features will be randomly
@@ -156,6 +197,15 @@ def build_dataset(file_pattern,
     repeat: The number of times to repeat the dataset. If None or -1 the dataset
       will repeat indefinitely.
     use_tpu: Whether to build the dataset for TPU.
+    cache_filename: If not None, parsed examples are cached before shuffling and
+      reversing, so that the input files are only read and parsed in the first
+      epoch. The cache is only complete once an iterator has read a full epoch;
+      an iterator that stops earlier does not leave a reusable cache. If empty,
+      examples are cached in memory, which only lasts as long as the iterator,
+      so it only helps when a single iterator reads several epochs. Otherwise
+      they are cached in this file, which persists between calls once it is
+      complete. The cache file must not be shared between datasets or input
+      configurations.
 
   Raises:
     ValueError: If an input file pattern does not match any files, or if the
@@ -196,40 +246,71 @@ def build_dataset(file_pattern,
     label_to_id = tf.contrib.lookup.HashTable(
         table_initializer, default_value=-2)
 
-  def _example_parser(serialized_example):
-    """Parses a single tf.Example into feature and label tensors."""
+  # Encoding of the time series features; see
+  # astronet.data.preprocess.TIME_SERIES_FORMATS.
+  time_series_format = input_config.get("time_series_format", "float_list")
+  if time_series_format not in ("float_list", "raw_float32"):
+    raise ValueError(
+        "Unrecognized time_series_format: {}".format(time_series_format))
+  raw_time_series = time_series_format == "raw_float32"
+
+  def _batch_parser(serialized_examples):
+    """Parses a batch of tf.Examples into feature and label tensors."""
     # Set specifications for parsing the features.
     data_fields = {}
+    raw_field_lengths = {}  # Field name -> length of decoded raw time series.
     for feature_name, feature in input_config.features.items():
-      feature_spec = tf.FixedLenFeature([feature.length], tf.float32)
       if feature.is_time_series and feature.get("subcomponents"):
+        field_names = []
         for subcomponent in feature.subcomponents:
-          if subcomponent["ndims"] > 1:
+          if subcomponent.get("encoding"):
+            # All dimensions are encoded in a single bytes feature; see
+            # tf_util.example_util.set_quantized_array_feature().
+            data_fields[subcomponent["name"]] = tf.FixedLenFeature([],
+                                                                   tf.string)
+          elif subcomponent["ndims"] > 1:
             # Time series features with multiple dimensions are encoded as
             # separate single-dimensional features 'name_0', 'name_1', ...
             for i in range(subcomponent["ndims"]):
-              field_name = "{}_{}".format(subcomponent["name"], i)
-              data_fields[field_name] = feature_spec
+              field_names.append("{}_{}".format(subcomponent["name"], i))
           else:
-            data_fields[subcomponent["name"]] = feature_spec
+            field_names.append(subcomponent["name"])
       else:
-        data_fields[feature_name] = feature_spec
+        field_names = [feature_name]
+
+      for field_name in field_names:
+        if feature.is_time_series and raw_time_series:
+          # Each time series is a single bytes value of little-endian floats.
+          data_fields[field_name] = tf.FixedLenFeature([], tf.string)
+          raw_field_lengths[field_name] = feature.length
+        else:
+          data_fields[field_name] = tf.FixedLenFeature([feature.length],
+                                                       tf.float32)
 
     if include_labels:
       data_fields[input_config.label_feature] = tf.FixedLenFeature([],
                                                                    tf.string)
 
     # Parse the features.
-    parsed_features = tf.parse_single_example(
-        serialized_example, features=data_fields)
+    parsed_features = tf.parse_example(
+        serialized_examples, features=data_fields)
+
+    # Decode raw time series bytes into [batch_size, length] float32 Tensors.
+    for field_name, length in raw_field_lengths.items():
+      value = tf.decode_raw(
+          parsed_features[field_name], tf.float32, little_endian=True)
+      parsed_features[field_name] = tf.reshape(value, [-1, length])
 
-    if reverse_time_series_prob > 0:
-      # Randomly reverse time series features with probability
-      # reverse_time_series_prob.
-      should_reverse = tf.less(
-          tf.random_uniform([], 0, 1),
-          reverse_time_series_prob,
-          name="should_reverse")
+    # Decode encoded subcomponents into [batch_size, length, ndims] Tensors.
+    for feature_name, feature in input_config.features.items():
+      if not feature.is_time_series:
+        continue
+      for subcomponent in feature.get("subcomponents") or []:
+        if subcomponent.get("encoding"):
+          name = subcomponent["name"]
+          parsed_features[name] = _decode_quantized_array(
+              parsed_features[name], subcomponent["encoding"], feature.length,
+              subcomponent["ndims"])
 
     # Reorganize outputs.
     output = {}
@@ -238,23 +319,20 @@ def build_dataset(file_pattern,
         if feature.get("subcomponents"):
           values = []
           for subcomponent in feature.subcomponents:
-            if subcomponent["ndims"] > 1:
+            if subcomponent.get("encoding"):
+              values.append(parsed_features.pop(subcomponent["name"]))
+            elif subcomponent["ndims"] > 1:
               for i in range(subcomponent["ndims"]):
                 field_name = "{}_{}".format(subcomponent["name"], i)
-                values.append(parsed_features.pop(field_name))
+                values.append(
+                    tf.expand_dims(parsed_features.pop(field_name), 2))
             else:
-              values.append(parsed_features.pop(subcomponent["name"]))
-          value = tf.stack(values, axis=1)
+              values.append(
+                  tf.expand_dims(parsed_features.pop(subcomponent["name"]), 2))
+          value = tf.concat(values, axis=2)
         else:
-          # Reshape [length] -> [length, 1].
-          value = tf.expand_dims(parsed_features.pop(feature_name), 1)
-
-        # Possibly reverse.
-        if reverse_time_series_prob > 0:
-          # pylint:disable=cell-var-from-loop
-          value = tf.cond(should_reverse, lambda: tf.reverse(value, axis=[0]),
-                          lambda: tf.identity(value))
-          # pylint:enable=cell-var-from-loop
+          # Reshape [batch_size, length] -> [batch_size, length, 1].
+          value = tf.expand_dims(parsed_features.pop(feature_name), 2)
         if "time_series_features" not in output:
           output["time_series_features"] = {}
         output["time_series_features"][feature_name] = value
@@ -266,15 +344,15 @@ def build_dataset(file_pattern,
     if include_labels:
       label_value = parsed_features.pop(input_config.label_feature)
       label_id = label_to_id.lookup(label_value)
-      # Assert the label is recognized. -1 is allowed; these will be filtered
-      # later.
-      is_known_label = tf.greater_equal(label_id, tf.constant(-1, tf.int32))
+      # Assert the labels are recognized. Examples with label -1 were already
+      # filtered.
+      is_known_label = tf.reduce_all(
+          tf.greater_equal(label_id, tf.constant(0, tf.int32)))
       assert_known_label = tf.Assert(is_known_label,
-                                     ["Unknown label string:", label_value])
+                                     ["Unknown label strings:", label_value])
       with tf.control_dependencies([assert_known_label]):
         label_id = tf.identity(label_id)
 
-      # We use the plural name "labels" in the output due to batching.
       output["labels"] = label_id
 
     # Sanity check: should have popped all parsed features by this point.
@@ -282,16 +360,65 @@ def build_dataset(file_pattern,
 
     return output
 
+  def _reverse_time_series(inputs):
+    """Randomly reverses the time series features of each example in a batch."""
+    time_series_features = inputs["time_series_features"]
+    batch_size = tf.shape(next(iter(time_series_features.values())))[0]
+    should_reverse = tf.less(
+        tf.random_uniform([batch_size], 0, 1),
+        reverse_time_series_prob,
+        name="should_reverse")
+
+    # should_reverse has shape [batch_size], so tf.where selects whole examples.
+    outputs = dict(inputs)
+    outputs["time_series_features"] = {
+        name: tf.where(should_reverse, tf.reverse(value, axis=[1]), value)
+        for name, value in time_series_features.items()
+    }
+    return outputs
+
   # Create a string dataset of filenames, and possibly shuffle.
   filename_dataset = tf.data.Dataset.from_tensor_slices(filenames)
   if len(filenames) > 1 and shuffle_filenames:
     filename_dataset = filename_dataset.shuffle(len(filenames))
 
+  def _read_tfrecord(filename):
+    return tf.data.TFRecordDataset(
+        filename, compression_type=input_config.get("compression_type", ""))
+
   # Read serialized Example protos in parallel. cycle_length is the number of
   # files to read in parallel, and block_length is the number of items to pull
   # from each file at a time.
   dataset = filename_dataset.interleave(
-      tf.data.TFRecordDataset, cycle_length=8, block_length=8)
+      _read_tfrecord,
+      cycle_length=tf.data.experimental.AUTOTUNE,
+      block_length=8,
+      num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+  if include_labels and -1 in input_config.label_map.values():
+    # Filter out examples with label -1. Only the label feature is parsed here;
+    # unknown labels are kept so that they are caught by the batch parser.
+    def include_example(serialized_example):
+      label_value = tf.parse_single_example(
+          serialized_example,
+          features={
+              input_config.label_feature: tf.FixedLenFeature([], tf.string)
+          })[input_config.label_feature]
+      return tf.not_equal(
+          label_to_id.lookup(label_value), tf.constant(-1, tf.int32))
+
+    dataset = dataset.filter(include_example)
+
+  if cache_filename is not None:
+    # Parse in batches, then cache the individual parsed examples. Shuffling
+    # and reversing happen after the cache, so they still vary between epochs.
+    # The cache is only written once a full epoch has been read, so the caller
+    # must not stop each iterator after a partial epoch.
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(
+        _batch_parser, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    dataset = dataset.apply(tf.data.experimental.unbatch())
+    dataset = dataset.cache(cache_filename)
 
   # Possibly shuffle. Note that we shuffle before repeat(), so we only shuffle
   # elements among each "epoch" of data, and not across epochs of data.
@@ -302,19 +429,16 @@ def build_dataset(file_pattern,
   if repeat != 1:
     dataset = dataset.repeat(repeat)
 
-  # Map the parser over the dataset.
-  dataset = dataset.map(_example_parser, num_parallel_calls=8)
-
-  if include_labels and -1 in input_config.label_map.values():
-    # Filter out examples with label -1 (we already asserted that all labels are
-    # at least -1, so we can simply filter out the negative labels).
-    def include_example(inputs):
-      return tf.greater_equal(inputs["labels"], tf.constant(0, tf.int32))
+  # Batch by up to batch_size. Serialized Examples are parsed as whole batches.
+  dataset = dataset.batch(batch_size)
+  if cache_filename is None:
+    dataset = dataset.map(
+        _batch_parser, num_parallel_calls=tf.data.experimental.AUTOTUNE)
 
-    dataset = dataset.filter(include_example).prefetch(1024)
+  if reverse_time_series_prob > 0:
+    dataset = dataset.map(
+        _reverse_time_series, num_parallel_calls=tf.data.experimental.AUTOTUNE)
 
-  # Batch results by up to batch_size.
-  dataset = dataset.batch(batch_size)
   if repeat == -1 or repeat is None:
     # The dataset repeats infinitely before batching, so each batch has the
     # maximum number of elements.
@@ -326,7 +450,77 @@ def build_dataset(file_pattern,
     # elements.
     dataset = pad_dataset_to_batch_size(dataset, batch_size)
 
-  # Prefetch a few batches.
-  dataset = dataset.prefetch(max(1, int(256 / batch_size)))
+  # Prefetch batches.
+  dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
 
   return dataset
+
+
+def load_dataset(file_pattern, input_config, include_labels=True):
+  """Reads and parses all examples in sharded TFRecord files into memory.
+
+  Args:
+    file_pattern: File pattern matching input TFRecord files, e.g.
+      "/tmp/train-?????-of-00100". May also be a comma-separated list of file
+      patterns.
+    input_config: ConfigDict containing feature and label specifications.
+    include_labels: Whether to read labels from the input files.
+
+  Returns:
+    A nested dict of numpy arrays with the same structure as the elements of
+    build_dataset(), where the first dimension of each array indexes examples.
+
+  Raises:
+    ValueError: If the input files contain no examples.
+  """
+  with tf.Graph().as_default():
+    dataset = build_dataset(
+        file_pattern=file_pattern,
+        input_config=input_config,
+        batch_size=256,
+        include_labels=include_labels)
+    iterator = dataset.make_initializable_iterator()
+    next_batch = iterator.get_next()
+
+    batches = []
+    with tf.Session() as sess:
+      sess.run([tf.tables_initializer(), iterator.initializer])
+      try:
+        while True:
+          batches.append(sess.run(next_batch))
+      except tf.errors.OutOfRangeError:
+        pass
+
+  if not batches:
+    raise ValueError("Found no examples matching {}".format(file_pattern))
+  return tf.nest.map_structure(lambda *arrays: np.concatenate(arrays),
+                               *batches)
+
+
+def build_dataset_from_values(values, batch_size, repeat=1, use_tpu=False):
+  """Builds an input pipeline from examples held in memory.
+
+  The values are embedded in the graph as constants, so the resulting pipeline
+  does not read or parse any files.
+
+  Args:
+    values: A nested dict of numpy arrays, as returned by load_dataset().
+    batch_size: The number of examples per batch.
+    repeat: The number of times to repeat the dataset. If None or -1 the dataset
+      will repeat indefinitely.
+    use_tpu: Whether to build the dataset for TPU.
+
+  Returns:
+    A tf.data.Dataset object.
+  """
+  dataset = tf.data.Dataset.from_tensor_slices(values)
+  if repeat != 1:
+    dataset = dataset.repeat(repeat)
+
+  dataset = dataset.batch(batch_size)
+  if repeat == -1 or repeat is None:
+    dataset = set_batch_size(dataset, batch_size)
+  elif use_tpu:
+    dataset = pad_dataset_to_batch_size(dataset, batch_size)
+
+  return dataset.prefetch(tf.data.experimental.AUTOTUNE)
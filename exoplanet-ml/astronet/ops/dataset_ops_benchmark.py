@@ -0,0 +1,125 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks reading embedding views in each encoding with build_dataset().
+
+Writes examples with the global and local AstroWaveNet embedding views of
+beam_prepare_embedding_inputs, once per embedding encoding, and reports the
+size of the TFRecord file per example and the number of examples per second
+read through the input pipeline.
+
+Usage:
+
+  python -m astronet.ops.dataset_ops_benchmark --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from astronet.ops import dataset_ops
+from tf_util import configdict
+from tf_util import example_util
+
+_NUM_EXAMPLES = 1000
+_BATCH_SIZE = 64
+_EMBEDDING_DIM = 16
+
+# Name and number of bins of each view.
+_VIEWS = [("global_view", 2001), ("local_view", 201)]
+
+
+def _write_examples(filename, encoding):
+  """Writes examples with embedding views in the given encoding."""
+  with tf.python_io.TFRecordWriter(filename) as writer:
+    for _ in range(_NUM_EXAMPLES):
+      ex = tf.train.Example()
+      for name, nbins in _VIEWS:
+        view = np.random.normal(size=[nbins, _EMBEDDING_DIM])
+        if encoding == "float_list":
+          for i, channel in enumerate(np.transpose(view)):
+            example_util.set_float_array_feature(
+                ex, "{}_emb_{}".format(name, i), channel)
+        else:
+          example_util.set_quantized_array_feature(ex, "{}_emb".format(name),
+                                                   view, encoding)
+      writer.write(ex.SerializeToString())
+
+
+def _input_config(encoding):
+  """Returns the input config for reading the embedding views."""
+  subcomponent = {"ndims": _EMBEDDING_DIM}
+  if encoding != "float_list":
+    subcomponent["encoding"] = encoding
+  features = {}
+  for name, nbins in _VIEWS:
+    subcomponent["name"] = "{}_emb".format(name)
+    features[name] = {
+        "is_time_series": True,
+        "length": nbins,
+        "subcomponents": [dict(subcomponent)],
+    }
+  return configdict.ConfigDict({"features": features})
+
+
+class DatasetOpsBenchmark(tf.test.Benchmark):
+  """Benchmarks for reading embedding views with build_dataset()."""
+
+  def benchmark_embedding_encodings(self):
+    for encoding in ["float_list"] + list(example_util.QUANTIZED_ENCODINGS):
+      filename = os.path.join(tf.test.get_temp_dir(),
+                              "{}.tfrecord".format(encoding))
+      _write_examples(filename, encoding)
+      bytes_per_example = tf.gfile.Stat(filename).length / _NUM_EXAMPLES
+
+      with tf.Graph().as_default():
+        dataset = dataset_ops.build_dataset(
+            file_pattern=filename,
+            input_config=_input_config(encoding),
+            batch_size=_BATCH_SIZE,
+            include_labels=False)
+        next_batch = dataset.make_initializable_iterator()
+        features = next_batch.get_next()
+        with tf.Session() as sess:
+          wall_times = []
+          for _ in range(3):
+            sess.run(next_batch.initializer)
+            start = time.time()
+            while True:
+              try:
+                sess.run(features)
+              except tf.errors.OutOfRangeError:
+                break
+            wall_times.append(time.time() - start)
+
+      # The first pass warms up the input pipeline.
+      wall_time = np.mean(wall_times[1:]) / _NUM_EXAMPLES
+      name = "read_embedding_views/{}".format(encoding)
+      self.report_benchmark(
+          iters=_NUM_EXAMPLES,
+          wall_time=wall_time,
+          name=name,
+          extras={"bytes_per_example": bytes_per_example})
+      print("{}: {:.0f} bytes/example, {:.0f} examples/sec".format(
+          name, bytes_per_example, 1 / wall_time))
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -26,6 +26,7 @@ import tensorflow as tf
 
 from astronet.ops import dataset_ops
 from tf_util import configdict
+from tf_util import example_util
 
 FLAGS = flags.FLAGS
 
@@ -460,6 +461,66 @@ class BuildDatasetTest(tf.test.TestCase):
       with self.assertRaises(tf.errors.OutOfRangeError):
         sess.run(labels)
 
+  def testLabelFilteringOnlyParsesLabels(self):
+    # Examples with label -1 are filtered before their features are parsed, so
+    # they do not need to have the configured features.
+    mixed_file = os.path.join(self.get_temp_dir(), "mixed.tfrecord")
+    with tf.python_io.TFRecordWriter(mixed_file) as writer:
+      for i in range(6):
+        ex = tf.train.Example()
+        if i % 2:
+          example_util.set_bytes_feature(ex, "label_str", ["AFP"])
+        else:
+          example_util.set_float_feature(ex, "global_view", np.arange(8))
+          example_util.set_float_feature(ex, "local_view", np.arange(4))
+          example_util.set_float_feature(ex, "aux_feature", [100 + i])
+          example_util.set_bytes_feature(ex, "label_str", ["PC"])
+        writer.write(ex.SerializeToString())
+
+    self._input_config["label_feature"] = "label_str"
+    self._input_config["label_map"] = {"PC": 0, "AFP": -1}
+    dataset = dataset_ops.build_dataset(
+        file_pattern=mixed_file,
+        input_config=self._input_config,
+        batch_size=4)
+
+    iterator = dataset.make_initializable_iterator()
+    inputs = iterator.get_next()
+    init_op = tf.tables_initializer()
+
+    with self.session() as sess:
+      sess.run([init_op, iterator.initializer])
+      f = sess.run(inputs)
+      np.testing.assert_array_equal([0, 0, 0], f["labels"])
+      np.testing.assert_array_almost_equal([[100], [102], [104]],
+                                           f["aux_features"]["aux_feature"])
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(inputs)
+
+  def testLabelFilteringUnknownLabelRaisesValueError(self):
+    self._input_config["label_feature"] = "label_str"
+
+    # label_map does not include "NTP", which is not filtered.
+    self._input_config["label_map"] = {"PC": 0, "AFP": -1}
+
+    dataset = dataset_ops.build_dataset(
+        file_pattern=self._file_pattern,
+        input_config=self._input_config,
+        batch_size=4)
+
+    iterator = dataset.make_initializable_iterator()
+    labels = iterator.get_next()["labels"]
+    init_op = tf.tables_initializer()
+
+    with self.session() as sess:
+      sess.run([init_op, iterator.initializer])
+
+      # Unknown label "NTP".
+      with self.assertRaises(tf.errors.InvalidArgumentError):
+        sess.run(labels)
+
   def testReverseTimeSeries(self):
     dataset = dataset_ops.build_dataset(
         file_pattern=self._file_pattern,
@@ -529,6 +590,85 @@ class BuildDatasetTest(tf.test.TestCase):
       with self.assertRaises(tf.errors.OutOfRangeError):
         sess.run(features)
 
+  def testReverseTimeSeriesPerExample(self):
+    tf.set_random_seed(1234)
+    dataset = dataset_ops.build_dataset(
+        file_pattern=self._file_pattern,
+        input_config=self._input_config,
+        batch_size=10,
+        reverse_time_series_prob=0.5,
+        repeat=5,
+        include_labels=False)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+
+    global_views = []
+    local_views = []
+    with self.session() as sess:
+      for _ in range(5):
+        f = sess.run(features)
+        global_views.append(f["time_series_features"]["global_view"][:, :, 0])
+        local_views.append(f["time_series_features"]["local_view"][:, :, 0])
+        np.testing.assert_array_almost_equal([[100 + i] for i in range(10)],
+                                             f["aux_features"]["aux_feature"])
+    global_views = np.concatenate(global_views)
+    local_views = np.concatenate(local_views)
+
+    # Each example is either entirely reversed or not reversed, independently
+    # of the other examples in its batch.
+    global_reversed = np.all(global_views == np.arange(8)[::-1], axis=1)
+    local_reversed = np.all(local_views == np.arange(4)[::-1], axis=1)
+    np.testing.assert_array_equal(global_reversed, local_reversed)
+    np.testing.assert_array_equal(
+        ~global_reversed, np.all(global_views == np.arange(8), axis=1))
+    np.testing.assert_array_equal(
+        ~local_reversed, np.all(local_views == np.arange(4), axis=1))
+    self.assertTrue(np.any(global_reversed))
+    self.assertFalse(np.all(global_reversed))
+    self.assertTrue(
+        np.any([0 < np.sum(r) < 10 for r in np.split(global_reversed, 5)]))
+
+  def testInterleaveFiles(self):
+    # Write 3 files with 10 examples each. The j-th example of the i-th file has
+    # aux_feature = 100 * i + j.
+    filenames = []
+    for i in range(3):
+      filename = os.path.join(self.get_temp_dir(),
+                              "interleave-{}.tfrecord".format(i))
+      with tf.python_io.TFRecordWriter(filename) as writer:
+        for j in range(10):
+          ex = tf.train.Example()
+          example_util.set_float_feature(ex, "global_view", np.arange(8))
+          example_util.set_float_feature(ex, "local_view", np.arange(4))
+          example_util.set_float_feature(ex, "aux_feature", [100 * i + j])
+          writer.write(ex.SerializeToString())
+      filenames.append(filename)
+
+    dataset = dataset_ops.build_dataset(
+        file_pattern=",".join(filenames),
+        input_config=self._input_config,
+        batch_size=30,
+        include_labels=False)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+
+    with self.session() as sess:
+      aux_values = sess.run(features)["aux_features"]["aux_feature"][:, 0]
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(features)
+
+    # Every example is read exactly once, and the examples of each file are
+    # read in order.
+    self.assertItemsEqual([100 * i + j for i in range(3) for j in range(10)],
+                          aux_values)
+    for i in range(3):
+      file_values = [v for v in aux_values if v // 100 == i]
+      self.assertEqual(sorted(file_values), file_values)
+
   def testRepeat(self):
     dataset = dataset_ops.build_dataset(
         file_pattern=self._file_pattern,
@@ -665,6 +805,267 @@ class BuildDatasetTest(tf.test.TestCase):
       with self.assertRaises(tf.errors.OutOfRangeError):
         sess.run(features)
 
+  def testUnknownTimeSeriesFormatRaisesValueError(self):
+    self._input_config["time_series_format"] = "float64"
+    with self.assertRaises(ValueError):
+      dataset_ops.build_dataset(
+          file_pattern=self._file_pattern,
+          input_config=self._input_config,
+          batch_size=4,
+          include_labels=False)
+
+  def testCacheFile(self):
+    cache_filename = os.path.join(self.get_temp_dir(), "cache")
+    dataset = dataset_ops.build_dataset(
+        file_pattern=self._file_pattern,
+        input_config=self._input_config,
+        batch_size=4,
+        reverse_time_series_prob=1,
+        include_labels=False,
+        repeat=2,
+        cache_filename=cache_filename)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+
+    with self.session() as sess:
+      # Examples are reversed after being read from the cache in both epochs.
+      aux_features = []
+      for _ in range(5):
+        f = sess.run(features)
+        np.testing.assert_array_almost_equal(
+            [[[3], [2], [1], [0]]] * len(f["aux_features"]["aux_feature"]),
+            f["time_series_features"]["local_view"])
+        aux_features.extend(f["aux_features"]["aux_feature"][:, 0])
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(features)
+
+    np.testing.assert_array_almost_equal(
+        list(range(100, 110)) * 2, aux_features)
+    self.assertNotEmpty(tf.gfile.Glob(cache_filename + "*"))
+
+  def testCacheFileReusedByLaterIterators(self):
+    # Read from a copy of the test dataset, which is truncated after the cache
+    # is written.
+    input_file = os.path.join(self.get_temp_dir(), "input.tfrecord")
+    records = list(tf.python_io.tf_record_iterator(self._file_pattern))
+    with tf.python_io.TFRecordWriter(input_file) as writer:
+      for record in records:
+        writer.write(record)
+    cache_filename = os.path.join(self.get_temp_dir(), "cache")
+
+    def _read_aux_features():
+      """Reads one epoch in a new graph, as in each Estimator.train() call."""
+      with tf.Graph().as_default():
+        dataset = dataset_ops.build_dataset(
+            file_pattern=input_file,
+            input_config=self._input_config,
+            batch_size=4,
+            include_labels=False,
+            cache_filename=cache_filename)
+        features = dataset.make_one_shot_iterator().get_next()
+        aux_features = []
+        with self.session() as sess:
+          while True:
+            try:
+              f = sess.run(features)
+            except tf.errors.OutOfRangeError:
+              break
+            aux_features.extend(f["aux_features"]["aux_feature"][:, 0])
+        return aux_features
+
+    np.testing.assert_array_almost_equal(
+        list(range(100, 110)), _read_aux_features())
+
+    with tf.python_io.TFRecordWriter(input_file) as writer:
+      writer.write(records[0])
+
+    # The second iterator reads every example from the complete cache.
+    np.testing.assert_array_almost_equal(
+        list(range(100, 110)), _read_aux_features())
+
+  def testLoadDataset(self):
+    self._input_config["label_feature"] = "label_str"
+    self._input_config["label_map"] = {"PC": 1, "AFP": -1, "NTP": 0}
+
+    values = dataset_ops.load_dataset(self._file_pattern, self._input_config)
+    self.assertItemsEqual(["time_series_features", "aux_features", "labels"],
+                          values.keys())
+    np.testing.assert_array_equal([1, 0, 1, 0, 1, 0, 1], values["labels"])
+    np.testing.assert_array_almost_equal(
+        [[100], [102], [103], [105], [106], [108], [109]],
+        values["aux_features"]["aux_feature"])
+    self.assertEqual((7, 8, 1),
+                     values["time_series_features"]["global_view"].shape)
+
+    dataset = dataset_ops.build_dataset_from_values(values, batch_size=4)
+    iterator = dataset.make_one_shot_iterator()
+    inputs = iterator.get_next()
+
+    with self.session() as sess:
+      np.testing.assert_array_equal([1, 0, 1, 0], sess.run(inputs["labels"]))
+      np.testing.assert_array_equal([1, 0, 1], sess.run(inputs["labels"]))
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(inputs)
+
+  def testCompressedInput(self):
+    # Write a GZIP-compressed copy of the test dataset.
+    gzip_file = os.path.join(self.get_temp_dir(), "test_dataset.tfrecord.gz")
+    with tf.python_io.TFRecordWriter(gzip_file, options="GZIP") as writer:
+      for record in tf.python_io.tf_record_iterator(self._file_pattern):
+        writer.write(record)
+
+    self._input_config["compression_type"] = "GZIP"
+    dataset = dataset_ops.build_dataset(
+        file_pattern=gzip_file,
+        input_config=self._input_config,
+        batch_size=10,
+        include_labels=False)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+
+    with self.session() as sess:
+      f = sess.run(features)
+      np.testing.assert_array_almost_equal(
+          [[[0], [1], [2], [3]]] * 10, f["time_series_features"]["local_view"])
+      np.testing.assert_array_almost_equal([[100 + i] for i in range(10)],
+                                           f["aux_features"]["aux_feature"])
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(features)
+
+  def testRawFloat32TimeSeriesFormat(self):
+    # Write a copy of the test dataset with raw float32 time series features.
+    raw_file = os.path.join(self.get_temp_dir(), "raw.tfrecord")
+    with tf.python_io.TFRecordWriter(raw_file) as writer:
+      for i in range(3):
+        ex = tf.train.Example()
+        example_util.set_raw_float_feature(ex, "global_view", np.arange(8))
+        example_util.set_raw_float_feature(ex, "local_view", np.arange(4))
+        example_util.set_float_feature(ex, "aux_feature", [100 + i])
+        writer.write(ex.SerializeToString())
+
+    self._input_config["time_series_format"] = "raw_float32"
+    dataset = dataset_ops.build_dataset(
+        file_pattern=raw_file,
+        input_config=self._input_config,
+        batch_size=4,
+        include_labels=False)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+
+    self.assertEqual([None, 8, 1], features["time_series_features"]
+                     ["global_view"].shape.as_list())
+    self.assertEqual([None, 4, 1], features["time_series_features"]
+                     ["local_view"].shape.as_list())
+
+    with self.session() as sess:
+      f = sess.run(features)
+      np.testing.assert_array_almost_equal([
+          [[0], [1], [2], [3], [4], [5], [6], [7]],
+          [[0], [1], [2], [3], [4], [5], [6], [7]],
+          [[0], [1], [2], [3], [4], [5], [6], [7]],
+      ], f["time_series_features"]["global_view"])
+      np.testing.assert_array_almost_equal([
+          [[0], [1], [2], [3]],
+          [[0], [1], [2], [3]],
+          [[0], [1], [2], [3]],
+      ], f["time_series_features"]["local_view"])
+      np.testing.assert_array_almost_equal([[100], [101], [102]],
+                                           f["aux_features"]["aux_feature"])
+
+      # No more batches.
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(features)
+
+  def testQuantizedSubcomponents(self):
+    # Write examples with an embedding view in each quantized encoding, plus
+    # the view counts as a float_list feature.
+    emb = np.array([[0, 1, -2], [1, -1, 4], [2, 0, 8], [3, 1, 0]], np.float32)
+    counts = np.array([1, 2, 3, 4], np.float32)
+    quantized_file = os.path.join(self.get_temp_dir(), "quantized.tfrecord")
+    with tf.python_io.TFRecordWriter(quantized_file) as writer:
+      for i in range(3):
+        ex = tf.train.Example()
+        example_util.set_quantized_array_feature(ex, "view_emb_float16", emb,
+                                                 "float16")
+        example_util.set_quantized_array_feature(ex, "view_emb_int8", emb,
+                                                 "int8")
+        example_util.set_float_array_feature(ex, "view_emb_counts", counts)
+        writer.write(ex.SerializeToString())
+
+    input_config = configdict.ConfigDict({
+        "features": {
+            "view": {
+                "is_time_series": True,
+                "length": 4,
+                "subcomponents": [
+                    {
+                        "name": "view_emb_float16",
+                        "ndims": 3,
+                        "encoding": "float16"
+                    },
+                    {
+                        "name": "view_emb_counts",
+                        "ndims": 1
+                    },
+                    {
+                        "name": "view_emb_int8",
+                        "ndims": 3,
+                        "encoding": "int8"
+                    },
+                ]
+            },
+        },
+    })
+    dataset = dataset_ops.build_dataset(
+        file_pattern=quantized_file,
+        input_config=input_config,
+        batch_size=4,
+        include_labels=False)
+
+    iterator = dataset.make_one_shot_iterator()
+    features = iterator.get_next()
+    view = features["time_series_features"]["view"]
+    self.assertEqual([None, 4, 7], view.shape.as_list())
+
+    expected = np.concatenate([emb, counts[:, np.newaxis], emb], axis=1)
+    with self.session() as sess:
+      v = sess.run(view)
+      self.assertEqual((3, 4, 7), v.shape)
+      for i in range(3):
+        np.testing.assert_allclose(expected, v[i], atol=8 / 127 / 2)
+      # float16 represents these values exactly.
+      np.testing.assert_array_equal(emb, v[0, :, :3])
+
+  def testUnknownEncodingRaisesValueError(self):
+    input_config = configdict.ConfigDict({
+        "features": {
+            "view": {
+                "is_time_series": True,
+                "length": 4,
+                "subcomponents": [{
+                    "name": "view_emb",
+                    "ndims": 3,
+                    "encoding": "int4"
+                }]
+            },
+        },
+    })
+    with self.assertRaises(ValueError):
+      dataset_ops.build_dataset(
+          file_pattern=self._file_pattern,
+          input_config=input_config,
+          batch_size=4,
+          include_labels=False)
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -22,6 +22,8 @@ import functools
 
 import tensorflow as tf
 
+from tf_util import compute_util
+
 
 def _polynomial_decay(initial_value, global_step, decay_steps, end_factor,
                       power):
@@ -73,7 +75,8 @@ def create_optimizer(hparams, global_step, use_tpu=False):
       CrossShardOptimizer.
 
   Returns:
-    A TensorFlow optimizer.
+    A TensorFlow optimizer. If hparams.compute_dtype is "float16", the optimizer
+    applies loss scaling.
 
   Raises:
     ValueError: If hparams.optimizer is unrecognized.
@@ -106,6 +109,7 @@ def create_optimizer(hparams, global_step, use_tpu=False):
       weight_decay=weight_decay,
       learning_rate=learning_rate,
       **optimizer_params)
+  optimizer = compute_util.maybe_apply_loss_scaling(optimizer, hparams)
 
   if use_tpu:
     optimizer = tf.contrib.tpu.CrossShardOptimizer(optimizer)
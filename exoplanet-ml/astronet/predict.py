@@ -21,20 +21,21 @@ from __future__ import print_function
 import argparse
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
 import tensorflow as tf
 
 from astronet import models
 from astronet.data import preprocess
-from astronet.util import estimator_util
+from astronet.util import predictor as predictor_lib
 from tf_util import config_util
 from tf_util import configdict
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument(
-    "--model", type=str, required=True, help="Name of the model class.")
+    "--model",
+    type=str,
+    help="Name of the model class. Required unless --export_dir is set.")
 
 parser.add_argument(
     "--config_name",
@@ -51,8 +52,24 @@ parser.add_argument(
 parser.add_argument(
     "--model_dir",
     type=str,
-    required=True,
-    help="Directory containing a model checkpoint.")
+    help="Directory containing a model checkpoint, or a comma-separated list "
+    "of directories containing the checkpoints of an ensemble of models whose "
+    "predictions are averaged. Exactly one of --model_dir or --export_dir is "
+    "required.")
+
+parser.add_argument(
+    "--export_dir",
+    type=str,
+    help="Directory containing a model exported by astronet.export_model. "
+    "Loading an exported model is faster than building the model and "
+    "restoring a checkpoint from --model_dir.")
+
+parser.add_argument(
+    "--export_format",
+    type=str,
+    default="frozen_graph",
+    choices=predictor_lib.EXPORT_FORMATS,
+    help="Format of the exported model to load from --export_dir.")
 
 parser.add_argument(
     "--kepler_data_dir",
@@ -97,49 +114,31 @@ def _process_tce(feature_config):
     ValueError: If feature_config contains features other than 'global_view'
     and 'local_view'.
   """
-  if not {"global_view", "local_view"}.issuperset(feature_config.keys()):
-    raise ValueError(
-        "Only 'global_view' and 'local_view' features are supported.")
-
   # Read and process the light curve.
   all_time, all_flux = preprocess.read_light_curve(FLAGS.kepler_id,
                                                    FLAGS.kepler_data_dir)
   time, flux = preprocess.process_light_curve(all_time, all_flux)
-  time, flux = preprocess.phase_fold_and_sort_light_curve(
-      time, flux, FLAGS.period, FLAGS.t0)
 
   # Generate the local and global views.
-  features = {}
-
-  if "global_view" in feature_config:
-    global_view = preprocess.global_view(time, flux, FLAGS.period)
-    # Add a batch dimension.
-    features["global_view"] = np.expand_dims(global_view, 0)
-
-  if "local_view" in feature_config:
-    local_view = preprocess.local_view(time, flux, FLAGS.period, FLAGS.duration)
-    # Add a batch dimension.
-    features["local_view"] = np.expand_dims(local_view, 0)
+  features = predictor_lib.generate_views(time, flux, FLAGS.period, FLAGS.t0,
+                                          FLAGS.duration, feature_config)
 
   # Possibly save plots.
   if FLAGS.output_image_file:
-    ncols = len(features)
-    fig, axes = plt.subplots(1, ncols, figsize=(10 * ncols, 5), squeeze=False)
-
-    for i, name in enumerate(sorted(features)):
-      ax = axes[0][i]
-      ax.plot(features[name][0], ".")
-      ax.set_title(name)
-      ax.set_xlabel("Bucketized Time (days)")
-      ax.set_ylabel("Normalized Flux")
-
-    fig.tight_layout()
-    fig.savefig(FLAGS.output_image_file, bbox_inches="tight")
+    predictor_lib.plot_views(features, FLAGS.output_image_file)
 
   return features
 
 
-def main(_):
+def _create_predictor():
+  """Loads an exported model or restores the model from a checkpoint."""
+  assert (FLAGS.model_dir is None) != (FLAGS.export_dir is None), (
+      "Exactly one of --model_dir or --export_dir is required.")
+  if FLAGS.export_dir:
+    return predictor_lib.load_exported_predictor(FLAGS.export_dir,
+                                                 FLAGS.export_format)
+
+  assert FLAGS.model, "--model is required with --model_dir."
   model_class = models.get_model_class(FLAGS.model)
 
   # Look up the model configuration.
@@ -150,24 +149,28 @@ def main(_):
       if FLAGS.config_name else config_util.parse_json(FLAGS.config_json))
   config = configdict.ConfigDict(config)
 
-  # Create the estimator.
-  estimator = estimator_util.create_estimator(
-      model_class, config.hparams, model_dir=FLAGS.model_dir)
+  return predictor_lib.create_checkpoint_predictor(model_class, config,
+                                                   FLAGS.model_dir)
 
-  # Read and process the input features.
-  features = _process_tce(config.inputs.features)
-
-  # Create an input function.
-  def input_fn():
-    for key in features:
-        features[key] = features[key].astype(np.float32)
-    return tf.data.Dataset.from_tensors({"time_series_features": features})
 
+def main(_):
+  predictor = _create_predictor()
 
-  # Generate the predictions.
-  for predictions in estimator.predict(input_fn):
-    assert len(predictions) == 1
-    print("Prediction:", predictions[0])
+  # Read and process the input features.
+  features = _process_tce(predictor.feature_config)
+
+  # Generate the predictions. Add a batch dimension to the features.
+  features = {
+      name: np.expand_dims(value, 0) for name, value in features.items()
+  }
+  if isinstance(predictor, predictor_lib.EnsemblePredictor):
+    predictions, member_predictions = predictor.predict_with_members(features)
+    print("Member predictions:", member_predictions[0, :, 0].tolist())
+  else:
+    predictions = predictor.predict(features)
+  predictor.close()
+  assert len(predictions[0]) == 1
+  print("Prediction:", predictions[0][0])
 
 
 if __name__ == "__main__":
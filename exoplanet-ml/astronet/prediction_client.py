@@ -0,0 +1,281 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Python client for astronet.prediction_server.
+
+This module does not import TensorFlow, so scripts that only send requests do
+not pay its import time.
+
+Example usage:
+
+  client = prediction_client.PredictionClient("http://localhost:8500")
+  client.start_server_if_needed(
+      model="AstroCNNModel",
+      config_name="local_global",
+      model_dir=model_dir,
+      kepler_data_dir=kepler_data_dir)
+  prediction = client.predict_kepler_id(kepler_id, period, t0, duration)
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os.path
+import subprocess
+import sys
+import time
+
+import numpy as np
+from six.moves import urllib
+
+
+class PredictionError(Exception):
+  """Raised when the server fails to generate a prediction."""
+
+
+def _abspath(path):
+  """Makes a local path absolute. Paths with a scheme, e.g. gs://, are kept."""
+  if not path or "://" in path:
+    return path
+  return os.path.abspath(path)
+
+
+class PredictionClient(object):
+  """Sends prediction requests to a running prediction server."""
+
+  def __init__(self, address="http://localhost:8500", timeout_secs=600):
+    """Initializes the client.
+
+    Args:
+      address: Base URL of the server, e.g. "http://localhost:8500".
+      timeout_secs: Timeout for each request.
+    """
+    self._address = address.rstrip("/")
+    self._timeout_secs = timeout_secs
+
+  def server_info(self):
+    """Returns a description of the running server, or None if not serving.
+
+    Returns:
+      None if no server has loaded a model at the address. Otherwise, a
+      dictionary containing the server's model, model_dir, config_name,
+      config_json, export_dir, export_format, kepler_data_dir and
+      output_image_dir; its pid; and whether it is outdated, i.e. a newer
+      checkpoint has been written to model_dir since the model was restored.
+    """
+    try:
+      response = urllib.request.urlopen(self._address + "/health", timeout=5)
+      if response.getcode() != 200:
+        return None
+      return json.loads(response.read().decode("utf-8"))
+    except (urllib.error.URLError, IOError, ValueError):
+      return None
+
+  def is_serving(self):
+    """Returns whether the server is running and has loaded the model."""
+    return self.server_info() is not None
+
+  def _check_server(self, info, expected):
+    """Raises a PredictionError if a running server does not match expected."""
+    mismatches = [
+        "{}={!r} (expected {!r})".format(key, info.get(key), value)
+        for key, value in sorted(expected.items())
+        if info.get(key) != value
+    ]
+    if mismatches:
+      raise PredictionError(
+          "The prediction server at {} (pid {}) serves a different model: {}. "
+          "Stop it or use a different address.".format(self._address,
+                                                       info.get("pid"),
+                                                       ", ".join(mismatches)))
+    if info.get("outdated"):
+      raise PredictionError(
+          "The prediction server at {} (pid {}) has not loaded the latest "
+          "checkpoint in {}. Stop it to restart it with the new checkpoint."
+          .format(self._address, info.get("pid"), info.get("model_dir")))
+
+  def start_server_if_needed(self,
+                             model,
+                             model_dir,
+                             config_name=None,
+                             config_json=None,
+                             kepler_data_dir=None,
+                             output_image_dir=None,
+                             startup_timeout_secs=300):
+    """Starts a prediction server in the background if none is running.
+
+    The server keeps running after this process exits, so later calls (from
+    this or any other process) reuse the loaded model, provided that they
+    request the same model, configuration and directories.
+
+    Args:
+      model: Name of the model class.
+      model_dir: Directory containing a model checkpoint.
+      config_name: Name of the model configuration. Exactly one of config_name
+        or config_json is required.
+      config_json: JSON string or JSON file containing the model
+        configuration.
+      kepler_data_dir: Optional base folder containing Kepler data. Required
+        for predict_kepler_id().
+      output_image_dir: Optional directory in which the server saves plots.
+        Required for requests with an output_image_file.
+      startup_timeout_secs: Maximum time to wait for the server to load the
+        model.
+
+    Raises:
+      PredictionError: If the server does not start within
+        startup_timeout_secs, or if a server is already running at the address
+        with different arguments or without the latest checkpoint in
+        model_dir.
+    """
+    expected = {
+        "model": model,
+        "model_dir": ",".join(_abspath(d) for d in model_dir.split(",") if d),
+        "config_name": config_name,
+        "config_json": config_json,
+        "export_dir": None,
+        "kepler_data_dir": _abspath(kepler_data_dir),
+        "output_image_dir": _abspath(output_image_dir),
+    }
+    info = self.server_info()
+    if info is not None:
+      self._check_server(info, expected)
+      return
+
+    parsed = urllib.parse.urlparse(self._address)
+    cmd = [
+        sys.executable, "-m", "astronet.prediction_server",
+        "--model={}".format(model),
+        "--model_dir={}".format(expected["model_dir"]),
+        "--host={}".format(parsed.hostname), "--port={}".format(parsed.port)
+    ]
+    if config_name:
+      cmd.append("--config_name={}".format(config_name))
+    if config_json:
+      cmd.append("--config_json={}".format(config_json))
+    if kepler_data_dir:
+      cmd.append("--kepler_data_dir={}".format(expected["kepler_data_dir"]))
+    if output_image_dir:
+      cmd.append("--output_image_dir={}".format(expected["output_image_dir"]))
+
+    process = subprocess.Popen(cmd, close_fds=True)
+    deadline = time.time() + startup_timeout_secs
+    while time.time() < deadline:
+      if process.poll() is not None:
+        raise PredictionError(
+            "Prediction server exited with code {}".format(process.returncode))
+      info = self.server_info()
+      if info is not None:
+        self._check_server(info, expected)
+        return
+      time.sleep(1)
+    raise PredictionError("Prediction server did not start within {} seconds"
+                          .format(startup_timeout_secs))
+
+  def _predict(self, request):
+    """Sends a single request and returns the prediction."""
+    http_request = urllib.request.Request(
+        self._address + "/predict",
+        data=json.dumps(request).encode("utf-8"),
+        headers={"Content-Type": "application/json"})
+    try:
+      response = urllib.request.urlopen(
+          http_request, timeout=self._timeout_secs)
+      body = response.read()
+    except urllib.error.HTTPError as e:
+      try:
+        message = json.loads(e.read().decode("utf-8"))["error"]
+      except (ValueError, KeyError):
+        message = str(e)
+      raise PredictionError(message)
+    return np.array(json.loads(body.decode("utf-8"))["prediction"])
+
+  def predict_views(self, views):
+    """Generates a prediction from precomputed views.
+
+    Args:
+      views: Dictionary of 1D arrays, e.g. {"global_view": ..., "local_view":
+        ...}.
+
+    Returns:
+      Numpy array of predictions with shape [output_dim].
+    """
+    return self._predict({
+        "features": {name: np.asarray(v).tolist() for name, v in views.items()}
+    })
+
+  def predict_light_curve(self,
+                          all_time,
+                          all_flux,
+                          period,
+                          t0,
+                          duration,
+                          output_image_file=None):
+    """Generates a prediction for a TCE in a raw light curve.
+
+    Args:
+      all_time: List of arrays; the time values of each light curve segment.
+      all_flux: List of arrays; the flux values of each light curve segment.
+      period: Period of the TCE, in days.
+      t0: Epoch of the TCE.
+      duration: Duration of the TCE, in days.
+      output_image_file: If specified, the server saves a plot of the views to
+        a file of this name in its --output_image_dir.
+
+    Returns:
+      Numpy array of predictions with shape [output_dim].
+    """
+    request = {
+        "time": [np.asarray(t).tolist() for t in all_time],
+        "flux": [np.asarray(f).tolist() for f in all_flux],
+        "period": period,
+        "t0": t0,
+        "duration": duration,
+    }
+    if output_image_file:
+      request["output_image_file"] = output_image_file
+    return self._predict(request)
+
+  def predict_kepler_id(self,
+                        kepler_id,
+                        period,
+                        t0,
+                        duration,
+                        output_image_file=None):
+    """Generates a prediction for a TCE of a star in the Kepler data directory.
+
+    The light curve is read from the server's --kepler_data_dir.
+
+    Args:
+      kepler_id: Kepler ID of the target star.
+      period: Period of the TCE, in days.
+      t0: Epoch of the TCE.
+      duration: Duration of the TCE, in days.
+      output_image_file: If specified, the server saves a plot of the views to
+        a file of this name in its --output_image_dir.
+
+    Returns:
+      Numpy array of predictions with shape [output_dim].
+    """
+    request = {
+        "kepler_id": int(kepler_id),
+        "period": period,
+        "t0": t0,
+        "duration": duration,
+    }
+    if output_image_file:
+      request["output_image_file"] = output_image_file
+    return self._predict(request)
@@ -0,0 +1,135 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for prediction_client."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+import threading
+
+import tensorflow as tf
+
+from astronet import prediction_client
+from astronet import prediction_server
+
+
+def _save_checkpoint(model_dir, global_step):
+  """Saves a checkpoint containing a single variable."""
+  with tf.Graph().as_default():
+    tf.Variable(0.0, name="v")
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+      sess.run(tf.global_variables_initializer())
+      saver.save(
+          sess,
+          os.path.join(model_dir, "model.ckpt"),
+          global_step=global_step)
+
+
+class PredictionClientTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(PredictionClientTest, self).setUp()
+    self._model_dir = os.path.join(self.get_temp_dir(), "model")
+    self._kepler_data_dir = os.path.join(self.get_temp_dir(), "kepler")
+    _save_checkpoint(self._model_dir, global_step=1)
+
+    # Serve from a thread with the description of a server started with these
+    # flags. Requests to /predict are not sent.
+    prediction_server.FLAGS = prediction_server.parser.parse_args([
+        "--model=AstroCNNModel", "--config_name=local_global",
+        "--model_dir={}".format(self._model_dir),
+        "--kepler_data_dir={}".format(self._kepler_data_dir)
+    ])
+    self._server = prediction_server._PredictionServer(  # pylint:disable=protected-access
+        ("localhost", 0), prediction_server._RequestHandler)  # pylint:disable=protected-access
+    self._server.info = prediction_server._server_info()  # pylint:disable=protected-access
+    self._server.checkpoints = prediction_server._latest_checkpoints(  # pylint:disable=protected-access
+        self._model_dir)
+    thread = threading.Thread(target=self._server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    self._client = prediction_client.PredictionClient(
+        "http://localhost:{}".format(self._server.server_address[1]))
+
+  def tearDown(self):
+    self._server.shutdown()
+    self._server.server_close()
+    super(PredictionClientTest, self).tearDown()
+
+  def _start_server_if_needed(self, **kwargs):
+    """Calls start_server_if_needed(), which must not start a new server."""
+    args = {
+        "model": "AstroCNNModel",
+        "config_name": "local_global",
+        "model_dir": self._model_dir,
+        "kepler_data_dir": self._kepler_data_dir,
+    }
+    args.update(kwargs)
+    with tf.test.mock.patch.object(prediction_client.subprocess,
+                                   "Popen") as mock_popen:
+      self._client.start_server_if_needed(**args)
+    mock_popen.assert_not_called()
+
+  def testServerInfo(self):
+    info = self._client.server_info()
+    self.assertEqual("AstroCNNModel", info["model"])
+    self.assertEqual(self._model_dir, info["model_dir"])
+    self.assertEqual("local_global", info["config_name"])
+    self.assertIsNone(info["config_json"])
+    self.assertEqual(self._kepler_data_dir, info["kepler_data_dir"])
+    self.assertIsNone(info["output_image_dir"])
+    self.assertFalse(info["outdated"])
+
+  def testReuseMatchingServer(self):
+    self._start_server_if_needed()
+
+    # Relative paths are compared as absolute paths.
+    with tf.test.mock.patch.object(
+        prediction_client.os.path, "abspath",
+        lambda path: os.path.join(self.get_temp_dir(), path)):
+      self._start_server_if_needed(model_dir="model", kepler_data_dir="kepler")
+
+  def testMismatchedServer(self):
+    other_dir = os.path.join(self.get_temp_dir(), "other")
+    for kwargs, message in [
+        ({"model": "AstroFCNModel"}, "model='AstroCNNModel'"),
+        ({"model_dir": other_dir}, "model_dir="),
+        ({"config_name": None, "config_json": "{}"}, "config_json=None"),
+        ({"kepler_data_dir": other_dir}, "kepler_data_dir="),
+        ({"output_image_dir": other_dir}, "output_image_dir=None"),
+    ]:
+      with self.assertRaisesRegexp(prediction_client.PredictionError,
+                                   "serves a different model.*" + message):
+        self._start_server_if_needed(**kwargs)
+
+  def testOutdatedServer(self):
+    _save_checkpoint(self._model_dir, global_step=2)
+    self.assertTrue(self._client.server_info()["outdated"])
+    with self.assertRaisesRegexp(prediction_client.PredictionError,
+                                 "has not loaded the latest checkpoint"):
+      self._start_server_if_needed()
+
+  def testNotServing(self):
+    client = prediction_client.PredictionClient("http://localhost:1")
+    self.assertIsNone(client.server_info())
+    self.assertFalse(client.is_serving())
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,458 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Long-lived HTTP server for generating predictions with a trained model.
+
+The model checkpoint is restored once when the server starts. Concurrent
+requests are grouped into batches of up to --max_batch_size examples, waiting at
+most --batch_timeout_ms for a batch to fill.
+
+Requests are JSON objects sent by POST to /predict. Each request contains
+exactly one of:
+  features: Precomputed views, e.g. {"global_view": [...], "local_view": [...]}.
+  time, flux: Lists of light curve segments, or a single segment. Requires
+    period, t0 and duration.
+  kepler_id: Kepler ID of a target star whose light curve is read from
+    --kepler_data_dir. Requires period, t0 and duration.
+If output_image_file is specified, a plot of the views is saved to a file of
+that name in --output_image_dir. It must be a file name without any directory
+components. The response is a JSON object {"prediction": [...]}, or
+{"error": "..."} with a 4xx or 5xx status. GET /health returns 200 once the
+model is loaded, with a JSON object describing the server: its --model,
+--model_dir, --config_name, --config_json, --export_dir, --export_format,
+--kepler_data_dir and --output_image_dir (with local paths made absolute), its
+process id, and whether a newer checkpoint has been written to --model_dir since
+the model was restored. Clients use it to check that a running server serves the
+model they expect.
+
+The server has no authentication. Only listen on a --host other than localhost
+on a trusted network.
+
+See astronet/prediction_client.py for a Python client.
+
+Example usage:
+
+  python -m astronet.prediction_server \
+    --model=AstroCNNModel \
+    --config_name=local_global \
+    --model_dir=${HOME}/astronet/model \
+    --kepler_data_dir=${HOME}/astronet/kepler \
+    --port=8500
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os.path
+import sys
+import threading
+import time
+
+import numpy as np
+from six.moves import BaseHTTPServer
+from six.moves import queue
+from six.moves import socketserver
+import tensorflow as tf
+
+from astronet import models
+from astronet.data import preprocess
+from astronet.util import predictor as predictor_lib
+from tf_util import config_util
+from tf_util import configdict
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--model",
+    type=str,
+    help="Name of the model class. Required unless --export_dir is set.")
+
+parser.add_argument(
+    "--config_name",
+    type=str,
+    help="Name of the model and training configuration. Exactly one of "
+    "--config_name or --config_json is required.")
+
+parser.add_argument(
+    "--config_json",
+    type=str,
+    help="JSON string or JSON file containing the model and training "
+    "configuration. Exactly one of --config_name or --config_json is required.")
+
+parser.add_argument(
+    "--model_dir",
+    type=str,
+    help="Directory containing a model checkpoint, or a comma-separated list "
+    "of directories containing the checkpoints of an ensemble of models whose "
+    "predictions are averaged. Exactly one of --model_dir or --export_dir is "
+    "required.")
+
+parser.add_argument(
+    "--export_dir",
+    type=str,
+    help="Directory containing a model exported by astronet.export_model.")
+
+parser.add_argument(
+    "--export_format",
+    type=str,
+    default="frozen_graph",
+    choices=predictor_lib.EXPORT_FORMATS,
+    help="Format of the exported model to load from --export_dir.")
+
+parser.add_argument(
+    "--kepler_data_dir",
+    type=str,
+    help="Base folder containing Kepler data, for requests that specify a "
+    "kepler_id.")
+
+parser.add_argument(
+    "--output_image_dir",
+    type=str,
+    help="Directory in which to save the plots of requests that specify an "
+    "output_image_file. If not set, such requests are rejected.")
+
+parser.add_argument(
+    "--host",
+    type=str,
+    default="localhost",
+    help="Host name or address to listen on. The server has no "
+    "authentication, so only listen on trusted networks.")
+
+parser.add_argument(
+    "--port", type=int, default=8500, help="Port to listen on.")
+
+parser.add_argument(
+    "--max_batch_size",
+    type=int,
+    default=64,
+    help="Maximum number of requests to predict in a single batch.")
+
+parser.add_argument(
+    "--batch_timeout_ms",
+    type=float,
+    default=5,
+    help="Maximum time to wait for more requests before running a batch that "
+    "is not full.")
+
+
+def _abspath(path):
+  """Makes a local path absolute. Paths with a scheme, e.g. gs://, are kept."""
+  if not path or "://" in path:
+    return path
+  return os.path.abspath(path)
+
+
+def _latest_checkpoints(model_dirs):
+  """Returns the latest checkpoint in each directory of model_dirs, or None."""
+  if not model_dirs:
+    return None
+  return [
+      tf.train.latest_checkpoint(model_dir)
+      for model_dir in model_dirs.split(",")
+      if model_dir
+  ]
+
+
+def _server_info():
+  """Returns a dictionary describing the model served with the current FLAGS."""
+  model_dir = None
+  if FLAGS.model_dir:
+    model_dir = ",".join(
+        _abspath(d) for d in FLAGS.model_dir.split(",") if d)
+  return {
+      "model": FLAGS.model,
+      "model_dir": model_dir,
+      "config_name": FLAGS.config_name,
+      "config_json": FLAGS.config_json,
+      "export_dir": _abspath(FLAGS.export_dir),
+      "export_format": FLAGS.export_format if FLAGS.export_dir else None,
+      "kepler_data_dir": _abspath(FLAGS.kepler_data_dir),
+      "output_image_dir": _abspath(FLAGS.output_image_dir),
+      "pid": os.getpid(),
+  }
+
+
+class _PendingRequest(object):
+  """A single example waiting to be predicted."""
+
+  def __init__(self, views):
+    self.views = views
+    self.prediction = None
+    self.error = None
+    self.done = threading.Event()
+
+
+class _MicroBatcher(object):
+  """Groups concurrent single-example predictions into batches.
+
+  A background thread takes requests from a queue and runs them through the
+  Predictor in batches. Callers block until their prediction is ready.
+  """
+
+  def __init__(self, predictor, max_batch_size, batch_timeout_secs):
+    self._predictor = predictor
+    self._max_batch_size = max_batch_size
+    self._batch_timeout_secs = batch_timeout_secs
+    self._queue = queue.Queue()
+
+    thread = threading.Thread(target=self._run)
+    thread.daemon = True
+    thread.start()
+
+  def predict(self, views):
+    """Returns the prediction for a single example.
+
+    Args:
+      views: Dictionary of 1D numpy arrays. Must have been checked with
+        Predictor.check_features().
+
+    Returns:
+      Numpy array of predictions with shape [output_dim].
+    """
+    request = _PendingRequest(views)
+    self._queue.put(request)
+    request.done.wait()
+    if request.error is not None:
+      raise request.error
+    return request.prediction
+
+  def _next_batch(self):
+    """Blocks until at least one request is available, then fills a batch."""
+    batch = [self._queue.get()]
+    deadline = time.time() + self._batch_timeout_secs
+    while len(batch) < self._max_batch_size:
+      remaining_secs = deadline - time.time()
+      if remaining_secs <= 0:
+        break
+      try:
+        batch.append(self._queue.get(timeout=remaining_secs))
+      except queue.Empty:
+        break
+    return batch
+
+  def _run(self):
+    while True:
+      batch = self._next_batch()
+      try:
+        features = {
+            name: np.stack([request.views[name] for request in batch])
+            for name in self._predictor.feature_config
+        }
+        predictions = self._predictor.predict(features)
+        for request, prediction in zip(batch, predictions):
+          request.prediction = prediction
+      except Exception as e:  # pylint:disable=broad-except
+        for request in batch:
+          request.error = e
+      for request in batch:
+        request.done.set()
+
+
+def _to_segments(values):
+  """Converts a list of segments, or a single segment, to numpy arrays."""
+  if values and np.ndim(values[0]) > 0:
+    return [np.array(segment, dtype=np.float64) for segment in values]
+  return [np.array(values, dtype=np.float64)]
+
+
+def _get_views(request, feature_config, kepler_data_dir):
+  """Computes the views of a single request.
+
+  Args:
+    request: Dictionary parsed from the JSON request body.
+    feature_config: ConfigDict containing the feature configurations.
+    kepler_data_dir: Base folder containing Kepler data, or None.
+
+  Returns:
+    A dictionary of float32 numpy arrays.
+
+  Raises:
+    ValueError: If the request is malformed.
+    IOError: If the light curve of the requested kepler_id cannot be found.
+  """
+  if "features" in request:
+    return {
+        name: np.array(value, dtype=np.float32)
+        for name, value in request["features"].items()
+    }
+
+  if "time" in request and "flux" in request:
+    all_time = _to_segments(request["time"])
+    all_flux = _to_segments(request["flux"])
+  elif "kepler_id" in request:
+    if not kepler_data_dir:
+      raise ValueError("The server has no --kepler_data_dir.")
+    all_time, all_flux = preprocess.read_light_curve(
+        int(request["kepler_id"]), kepler_data_dir)
+  else:
+    raise ValueError(
+        "Expected one of 'features', 'time' and 'flux', or 'kepler_id'.")
+
+  for key in ["period", "t0", "duration"]:
+    if key not in request:
+      raise ValueError("Missing TCE parameter: {}".format(key))
+
+  time, flux = preprocess.process_light_curve(all_time, all_flux)
+  return predictor_lib.generate_views(time, flux, float(request["period"]),
+                                      float(request["t0"]),
+                                      float(request["duration"]),
+                                      feature_config)
+
+
+def _get_output_image_file(request, output_image_dir):
+  """Returns the path of the plot requested by a request, or None.
+
+  Args:
+    request: Dictionary parsed from the JSON request body.
+    output_image_dir: Directory in which plots are saved, or None.
+
+  Returns:
+    The path of the plot in output_image_dir, or None if the request does not
+    specify an output_image_file.
+
+  Raises:
+    ValueError: If output_image_file is not a plain file name, or the server
+      has no output_image_dir.
+  """
+  filename = request.get("output_image_file")
+  if not filename:
+    return None
+  if not output_image_dir:
+    raise ValueError("The server has no --output_image_dir.")
+  if (os.path.basename(filename) != filename or
+      filename in (os.curdir, os.pardir)):
+    raise ValueError(
+        "output_image_file must be a file name without directory components. "
+        "Got: {}".format(filename))
+  return os.path.join(output_image_dir, filename)
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Handles /health and /predict requests."""
+
+  def _send_json(self, status, response):
+    body = json.dumps(response).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):  # pylint:disable=invalid-name
+    if self.path != "/health":
+      self._send_json(404, {"error": "Unknown path: {}".format(self.path)})
+      return
+    response = {"status": "ok"}
+    response.update(self.server.info)
+    # Whether a newer checkpoint has been written since the model was restored.
+    response["outdated"] = (
+        _latest_checkpoints(self.server.info["model_dir"]) !=
+        self.server.checkpoints)
+    self._send_json(200, response)
+
+  def do_POST(self):  # pylint:disable=invalid-name
+    if self.path != "/predict":
+      self._send_json(404, {"error": "Unknown path: {}".format(self.path)})
+      return
+
+    predictor = self.server.predictor
+    try:
+      length = int(self.headers.get("Content-Length", 0))
+      request = json.loads(self.rfile.read(length).decode("utf-8"))
+      views = _get_views(request, predictor.feature_config,
+                         self.server.kepler_data_dir)
+      predictor.check_features(views)
+      output_image_file = _get_output_image_file(request,
+                                                 self.server.output_image_dir)
+    except (ValueError, KeyError, TypeError) as e:
+      self._send_json(400, {"error": str(e)})
+      return
+    except IOError as e:
+      # E.g. no light curve files for the requested kepler_id.
+      self._send_json(404, {"error": str(e)})
+      return
+
+    try:
+      if output_image_file:
+        predictor_lib.plot_views(views, output_image_file)
+      prediction = self.server.batcher.predict(views)
+    except Exception as e:  # pylint:disable=broad-except
+      tf.logging.error("Prediction failed: %s", e)
+      self._send_json(500, {"error": str(e)})
+      return
+
+    self._send_json(200, {"prediction": prediction.tolist()})
+
+  def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+    tf.logging.debug(format, *args)
+
+
+class _PredictionServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """HTTP server that handles each request in a separate thread."""
+  daemon_threads = True
+
+
+def _create_predictor():
+  """Loads an exported model or restores the model from a checkpoint."""
+  assert (FLAGS.model_dir is None) != (FLAGS.export_dir is None), (
+      "Exactly one of --model_dir or --export_dir is required.")
+  if FLAGS.export_dir:
+    return predictor_lib.load_exported_predictor(FLAGS.export_dir,
+                                                 FLAGS.export_format)
+
+  assert FLAGS.model, "--model is required with --model_dir."
+  model_class = models.get_model_class(FLAGS.model)
+
+  # Look up the model configuration.
+  assert (FLAGS.config_name is None) != (FLAGS.config_json is None), (
+      "Exactly one of --config_name or --config_json is required.")
+  config = (
+      models.get_model_config(FLAGS.model, FLAGS.config_name)
+      if FLAGS.config_name else config_util.parse_json(FLAGS.config_json))
+  config = configdict.ConfigDict(config)
+
+  return predictor_lib.create_checkpoint_predictor(model_class, config,
+                                                   FLAGS.model_dir)
+
+
+def main(_):
+  info = _server_info()
+  # Look up the checkpoints before restoring them, so that a checkpoint written
+  # in the meantime is reported as outdated rather than missed.
+  checkpoints = _latest_checkpoints(info["model_dir"])
+  predictor = _create_predictor()
+
+  server = _PredictionServer((FLAGS.host, FLAGS.port), _RequestHandler)
+  server.info = info
+  server.checkpoints = checkpoints
+  server.predictor = predictor
+  server.kepler_data_dir = FLAGS.kepler_data_dir
+  server.output_image_dir = FLAGS.output_image_dir
+  server.batcher = _MicroBatcher(predictor, FLAGS.max_batch_size,
+                                 FLAGS.batch_timeout_ms / 1000)
+  tf.logging.info("Serving predictions on %s:%d", FLAGS.host, FLAGS.port)
+  try:
+    server.serve_forever()
+  finally:
+    server.server_close()
+    predictor.close()
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  FLAGS, unparsed = parser.parse_known_args()
+  tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
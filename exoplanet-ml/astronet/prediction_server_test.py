@@ -0,0 +1,188 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for prediction_server."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import threading
+
+import numpy as np
+from six.moves import urllib
+import tensorflow as tf
+
+from astronet import prediction_server
+from astronet.util import predictor as predictor_lib
+from tf_util import configdict
+
+
+_BasePredictor = predictor_lib._BasePredictor  # pylint:disable=protected-access
+
+
+class _FakePredictor(_BasePredictor):
+  """Predicts the sum of each view, and records the size of each batch."""
+
+  def __init__(self):
+    super(_FakePredictor, self).__init__(
+        configdict.ConfigDict({
+            "inputs": {
+                "features": {
+                    "global_view": {
+                        "length": 4,
+                        "is_time_series": True,
+                    },
+                },
+            },
+        }))
+    self.batch_sizes = []
+
+  def predict(self, features):
+    views = features["global_view"]
+    self.batch_sizes.append(len(views))
+    return np.sum(views, axis=1, keepdims=True)
+
+
+class MicroBatcherTest(tf.test.TestCase):
+
+  def _predict_concurrently(self, batcher, all_views):
+    """Sends each views dict to the batcher from a separate thread."""
+    predictions = [None] * len(all_views)
+
+    def _predict(i):
+      predictions[i] = batcher.predict(all_views[i])
+
+    threads = [
+        threading.Thread(target=_predict, args=(i,))
+        for i in range(len(all_views))
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return predictions
+
+  def testBatchedPrediction(self):
+    predictor = _FakePredictor()
+    # The timeout is long enough that the batch only runs once it is full.
+    batcher = prediction_server._MicroBatcher(
+        predictor, max_batch_size=4, batch_timeout_secs=60)
+    all_views = [{"global_view": np.full([4], i, np.float32)} for i in range(4)]
+    predictions = self._predict_concurrently(batcher, all_views)
+
+    self.assertEqual([4], predictor.batch_sizes)
+    self.assertAllClose([[0], [4], [8], [12]], predictions)
+
+  def testSinglePrediction(self):
+    predictor = _FakePredictor()
+    batcher = prediction_server._MicroBatcher(
+        predictor, max_batch_size=1, batch_timeout_secs=60)
+    all_views = [{"global_view": np.full([4], i, np.float32)} for i in range(3)]
+    predictions = self._predict_concurrently(batcher, all_views)
+
+    self.assertEqual([1, 1, 1], predictor.batch_sizes)
+    self.assertAllClose([[0], [4], [8]], predictions)
+
+  def testPredictionError(self):
+    predictor = _FakePredictor()
+    batcher = prediction_server._MicroBatcher(
+        predictor, max_batch_size=1, batch_timeout_secs=0)
+    with self.assertRaises(KeyError):
+      batcher.predict({"local_view": np.zeros([4], np.float32)})
+
+
+class RequestHandlerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(RequestHandlerTest, self).setUp()
+    predictor = _FakePredictor()
+    self._server = prediction_server._PredictionServer(
+        ("localhost", 0), prediction_server._RequestHandler)
+    self._server.predictor = predictor
+    self._server.batcher = prediction_server._MicroBatcher(
+        predictor, max_batch_size=1, batch_timeout_secs=0)
+    self._server.kepler_data_dir = self.get_temp_dir()
+    self._server.output_image_dir = None
+    thread = threading.Thread(target=self._server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+  def tearDown(self):
+    self._server.shutdown()
+    self._server.server_close()
+    super(RequestHandlerTest, self).tearDown()
+
+  def _post(self, body):
+    """Sends a POST request to /predict and returns (status, response)."""
+    url = "http://localhost:{}/predict".format(self._server.server_address[1])
+    try:
+      response = urllib.request.urlopen(
+          urllib.request.Request(url, data=body.encode("utf-8")), timeout=10)
+      status = response.getcode()
+    except urllib.error.HTTPError as e:
+      response = e
+      status = e.code
+    return status, json.loads(response.read().decode("utf-8"))
+
+  def testPredictFeatures(self):
+    status, response = self._post(
+        json.dumps({"features": {"global_view": [1, 2, 3, 4]}}))
+    self.assertEqual(200, status)
+    self.assertAllClose([10], response["prediction"])
+
+  def testMalformedBody(self):
+    status, response = self._post("{not json")
+    self.assertEqual(400, status)
+    self.assertIn("error", response)
+
+    # Views with the wrong shape.
+    status, response = self._post(
+        json.dumps({"features": {"global_view": [1, 2, 3]}}))
+    self.assertEqual(400, status)
+    self.assertIn("global_view", response["error"])
+
+  def testMissingKeplerId(self):
+    status, response = self._post(
+        json.dumps({
+            "kepler_id": 11442793,
+            "period": 14.44912,
+            "t0": 2.2,
+            "duration": 0.11267,
+        }))
+    self.assertEqual(404, status)
+    self.assertIn("11442793", response["error"])
+
+  def testOutputImageFile(self):
+    request = {
+        "features": {
+            "global_view": [1, 2, 3, 4]
+        },
+        "output_image_file": "views.png",
+    }
+    # The server has no output_image_dir.
+    status, _ = self._post(json.dumps(request))
+    self.assertEqual(400, status)
+
+    # Paths outside of output_image_dir are rejected.
+    self._server.output_image_dir = self.get_temp_dir()
+    for filename in ["../views.png", "/tmp/views.png", "sub/views.png", ".."]:
+      request["output_image_file"] = filename
+      status, _ = self._post(json.dumps(request))
+      self.assertEqual(400, status, filename)
+
+
+if __name__ == "__main__":
+  tf.test.main()
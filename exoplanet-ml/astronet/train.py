@@ -25,9 +25,11 @@ import tensorflow as tf
 
 from astronet import models
 from astronet.util import estimator_util
+from astronet.util import session_runner
 from tf_util import config_util
 from tf_util import configdict
 from tf_util import estimator_runner
+from tf_util import training_hooks
 
 parser = argparse.ArgumentParser()
 
@@ -77,6 +79,51 @@ parser.add_argument(
     default=15000,
     help="Size of the shuffle buffer for the training dataset.")
 
+parser.add_argument(
+    "--train_cache_file",
+    type=str,
+    default=None,
+    help="If set, parsed training examples are cached in the first epoch and "
+    "read from the cache afterwards. An empty string caches in memory, which "
+    "is not supported with --eval_files because each training round rebuilds "
+    "the input pipeline. Otherwise examples are cached in this file, which "
+    "later training rounds reuse once a round has read a full epoch. Each "
+    "training round between evaluations is one epoch, except that the last "
+    "round may be cut short by --train_steps. The file must be deleted if the "
+    "training data or input configuration changes.")
+
+parser.add_argument(
+    "--runner",
+    type=str,
+    default="estimator",
+    choices=["estimator", "session"],
+    help="How to alternate training and evaluation when --eval_files is set. "
+    "'estimator' calls Estimator.train() and Estimator.evaluate() in turn, "
+    "rebuilding the graph and restoring the latest checkpoint each time. "
+    "'session' builds the graph once and keeps a single session, switching "
+    "between the training and evaluation datasets.")
+
+parser.add_argument(
+    "--save_checkpoints_steps",
+    type=int,
+    default=None,
+    help="Number of training steps between checkpoints when --runner=session, "
+    "in addition to the checkpoint saved after each training epoch.")
+
+parser.add_argument(
+    "--preload_eval_data",
+    action="store_true",
+    help="Whether to read the evaluation dataset into memory once, rather than "
+    "reading it from disk for every evaluation.")
+
+parser.add_argument(
+    "--throughput_log_steps",
+    type=int,
+    default=None,
+    help="If set, the training examples/sec, step time, input stall fraction "
+    "and host memory are logged every this many steps, as summaries and in "
+    "throughput.jsonl in --model_dir.")
+
 
 def main(_):
   model_class = models.get_model_class(FLAGS.model)
@@ -91,6 +138,11 @@ def main(_):
   config = configdict.ConfigDict(config)
   config_util.log_and_save_config(config, FLAGS.model_dir)
 
+  # An in-memory cache would be discarded after every training round, because
+  # each round rebuilds the input pipeline.
+  assert not (FLAGS.eval_files and FLAGS.train_cache_file == ""), (
+      "--train_cache_file must be a file name with --eval_files.")
+
   # Create the estimator.
   run_config = tf.estimator.RunConfig(keep_checkpoint_max=1)
   estimator = estimator_util.create_estimator(model_class, config.hparams,
@@ -104,22 +156,46 @@ def main(_):
       input_config=config.inputs,
       mode=tf.estimator.ModeKeys.TRAIN,
       shuffle_values_buffer=FLAGS.shuffle_buffer_size,
-      repeat=1 if FLAGS.eval_files else None)
+      repeat=1 if FLAGS.eval_files else None,
+      cache_filename=FLAGS.train_cache_file)
+
+  train_hooks = []
+  if FLAGS.throughput_log_steps:
+    train_hooks.append(
+        training_hooks.ThroughputHook(config.hparams.batch_size,
+                                      FLAGS.model_dir,
+                                      FLAGS.throughput_log_steps))
 
   if not FLAGS.eval_files:
-    estimator.train(train_input_fn, max_steps=FLAGS.train_steps)
+    estimator.train(
+        train_input_fn, hooks=train_hooks, max_steps=FLAGS.train_steps)
   else:
     eval_input_fn = estimator_util.create_input_fn(
         file_pattern=FLAGS.eval_files,
         input_config=config.inputs,
-        mode=tf.estimator.ModeKeys.EVAL)
+        mode=tf.estimator.ModeKeys.EVAL,
+        preload=FLAGS.preload_eval_data)
     eval_args = [{"name": "val", "input_fn": eval_input_fn}]
 
-    for _ in estimator_runner.continuous_train_and_eval(
-        estimator=estimator,
-        train_input_fn=train_input_fn,
-        eval_args=eval_args,
-        train_steps=FLAGS.train_steps):
+    if FLAGS.runner == "session":
+      runner = session_runner.continuous_train_and_eval(
+          model_class=model_class,
+          hparams=config.hparams,
+          train_input_fn=train_input_fn,
+          eval_args=eval_args,
+          model_dir=FLAGS.model_dir,
+          train_steps=FLAGS.train_steps,
+          train_hooks=train_hooks,
+          save_checkpoints_steps=FLAGS.save_checkpoints_steps)
+    else:
+      runner = estimator_runner.continuous_train_and_eval(
+          estimator=estimator,
+          train_input_fn=train_input_fn,
+          eval_args=eval_args,
+          train_hooks=train_hooks,
+          train_steps=FLAGS.train_steps)
+
+    for _ in runner:
       # continuous_train_and_eval() yields evaluation metrics after each
       # training epoch. We don't do anything here.
       pass
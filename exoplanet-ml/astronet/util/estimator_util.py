@@ -25,6 +25,7 @@ import tensorflow as tf
 from astronet.ops import dataset_ops
 from astronet.ops import metrics
 from astronet.ops import training
+from tf_util import compute_util
 
 
 class _InputFn(object):
@@ -35,7 +36,9 @@ class _InputFn(object):
                input_config,
                mode,
                shuffle_values_buffer=0,
-               repeat=1):
+               repeat=1,
+               cache_filename=None,
+               preload=False):
     """Initializes the input function.
 
     Args:
@@ -48,12 +51,26 @@ class _InputFn(object):
         size.
       repeat: The number of times to repeat the dataset. If None or -1 the
         elements will be repeated indefinitely.
+      cache_filename: If not None, cache parsed examples in memory (if empty)
+        or in this file. See dataset_ops.build_dataset().
+      preload: Whether to read the whole dataset into memory the first time the
+        input function is called, and feed it from constant tensors
+        afterwards. Only supported for evaluation and prediction.
+
+    Raises:
+      ValueError: If preload is True in training mode.
     """
+    if preload and mode == tf.estimator.ModeKeys.TRAIN:
+      raise ValueError("preload is not supported in training mode.")
+
     self._file_pattern = file_pattern
     self._input_config = input_config
     self._mode = mode
     self._shuffle_values_buffer = shuffle_values_buffer
     self._repeat = repeat
+    self._cache_filename = cache_filename
+    self._preload = preload
+    self._preloaded_values = None
 
   def __call__(self, config, params):
     """Builds the input pipeline."""
@@ -66,6 +83,19 @@ class _InputFn(object):
         mode in [tf.estimator.ModeKeys.TRAIN, tf.estimator.ModeKeys.EVAL])
     reverse_time_series_prob = 0.5 if mode == tf.estimator.ModeKeys.TRAIN else 0
     shuffle_filenames = (mode == tf.estimator.ModeKeys.TRAIN)
+
+    if self._preload:
+      # The values are kept between calls, so the files are only read once when
+      # alternating between training and evaluation.
+      if self._preloaded_values is None:
+        self._preloaded_values = dataset_ops.load_dataset(
+            self._file_pattern, self._input_config, include_labels)
+      return dataset_ops.build_dataset_from_values(
+          self._preloaded_values,
+          batch_size=params["batch_size"],
+          repeat=self._repeat,
+          use_tpu=use_tpu)
+
     dataset = dataset_ops.build_dataset(
         file_pattern=self._file_pattern,
         input_config=self._input_config,
@@ -75,7 +105,8 @@ class _InputFn(object):
         shuffle_filenames=shuffle_filenames,
         shuffle_values_buffer=self._shuffle_values_buffer,
         repeat=self._repeat,
-        use_tpu=use_tpu)
+        use_tpu=use_tpu,
+        cache_filename=self._cache_filename)
 
     return dataset
 
@@ -84,7 +115,9 @@ def create_input_fn(file_pattern,
                     input_config,
                     mode,
                     shuffle_values_buffer=0,
-                    repeat=1):
+                    repeat=1,
+                    cache_filename=None,
+                    preload=False):
   """Creates an input_fn that reads a dataset from sharded TFRecord files.
 
   Args:
@@ -96,13 +129,18 @@ def create_input_fn(file_pattern,
     shuffle_values_buffer: If > 0, shuffle examples using a buffer of this size.
     repeat: The number of times to repeat the dataset. If None or -1 the
       elements will be repeated indefinitely.
+    cache_filename: If not None, cache parsed examples in memory (if empty) or
+      in this file. See dataset_ops.build_dataset().
+    preload: Whether to read the whole dataset into memory the first time the
+      input function is called, and feed it from constant tensors afterwards.
+      Only supported for evaluation and prediction.
 
   Returns:
     A callable that builds the input pipeline and returns a tf.data.Dataset
     object.
   """
   return _InputFn(file_pattern, input_config, mode, shuffle_values_buffer,
-                  repeat)
+                  repeat, cache_filename, preload)
 
 
 class _ModelFn(object):
@@ -222,6 +260,12 @@ def create_estimator(model_class,
   else:
     run_config = copy.deepcopy(run_config)
 
+  # Possibly enable XLA auto-clustering.
+  session_config = compute_util.configure_session(run_config.session_config,
+                                                  hparams)
+  if session_config is not run_config.session_config:
+    run_config = run_config.replace(session_config=session_config)
+
   if not model_dir and not run_config.model_dir:
     raise ValueError(
         "model_dir must be passed explicitly or specified in run_config")
@@ -0,0 +1,505 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for generating predictions from a trained AstroNet model.
+
+Unlike Estimator.predict(), which builds a new graph and restores the model
+checkpoint on every call, a Predictor restores the checkpoint once and can then
+be used to generate predictions for any number of batches. A
+FrozenGraphPredictor or TFLitePredictor has the same interface, but loads a
+model exported by astronet.export_model instead of building the model and
+restoring a training checkpoint. An EnsemblePredictor restores several
+checkpoints of the same model into one graph and averages their predictions.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+import json
+import os.path
+
+from matplotlib import figure
+import numpy as np
+import six
+import tensorflow as tf
+
+from astronet.data import preprocess
+from tf_util import configdict
+
+# Names of the files written by astronet.export_model.
+FROZEN_GRAPH_FILE_NAME = "frozen_graph.pb"
+SIGNATURE_FILE_NAME = "signature.json"
+TFLITE_FILE_NAME = "model.tflite"
+QUANTIZED_TFLITE_FILE_NAME = "model_quantized.tflite"
+
+# Formats of models exported by astronet.export_model.
+EXPORT_FORMATS = ("frozen_graph", "tflite", "tflite_quantized")
+
+
+def generate_views(time, flux, period, t0, duration, feature_config):
+  """Generates the input views of a Threshold Crossing Event.
+
+  Args:
+    time: 1D numpy array; the time values of the light curve, as returned by
+      preprocess.process_light_curve().
+    flux: 1D numpy array; the normalized flux values of the light curve.
+    period: Period of the TCE, in days.
+    t0: Epoch of the TCE.
+    duration: Duration of the TCE, in days.
+    feature_config: ConfigDict containing the feature configurations.
+
+  Returns:
+    A dictionary of float32 numpy arrays containing the views.
+
+  Raises:
+    ValueError: If feature_config contains features other than 'global_view'
+    and 'local_view'.
+  """
+  if not {"global_view", "local_view"}.issuperset(feature_config.keys()):
+    raise ValueError(
+        "Only 'global_view' and 'local_view' features are supported.")
+
+  time, flux = preprocess.phase_fold_and_sort_light_curve(
+      time, flux, period, t0)
+
+  views = {}
+  if "global_view" in feature_config:
+    views["global_view"] = preprocess.global_view(time, flux, period)
+  if "local_view" in feature_config:
+    views["local_view"] = preprocess.local_view(time, flux, period, duration)
+
+  return {name: value.astype(np.float32) for name, value in views.items()}
+
+
+def plot_views(views, output_image_file):
+  """Saves a plot of the views of a single TCE.
+
+  Uses the object-oriented matplotlib API rather than pyplot, so it can be
+  called from multiple threads.
+
+  Args:
+    views: Dictionary of 1D numpy arrays.
+    output_image_file: Path to the output image file. Must end in a valid image
+      extension, e.g. png.
+  """
+  ncols = len(views)
+  fig = figure.Figure(figsize=(10 * ncols, 5))
+  axes = fig.subplots(1, ncols, squeeze=False)
+
+  for i, name in enumerate(sorted(views)):
+    ax = axes[0][i]
+    ax.plot(views[name], ".")
+    ax.set_title(name)
+    ax.set_xlabel("Bucketized Time (days)")
+    ax.set_ylabel("Normalized Flux")
+
+  fig.tight_layout()
+  fig.savefig(output_image_file, bbox_inches="tight")
+
+
+def build_inference_graph(model_class, config):
+  """Builds a model for inference, fed by a float32 placeholder per feature.
+
+  The batch dimension of the placeholders is left unspecified so that batches
+  of any size can be fed.
+
+  Args:
+    model_class: Model class.
+    config: ConfigDict containing the model configuration.
+
+  Returns:
+    placeholders: Dictionary of feature name to placeholder.
+    model: The built model, in PREDICT mode.
+  """
+  placeholders, features = _create_placeholders(config.inputs.features)
+  return placeholders, _build_model(model_class, features, config.hparams)
+
+
+def _create_placeholders(feature_config):
+  """Creates a float32 placeholder per feature.
+
+  Args:
+    feature_config: ConfigDict containing the feature configurations.
+
+  Returns:
+    placeholders: Dictionary of feature name to placeholder.
+    features: Dictionary of model input features containing the placeholders.
+  """
+  placeholders = {}
+  features = {}
+  for feature_name, feature in feature_config.items():
+    placeholder = tf.placeholder(
+        tf.float32, shape=[None, feature.length], name=feature_name)
+    placeholders[feature_name] = placeholder
+    if feature.is_time_series:
+      features.setdefault("time_series_features", {})[feature_name] = (
+          placeholder)
+    else:
+      features.setdefault("aux_features", {})[feature_name] = placeholder
+  return placeholders, features
+
+
+def _build_model(model_class, features, hparams):
+  model = model_class(
+      features=features,
+      labels=None,
+      hparams=hparams,
+      mode=tf.estimator.ModeKeys.PREDICT)
+  model.build()
+  return model
+
+
+def _read_signature(export_dir):
+  """Reads the signature of a model exported by astronet.export_model."""
+  with tf.gfile.Open(os.path.join(export_dir, SIGNATURE_FILE_NAME)) as f:
+    signature = json.load(f)
+  signature["config"] = configdict.ConfigDict(signature["config"])
+  return signature
+
+
+@six.add_metaclass(abc.ABCMeta)
+class _BasePredictor(object):
+  """Base class for predictors."""
+
+  def __init__(self, config):
+    """Initializes the predictor.
+
+    Args:
+      config: ConfigDict containing the model configuration.
+    """
+    self._config = config
+    self._feature_config = config.inputs.features
+
+  @property
+  def config(self):
+    """ConfigDict of the model configuration."""
+    return self._config
+
+  @property
+  def feature_config(self):
+    """ConfigDict of the features expected by predict()."""
+    return self._feature_config
+
+  def check_features(self, features):
+    """Raises a ValueError if a single example has missing or invalid features.
+
+    Args:
+      features: Dictionary of 1D numpy arrays, without a batch dimension.
+
+    Raises:
+      ValueError: If a feature is missing or has the wrong shape.
+    """
+    for name, feature in self._feature_config.items():
+      if name not in features:
+        raise ValueError("Missing feature: {}".format(name))
+      shape = np.shape(features[name])
+      if shape != (feature.length,):
+        raise ValueError("Expected feature {} to have shape {}. Got: {}".format(
+            name, (feature.length,), shape))
+
+  @abc.abstractmethod
+  def predict(self, features):
+    """Generates predictions for a batch of examples.
+
+    Args:
+      features: Dictionary of numpy arrays with shape [batch_size, length]. Must
+        contain every feature in feature_config.
+
+    Returns:
+      Numpy array of predictions with shape [batch_size, output_dim].
+    """
+    raise NotImplementedError
+
+  def close(self):
+    pass
+
+
+class _SessionPredictor(_BasePredictor):
+  """Base class for predictors that feed placeholders in a tf.Session."""
+
+  def __init__(self, session, placeholders, predictions, config):
+    """Initializes the predictor.
+
+    Args:
+      session: tf.Session containing the model.
+      placeholders: Dictionary of feature name to placeholder.
+      predictions: Predictions Tensor with shape [batch_size, output_dim].
+      config: ConfigDict containing the model configuration.
+    """
+    super(_SessionPredictor, self).__init__(config)
+    self._session = session
+    self._placeholders = placeholders
+    self._predictions = predictions
+
+  def predict(self, features):
+    feed_dict = {
+        placeholder: features[name]
+        for name, placeholder in self._placeholders.items()
+    }
+    return self._session.run(self._predictions, feed_dict=feed_dict)
+
+  def close(self):
+    self._session.close()
+
+
+class Predictor(_SessionPredictor):
+  """Generates predictions from a restored AstroNet model checkpoint."""
+
+  def __init__(self, model_class, config, model_dir):
+    """Builds the model and restores the latest checkpoint.
+
+    Args:
+      model_class: Model class.
+      config: ConfigDict containing the model configuration.
+      model_dir: Directory containing a model checkpoint.
+
+    Raises:
+      ValueError: If there is no checkpoint in model_dir.
+    """
+    checkpoint_file = tf.train.latest_checkpoint(model_dir)
+    if not checkpoint_file:
+      raise ValueError("No checkpoint file found in: {}".format(model_dir))
+
+    graph = tf.Graph()
+    with graph.as_default():
+      placeholders, model = build_inference_graph(model_class, config)
+      saver = tf.train.Saver()
+
+    session = tf.Session(graph=graph)
+    saver.restore(session, checkpoint_file)
+    tf.logging.info("Successfully loaded checkpoint %s at global step %d.",
+                    checkpoint_file, session.run(model.global_step))
+
+    super(Predictor, self).__init__(session, placeholders, model.predictions,
+                                    config)
+
+
+class EnsemblePredictor(_SessionPredictor):
+  """Generates averaged predictions from an ensemble of model checkpoints.
+
+  All members are built in a single graph, each in its own variable scope, and
+  are fed by the same placeholders. The views of a batch are therefore fed once
+  and the predictions of every member are computed in a single Session.run().
+  The members must share the same model class and configuration (e.g. models
+  trained with different random seeds).
+  """
+
+  def __init__(self, model_class, config, model_dirs):
+    """Builds the ensemble and restores the latest checkpoint of each member.
+
+    Args:
+      model_class: Model class.
+      config: ConfigDict containing the model configuration.
+      model_dirs: List of directories, each containing a model checkpoint.
+
+    Raises:
+      ValueError: If model_dirs is empty or one of the directories does not
+        contain a checkpoint.
+    """
+    if not model_dirs:
+      raise ValueError("Expected at least one model_dir.")
+    checkpoint_files = []
+    for model_dir in model_dirs:
+      checkpoint_file = tf.train.latest_checkpoint(model_dir)
+      if not checkpoint_file:
+        raise ValueError("No checkpoint file found in: {}".format(model_dir))
+      checkpoint_files.append(checkpoint_file)
+
+    graph = tf.Graph()
+    with graph.as_default():
+      placeholders, features = _create_placeholders(config.inputs.features)
+      # Create the global step outside of the member scopes, so that it is not
+      # restored from the checkpoint of the first member only.
+      global_step = tf.train.get_or_create_global_step()
+      member_predictions = []
+      savers = []
+      for i in range(len(model_dirs)):
+        with tf.variable_scope("member_{}".format(i)) as scope:
+          model = _build_model(model_class, features, config.hparams)
+        member_predictions.append(model.predictions)
+
+        # Map the variable names in the checkpoint to the scoped variables.
+        prefix = scope.name + "/"
+        var_list = {
+            v.op.name[len(prefix):]: v
+            for v in tf.global_variables()
+            if v.op.name.startswith(prefix)
+        }
+        savers.append(tf.train.Saver(var_list=var_list))
+
+      # Shape [batch_size, num_members, output_dim].
+      self._member_predictions = tf.stack(
+          member_predictions, axis=1, name="member_predictions")
+      predictions = tf.reduce_mean(
+          self._member_predictions, axis=1, name="predictions")
+
+    session = tf.Session(graph=graph)
+    session.run(global_step.initializer)
+    for saver, checkpoint_file in zip(savers, checkpoint_files):
+      saver.restore(session, checkpoint_file)
+    tf.logging.info("Successfully loaded %d ensemble checkpoints.",
+                    len(checkpoint_files))
+
+    super(EnsemblePredictor, self).__init__(session, placeholders, predictions,
+                                            config)
+
+  @property
+  def num_members(self):
+    return self._member_predictions.shape[1].value
+
+  def predict_with_members(self, features):
+    """Generates averaged and per-member predictions for a batch of examples.
+
+    Args:
+      features: Dictionary of numpy arrays with shape [batch_size, length]. Must
+        contain every feature in feature_config.
+
+    Returns:
+      predictions: Numpy array of averaged predictions with shape [batch_size,
+        output_dim].
+      member_predictions: Numpy array of the predictions of each member with
+        shape [batch_size, num_members, output_dim].
+    """
+    feed_dict = {
+        placeholder: features[name]
+        for name, placeholder in self._placeholders.items()
+    }
+    return self._session.run([self._predictions, self._member_predictions],
+                             feed_dict=feed_dict)
+
+
+def create_checkpoint_predictor(model_class, config, model_dirs):
+  """Restores a single model, or an ensemble of models, from checkpoints.
+
+  Args:
+    model_class: Model class.
+    config: ConfigDict containing the model configuration.
+    model_dirs: Comma-separated list of directories, each containing a model
+      checkpoint.
+
+  Returns:
+    A Predictor if model_dirs contains a single directory, otherwise an
+    EnsemblePredictor.
+  """
+  model_dirs = [model_dir for model_dir in model_dirs.split(",") if model_dir]
+  if len(model_dirs) == 1:
+    return Predictor(model_class, config, model_dirs[0])
+  return EnsemblePredictor(model_class, config, model_dirs)
+
+
+class FrozenGraphPredictor(_SessionPredictor):
+  """Generates predictions from a graph exported by astronet.export_model."""
+
+  def __init__(self, export_dir):
+    """Loads the exported graph.
+
+    Args:
+      export_dir: Directory containing the output of astronet.export_model.
+    """
+    signature = _read_signature(export_dir)
+    graph_def = tf.GraphDef()
+    with tf.gfile.Open(os.path.join(export_dir, FROZEN_GRAPH_FILE_NAME),
+                       "rb") as f:
+      graph_def.ParseFromString(f.read())
+
+    graph = tf.Graph()
+    with graph.as_default():
+      tf.import_graph_def(graph_def, name="")
+    placeholders = {
+        name: graph.get_tensor_by_name(tensor_name)
+        for name, tensor_name in signature["inputs"].items()
+    }
+    predictions = graph.get_tensor_by_name(signature["predictions"])
+    tf.logging.info("Loaded frozen graph from %s", export_dir)
+
+    super(FrozenGraphPredictor, self).__init__(
+        tf.Session(graph=graph), placeholders, predictions, signature["config"])
+
+
+class TFLitePredictor(_BasePredictor):
+  """Generates predictions from a TensorFlow Lite model.
+
+  The TensorFlow Lite models are written by astronet.export_model with
+  --export_tflite. Unlike the other predictors, a TFLitePredictor is not
+  thread-safe.
+  """
+
+  def __init__(self, export_dir, quantized=True):
+    """Loads the TensorFlow Lite model.
+
+    Args:
+      export_dir: Directory containing the output of astronet.export_model.
+      quantized: Whether to load the model with dynamic-range quantized (int8)
+        weights, rather than the float32 model.
+    """
+    signature = _read_signature(export_dir)
+    super(TFLitePredictor, self).__init__(signature["config"])
+
+    model_file = os.path.join(
+        export_dir,
+        QUANTIZED_TFLITE_FILE_NAME if quantized else TFLITE_FILE_NAME)
+    with tf.gfile.Open(model_file, "rb") as f:
+      self._interpreter = tf.lite.Interpreter(model_content=f.read())
+
+    # TensorFlow Lite identifies tensors by op name.
+    input_indices = {
+        detail["name"]: detail["index"]
+        for detail in self._interpreter.get_input_details()
+    }
+    self._input_indices = {
+        name: input_indices[tensor_name.split(":")[0]]
+        for name, tensor_name in signature["inputs"].items()
+    }
+    self._output_index = self._interpreter.get_output_details()[0]["index"]
+    self._interpreter.allocate_tensors()
+    tf.logging.info("Loaded TensorFlow Lite model %s", model_file)
+
+  def predict(self, features):
+    # The model is exported with a batch size of 1, and the converter folds
+    # that batch size into the shapes of its reshapes, so the inputs cannot be
+    # resized. Examples are therefore predicted one at a time.
+    batch_size = len(next(iter(features.values())))
+    predictions = []
+    for i in range(batch_size):
+      for name, index in self._input_indices.items():
+        self._interpreter.set_tensor(
+            index, np.asarray(features[name][i:i + 1], np.float32))
+      self._interpreter.invoke()
+      predictions.append(self._interpreter.get_tensor(self._output_index)[0])
+    return np.stack(predictions)
+
+
+def load_exported_predictor(export_dir, export_format="frozen_graph"):
+  """Loads a model exported by astronet.export_model.
+
+  Args:
+    export_dir: Directory containing the output of astronet.export_model.
+    export_format: One of EXPORT_FORMATS.
+
+  Returns:
+    A predictor.
+
+  Raises:
+    ValueError: If export_format is not recognized.
+  """
+  if export_format == "frozen_graph":
+    return FrozenGraphPredictor(export_dir)
+  if export_format == "tflite":
+    return TFLitePredictor(export_dir, quantized=False)
+  if export_format == "tflite_quantized":
+    return TFLitePredictor(export_dir, quantized=True)
+  raise ValueError("Unrecognized export_format: {}. Expected one of {}".format(
+      export_format, EXPORT_FORMATS))
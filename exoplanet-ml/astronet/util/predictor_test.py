@@ -0,0 +1,208 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for predictor.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astronet import export_model
+from astronet.astro_cnn_model import astro_cnn_model
+from astronet.astro_cnn_model import configurations
+from astronet.util import predictor
+from tf_util import configdict
+
+
+def _build_config():
+  """Returns the configuration of a tiny AstroCNNModel."""
+  config = configurations.base()
+  config["inputs"]["features"] = {
+      "global_view": {
+          "length": 20,
+          "is_time_series": True,
+      },
+      "local_view": {
+          "length": 10,
+          "is_time_series": True,
+      },
+  }
+  config["hparams"]["time_series_hidden"] = {
+      name: {
+          "cnn_num_blocks": 1,
+          "cnn_block_size": 1,
+          "cnn_initial_num_filters": 4,
+          "cnn_block_filter_factor": 1,
+          "cnn_kernel_size": 3,
+          "convolution_padding": "same",
+          "pool_size": 2,
+          "pool_strides": 2,
+      } for name in ["global_view", "local_view"]
+  }
+  config["hparams"]["num_pre_logits_hidden_layers"] = 1
+  config["hparams"]["pre_logits_hidden_layer_size"] = 8
+  return configdict.ConfigDict(config)
+
+
+def _save_checkpoint(config, model_dir, seed):
+  """Saves a checkpoint of a randomly initialized model."""
+  with tf.Graph().as_default():
+    tf.set_random_seed(seed)
+    predictor.build_inference_graph(astro_cnn_model.AstroCNNModel, config)
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+      sess.run(tf.global_variables_initializer())
+      saver.save(sess, os.path.join(model_dir, "model.ckpt"))
+
+
+def _random_features(config, batch_size):
+  """Returns a batch of random features."""
+  rng = np.random.RandomState(0)
+  return {
+      name: rng.normal(size=[batch_size, feature.length]).astype(np.float32)
+      for name, feature in config.inputs.features.items()
+  }
+
+
+class PredictorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(PredictorTest, self).setUp()
+    self._config = _build_config()
+    self._features = _random_features(self._config, batch_size=5)
+
+  def _create_model_dir(self, name, seed):
+    model_dir = os.path.join(self.get_temp_dir(), name)
+    _save_checkpoint(self._config, model_dir, seed)
+    return model_dir
+
+  def _export(self, model_dir, export_tflite=False):
+    """Exports the model in model_dir as astronet.export_model does."""
+    export_dir = os.path.join(model_dir, "export")
+    export_model.export_frozen_graph(astro_cnn_model.AstroCNNModel,
+                                     self._config,
+                                     tf.train.latest_checkpoint(model_dir),
+                                     export_dir)
+    if export_tflite:
+      for quantize in [False, True]:
+        export_model.export_tflite(export_dir, self._config.inputs.features,
+                                   quantize)
+    return export_dir
+
+  def testBasePredictorIsAbstract(self):
+    with self.assertRaises(TypeError):
+      predictor._BasePredictor(self._config)  # pylint:disable=protected-access
+
+  def testEnsemblePredictor(self):
+    model_dirs = [
+        self._create_model_dir("model_{}".format(i), seed=i) for i in range(2)
+    ]
+    expected_member_predictions = []
+    for model_dir in model_dirs:
+      member_predictor = predictor.Predictor(astro_cnn_model.AstroCNNModel,
+                                             self._config, model_dir)
+      expected_member_predictions.append(
+          member_predictor.predict(self._features))
+      member_predictor.close()
+    self.assertNotAllClose(*expected_member_predictions)
+
+    ensemble = predictor.create_checkpoint_predictor(
+        astro_cnn_model.AstroCNNModel, self._config, ",".join(model_dirs))
+    self.assertIsInstance(ensemble, predictor.EnsemblePredictor)
+    self.assertEqual(2, ensemble.num_members)
+
+    # Each member restores the variables of its own checkpoint.
+    predictions, member_predictions = ensemble.predict_with_members(
+        self._features)
+    self.assertEqual((5, 2, 1), member_predictions.shape)
+    for i, expected in enumerate(expected_member_predictions):
+      self.assertAllClose(expected, member_predictions[:, i])
+    self.assertAllClose(
+        np.mean(expected_member_predictions, axis=0), predictions)
+    self.assertAllClose(predictions, ensemble.predict(self._features))
+
+    # The global step is shared by the members.
+    graph = ensemble._session.graph  # pylint:disable=protected-access
+    variable_names = [
+        v.op.name for v in graph.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)
+    ]
+    self.assertIn("global_step", variable_names)
+    self.assertNotIn("member_0/global_step", variable_names)
+    ensemble.close()
+
+  def testFrozenGraphPredictor(self):
+    model_dir = self._create_model_dir("model", seed=1)
+    export_dir = self._export(model_dir)
+
+    expected = predictor.Predictor(astro_cnn_model.AstroCNNModel, self._config,
+                                   model_dir).predict(self._features)
+    frozen_graph_predictor = predictor.FrozenGraphPredictor(export_dir)
+    self.assertEqual(self._config.inputs.features,
+                     frozen_graph_predictor.feature_config)
+    self.assertAllClose(expected, frozen_graph_predictor.predict(self._features))
+    frozen_graph_predictor.close()
+
+  def testTFLitePredictor(self):
+    model_dir = self._create_model_dir("model", seed=1)
+    export_dir = self._export(model_dir, export_tflite=True)
+
+    expected = predictor.Predictor(astro_cnn_model.AstroCNNModel, self._config,
+                                   model_dir).predict(self._features)
+    self.assertEqual((5, 1), expected.shape)
+
+    tflite_predictor = predictor.TFLitePredictor(export_dir, quantized=False)
+    self.assertAllClose(expected, tflite_predictor.predict(self._features))
+    # Batches of any size can be predicted.
+    self.assertAllClose(
+        expected[:2],
+        tflite_predictor.predict(
+            {name: v[:2] for name, v in self._features.items()}))
+
+    # The quantized weights change the predictions by a small amount.
+    quantized_predictor = predictor.TFLitePredictor(export_dir, quantized=True)
+    self.assertAllClose(
+        expected, quantized_predictor.predict(self._features), atol=0.05)
+
+  def testLoadExportedPredictor(self):
+    model_dir = self._create_model_dir("model", seed=1)
+    export_dir = self._export(model_dir, export_tflite=True)
+
+    expected_classes = {
+        "frozen_graph": predictor.FrozenGraphPredictor,
+        "tflite": predictor.TFLitePredictor,
+        "tflite_quantized": predictor.TFLitePredictor,
+    }
+    self.assertCountEqual(predictor.EXPORT_FORMATS, expected_classes)
+    for export_format in predictor.EXPORT_FORMATS:
+      exported_predictor = predictor.load_exported_predictor(
+          export_dir, export_format)
+      self.assertIsInstance(exported_predictor,
+                            expected_classes[export_format])
+      self.assertEqual(self._config.inputs.features,
+                       exported_predictor.feature_config)
+      self.assertEqual((5, 1),
+                       exported_predictor.predict(self._features).shape)
+      exported_predictor.close()
+
+    with self.assertRaises(ValueError):
+      predictor.load_exported_predictor(export_dir, "saved_model")
+
+
+if __name__ == "__main__":
+  tf.test.main()
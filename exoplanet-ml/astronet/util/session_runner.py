@@ -0,0 +1,246 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for training and evaluating an AstroModel in a single session.
+
+estimator_runner.continuous_train_and_eval() alternates between
+Estimator.train() and Estimator.evaluate(), each of which builds a new graph,
+restores the latest checkpoint and creates a new input pipeline. Here, the
+graph is built and the session is created once, and the model is switched
+between the training and evaluation datasets with a reinitializable iterator.
+
+Checkpoints are written to the same model directory layout as an Estimator
+created by estimator_util.create_estimator(), so they can be used by
+astronet.evaluate and astronet.predict.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+import tensorflow as tf
+
+from astronet.ops import metrics
+from astronet.ops import training
+from tf_util import compute_util
+
+
+def _write_summary(writer, global_step, values):
+  """Writes a dict of scalar values to a summary file."""
+  summary = tf.Summary()
+  for name, value in values.items():
+    summary.value.add(tag=name, simple_value=value)
+  writer.add_summary(summary, global_step)
+  writer.flush()
+
+
+def _run_with_hooks(sess, fetches, hooks):
+  """Runs fetches, calling before_run() and after_run() on each hook.
+
+  Args:
+    sess: tf.Session.
+    fetches: Fetches to run.
+    hooks: List of tf.train.SessionRunHook. The feeds requested by the hooks
+      are fed; their RunOptions are ignored.
+
+  Returns:
+    results: The values of fetches.
+    stop_requested: Whether a hook requested to stop training.
+  """
+  run_context = tf.train.SessionRunContext(
+      original_args=tf.train.SessionRunArgs(fetches), session=sess)
+  hook_args = [hook.before_run(run_context) for hook in hooks]
+  hook_fetches = []
+  feed_dict = {}
+  for args in hook_args:
+    if args is None:
+      hook_fetches.append([])
+      continue
+    hook_fetches.append([] if args.fetches is None else args.fetches)
+    feed_dict.update(args.feed_dict or {})
+
+  results, hook_results = sess.run([fetches, hook_fetches],
+                                   feed_dict=feed_dict or None)
+  for hook, hook_result in zip(hooks, hook_results):
+    hook.after_run(
+        run_context,
+        tf.train.SessionRunValues(
+            results=hook_result, options=None, run_metadata=None))
+  return results, run_context.stop_requested
+
+
+def continuous_train_and_eval(model_class,
+                              hparams,
+                              train_input_fn,
+                              eval_args,
+                              model_dir,
+                              train_steps=None,
+                              train_hooks=None,
+                              save_checkpoints_steps=None,
+                              keep_checkpoint_max=1,
+                              log_step_count_steps=100):
+  """Alternates training and evaluation in a single session.
+
+  Each round trains for one pass through the dataset of train_input_fn (or
+  until train_steps is reached), saves a checkpoint and then evaluates over each
+  evaluation set. Training resumes from the latest checkpoint in model_dir, if
+  any.
+
+  Args:
+    model_class: AstroModel or a subclass.
+    hparams: ConfigDict of configuration parameters for building the model.
+    train_input_fn: Input function returning a tf.data.Dataset of training
+      batches; see estimator_util.create_input_fn(). It should iterate through
+      the training set once, otherwise evaluation only runs after train_steps.
+    eval_args: List of dicts specifying the evaluation sets to evaluate over.
+      Must contain "input_fn" and "name".
+    model_dir: Directory for model checkpoints and summaries.
+    train_steps: The total number of steps to train the model for. If None,
+      trains indefinitely.
+    train_hooks: List of tf.train.SessionRunHook to run during training, as
+      with Estimator.train(). begin() and after_create_session() are called
+      once, before_run() and after_run() around each training step, and end()
+      when training finishes.
+    save_checkpoints_steps: The number of training steps between checkpoints,
+      in addition to the checkpoint saved at the end of each round. If None,
+      checkpoints are only saved at the end of each round.
+    keep_checkpoint_max: The maximum number of checkpoints to keep.
+    log_step_count_steps: The number of training steps between logging and
+      writing a summary of the training loss.
+
+  Yields:
+    Tuples (global_step, values), where values is a dict of metric values for
+    each evaluation set, as in estimator_runner.continuous_train_and_eval().
+  """
+  params = {"batch_size": hparams.batch_size}
+
+  with tf.Graph().as_default():
+    # Build the input pipelines and a single iterator that can be initialized
+    # from any of them.
+    train_dataset = train_input_fn(config=None, params=params)
+    iterator = tf.data.Iterator.from_structure(train_dataset.output_types,
+                                               train_dataset.output_shapes)
+    train_init_op = iterator.make_initializer(train_dataset)
+    eval_init_ops = []
+    for args in eval_args:
+      eval_dataset = args["input_fn"](config=None, params=params)
+      eval_init_ops.append((args["name"],
+                            iterator.make_initializer(eval_dataset)))
+
+    features = iterator.get_next()
+    labels = features.pop("labels")
+
+    # The model is built in training mode. Evaluation feeds
+    # model.is_training=False to disable training-only ops such as dropout.
+    model = model_class(features, labels, hparams, tf.estimator.ModeKeys.TRAIN)
+    model.build()
+    optimizer = training.create_optimizer(hparams, model.global_step)
+    train_op = training.create_train_op(model, optimizer)
+
+    metric_ops = metrics.create_metrics(model)
+    metric_ops["loss"] = tf.metrics.mean(model.total_loss)
+    metric_values = {name: value for name, (value, _) in metric_ops.items()}
+    update_metrics_op = tf.group(*[op for _, op in metric_ops.values()])
+    reset_metrics_op = tf.variables_initializer(
+        tf.get_collection(tf.GraphKeys.METRIC_VARIABLES))
+
+    saver = tf.train.Saver(max_to_keep=keep_checkpoint_max)
+    checkpoint_path = os.path.join(model_dir, "model.ckpt")
+
+    train_hooks = list(train_hooks or [])
+    for hook in train_hooks:
+      hook.begin()
+
+    session_config = compute_util.configure_session(None, hparams)
+    with tf.Session(config=session_config) as sess:
+      sess.run([
+          tf.global_variables_initializer(),
+          tf.local_variables_initializer(),
+          tf.tables_initializer()
+      ])
+      checkpoint = tf.train.latest_checkpoint(model_dir)
+      if checkpoint:
+        tf.logging.info("Restoring parameters from %s", checkpoint)
+        saver.restore(sess, checkpoint)
+      global_step = sess.run(model.global_step)
+      last_save_step = global_step
+      for hook in train_hooks:
+        hook.after_create_session(sess, None)
+
+      train_writer = tf.summary.FileWriter(model_dir, sess.graph)
+      eval_writers = {
+          name: tf.summary.FileWriter(os.path.join(model_dir, "eval_" + name))
+          for name, _ in eval_init_ops
+      }
+
+      stop_requested = False
+      while not stop_requested and (not train_steps or
+                                    global_step < train_steps):
+        tf.logging.info("Starting training at global step %d", global_step)
+        sess.run(train_init_op)
+        start_step = global_step
+        start_time = time.time()
+        while not train_steps or global_step < train_steps:
+          try:
+            loss, stop_requested = _run_with_hooks(sess, train_op, train_hooks)
+          except tf.errors.OutOfRangeError:
+            break
+          global_step += 1
+
+          if global_step % log_step_count_steps == 0:
+            steps_per_sec = (global_step - start_step) / (
+                time.time() - start_time)
+            tf.logging.info("global_step = %d, loss = %g (%.2f steps/sec)",
+                            global_step, loss, steps_per_sec)
+            _write_summary(train_writer, global_step, {
+                "loss": loss,
+                "global_step/sec": steps_per_sec
+            })
+
+          if (save_checkpoints_steps and
+              global_step - last_save_step >= save_checkpoints_steps):
+            saver.save(sess, checkpoint_path, global_step=global_step)
+            last_save_step = global_step
+
+          if stop_requested:
+            break
+
+        if global_step == start_step:
+          raise ValueError("The training dataset is empty.")
+
+        if global_step != last_save_step:
+          saver.save(sess, checkpoint_path, global_step=global_step)
+          last_save_step = global_step
+
+        values = {}
+        for name, init_op in eval_init_ops:
+          sess.run([init_op, reset_metrics_op])
+          try:
+            while True:
+              sess.run(update_metrics_op, feed_dict={model.is_training: False})
+          except tf.errors.OutOfRangeError:
+            pass
+          values[name] = sess.run(metric_values)
+          values[name]["global_step"] = global_step
+          tf.logging.info("Evaluation of %s at global step %d: %s", name,
+                          global_step, values[name])
+          _write_summary(eval_writers[name], global_step, values[name])
+
+        yield global_step, values
+
+      for hook in train_hooks:
+        hook.end(sess)
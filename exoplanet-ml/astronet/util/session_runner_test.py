@@ -0,0 +1,214 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for session_runner.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astronet.astro_cnn_model import astro_cnn_model
+from astronet.astro_cnn_model import configurations
+from astronet.util import predictor
+from astronet.util import session_runner
+from tf_util import configdict
+
+_LENGTH = 20
+
+
+def _build_config():
+  """Returns the configuration of a tiny AstroCNNModel."""
+  config = configurations.base()
+  config["inputs"]["features"] = {
+      "global_view": {
+          "length": _LENGTH,
+          "is_time_series": True,
+      },
+  }
+  config["hparams"]["time_series_hidden"] = {
+      "global_view": {
+          "cnn_num_blocks": 1,
+          "cnn_block_size": 1,
+          "cnn_initial_num_filters": 4,
+          "cnn_block_filter_factor": 1,
+          "cnn_kernel_size": 3,
+          "convolution_padding": "same",
+          "pool_size": 2,
+          "pool_strides": 2,
+      },
+  }
+  config["hparams"]["num_pre_logits_hidden_layers"] = 1
+  config["hparams"]["pre_logits_hidden_layer_size"] = 8
+  config["hparams"]["batch_size"] = 4
+  config["hparams"]["learning_rate"] = 0.01
+  return configdict.ConfigDict(config)
+
+
+def _random_examples(num_examples, seed):
+  """Returns random views and binary labels."""
+  rng = np.random.RandomState(seed)
+  views = rng.normal(size=[num_examples, _LENGTH]).astype(np.float32)
+  labels = rng.randint(0, 2, size=num_examples).astype(np.int32)
+  return views, labels
+
+
+def _create_input_fn(views, labels):
+  """Returns an input function that iterates through the examples once."""
+
+  def input_fn(config, params):
+    del config  # Unused.
+    dataset = tf.data.Dataset.from_tensor_slices({
+        "time_series_features": {
+            "global_view": views
+        },
+        "labels": labels,
+    })
+    return dataset.batch(params["batch_size"])
+
+  return input_fn
+
+
+class _CountingHook(tf.train.SessionRunHook):
+  """Counts the calls to each method of the hook."""
+
+  def __init__(self):
+    self.counts = {
+        "begin": 0,
+        "after_create_session": 0,
+        "before_run": 0,
+        "after_run": 0,
+        "end": 0,
+    }
+
+  def begin(self):
+    self.counts["begin"] += 1
+
+  def after_create_session(self, session, coord):
+    self.counts["after_create_session"] += 1
+
+  def before_run(self, run_context):
+    self.counts["before_run"] += 1
+    return tf.train.SessionRunArgs(tf.train.get_global_step())
+
+  def after_run(self, run_context, run_values):
+    self.counts["after_run"] += 1
+    assert run_values.results is not None
+
+  def end(self, session):
+    self.counts["end"] += 1
+
+
+class SessionRunnerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(SessionRunnerTest, self).setUp()
+    self._config = _build_config()
+    self._model_dir = os.path.join(self.get_temp_dir(), "model")
+    self._train_input_fn = _create_input_fn(*_random_examples(8, seed=1))
+    self._eval_views, self._eval_labels = _random_examples(6, seed=2)
+    self._eval_args = [{
+        "name": "val",
+        "input_fn": _create_input_fn(self._eval_views, self._eval_labels),
+    }]
+
+  def _expected_metrics(self):
+    """Computes evaluation metrics from the latest checkpoint."""
+    checkpoint_predictor = predictor.Predictor(astro_cnn_model.AstroCNNModel,
+                                               self._config, self._model_dir)
+    predictions = checkpoint_predictor.predict(
+        {"global_view": self._eval_views})[:, 0]
+    checkpoint_predictor.close()
+    predicted_labels = (predictions > 0.5).astype(np.int32)
+    cross_entropy = -np.mean(self._eval_labels * np.log(predictions) +
+                             (1 - self._eval_labels) * np.log(1 - predictions))
+    return {
+        "num_examples": len(self._eval_labels),
+        "accuracy/num_correct": np.sum(predicted_labels == self._eval_labels),
+        "losses/weighted_cross_entropy": cross_entropy,
+    }
+
+  def testContinuousTrainAndEval(self):
+    hook = _CountingHook()
+    runner = session_runner.continuous_train_and_eval(
+        model_class=astro_cnn_model.AstroCNNModel,
+        hparams=self._config.hparams,
+        train_input_fn=self._train_input_fn,
+        eval_args=self._eval_args,
+        model_dir=self._model_dir,
+        train_steps=4,
+        train_hooks=[hook])
+
+    # Each round is one pass through 8 training examples in batches of 4.
+    global_steps = []
+    for global_step, values in runner:
+      global_steps.append(global_step)
+
+      # A checkpoint is saved after each round.
+      self.assertEqual(
+          os.path.join(self._model_dir, "model.ckpt-{}".format(global_step)),
+          tf.train.latest_checkpoint(self._model_dir))
+
+      # The metric variables are reset before each evaluation, so the metrics
+      # only cover the evaluation set, and match the predictions of the saved
+      # checkpoint.
+      self.assertEqual(global_step, values["val"]["global_step"])
+      expected = self._expected_metrics()
+      for name, value in expected.items():
+        self.assertAllClose(value, values["val"][name], rtol=1e-4, msg=name)
+
+    self.assertEqual([2, 4], global_steps)
+    # The first round ends with a step that reaches the end of the dataset.
+    self.assertEqual({
+        "begin": 1,
+        "after_create_session": 1,
+        "before_run": 5,
+        "after_run": 4,
+        "end": 1,
+    }, hook.counts)
+
+    # Training resumes from the latest checkpoint.
+    runner = session_runner.continuous_train_and_eval(
+        model_class=astro_cnn_model.AstroCNNModel,
+        hparams=self._config.hparams,
+        train_input_fn=self._train_input_fn,
+        eval_args=self._eval_args,
+        model_dir=self._model_dir,
+        train_steps=6)
+    self.assertEqual([6], [global_step for global_step, _ in runner])
+
+  def testSaveCheckpointsSteps(self):
+    runner = session_runner.continuous_train_and_eval(
+        model_class=astro_cnn_model.AstroCNNModel,
+        hparams=self._config.hparams,
+        train_input_fn=self._train_input_fn,
+        eval_args=self._eval_args,
+        model_dir=self._model_dir,
+        train_steps=2,
+        save_checkpoints_steps=1,
+        keep_checkpoint_max=5)
+    list(runner)
+    checkpoint_state = tf.train.get_checkpoint_state(self._model_dir)
+    self.assertEqual([
+        os.path.join(self._model_dir, "model.ckpt-1"),
+        os.path.join(self._model_dir, "model.ckpt-2")
+    ], checkpoint_state.all_model_checkpoint_paths)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -25,6 +25,8 @@ from __future__ import print_function
 import tensorflow as tf
 import tensorflow_probability as tfp
 
+from tf_util import compute_util
+
 
 def _shift_right(x, n):
   """Shifts the input Tensor right by n indices along the second dimension.
@@ -42,6 +44,25 @@ def _shift_right(x, n):
   return x_padded[:, :-n, :]
 
 
+def receptive_field(hparams):
+  """Returns the number of preceding input values each prediction depends on.
+
+  The prediction of the i-th value of a sequence depends on the values from
+  index i - receptive_field(hparams) to i - hparams.predict_n_steps_ahead.
+
+  Args:
+    hparams: A ConfigDict of hyperparameters for building the model.
+
+  Returns:
+    An integer.
+  """
+  dilation_stack_width = (hparams.dilation_kernel_width - 1) * sum(
+      hparams.dilation_rates)
+  return (hparams.preprocess_kernel_width - 1 +
+          hparams.num_residual_blocks * dilation_stack_width +
+          hparams.predict_n_steps_ahead)
+
+
 class AstroWaveNet(object):
   """A TensorFlow model for generative modeling of light curves."""
 
@@ -106,7 +127,12 @@ class AstroWaveNet(object):
       weights = tf.ones_like(self.autoregressive_input)
     self.weights = weights
 
-  def causal_conv_layer(self, x, output_size, kernel_width, dilation_rate=1):
+  def causal_conv_layer(self,
+                        x,
+                        output_size,
+                        kernel_width,
+                        dilation_rate=1,
+                        dtype=None):
     """Applies a dilated causal convolution to the input.
 
     Args:
@@ -114,6 +140,7 @@ class AstroWaveNet(object):
       output_size: int; Number of output filters for the convolution.
       kernel_width: int; Width of the 1D convolution window.
       dilation_rate: int; Dilation rate of the layer.
+      dtype: Optional dtype or mixed-precision policy of the layer.
 
     Returns:
       Resulting tf.Tensor after applying the convolution.
@@ -123,31 +150,38 @@ class AstroWaveNet(object):
         kernel_width,
         padding="causal",
         dilation_rate=dilation_rate,
+        dtype=dtype,
         name="causal_conv")
     return causal_conv_op(x)
 
-  def conv_1x1_layer(self, x, output_size, activation=None):
+  def conv_1x1_layer(self, x, output_size, activation=None, dtype=None):
     """Applies a 1x1 convolution to the input.
 
     Args:
       x: tf.Tensor; Input tensor.
       output_size: int; Number of output filters for the 1x1 convolution.
       activation: Activation function to apply (e.g. 'relu').
+      dtype: Optional dtype or mixed-precision policy of the layer.
 
     Returns:
       Resulting tf.Tensor after applying the 1x1 convolution.
     """
     conv_1x1_op = tf.keras.layers.Conv1D(
-        output_size, 1, activation=activation, name="conv1x1")
+        output_size, 1, activation=activation, dtype=dtype, name="conv1x1")
     return conv_1x1_op(x)
 
-  def gated_residual_layer(self, x, conditioning_stack, dilation_rate):
+  def gated_residual_layer(self,
+                           x,
+                           conditioning_stack,
+                           dilation_rate,
+                           dtype=None):
     """Creates a gated, dilated convolutional layer with a residual connection.
 
     Args:
       x: tf.Tensor; Input tensor.
       conditioning_stack: tf.Tensor; The conditioning stack corresponding to x.
       dilation_rate: int; Dilation rate of the layer.
+      dtype: Optional dtype or mixed-precision policy of the convolutions.
 
     Returns:
       skip_connection: tf.Tensor; Skip connection to network_output layer.
@@ -156,25 +190,70 @@ class AstroWaveNet(object):
     with tf.name_scope("filter"):
       x_filter_conv = self.causal_conv_layer(x, x.shape[-1].value,
                                              self.hparams.dilation_kernel_width,
-                                             dilation_rate)
-      cond_filter_conv = self.conv_1x1_layer(conditioning_stack,
-                                             x.shape[-1].value)
+                                             dilation_rate, dtype)
+      cond_filter_conv = self.conv_1x1_layer(
+          conditioning_stack, x.shape[-1].value, dtype=dtype)
     with tf.name_scope("gate"):
       x_gate_conv = self.causal_conv_layer(x, x.shape[-1].value,
                                            self.hparams.dilation_kernel_width,
-                                           dilation_rate)
-      cond_gate_conv = self.conv_1x1_layer(conditioning_stack,
-                                           x.shape[-1].value)
+                                           dilation_rate, dtype)
+      cond_gate_conv = self.conv_1x1_layer(
+          conditioning_stack, x.shape[-1].value, dtype=dtype)
 
     gated_activation = (
         tf.tanh(x_filter_conv + cond_filter_conv) *
         tf.sigmoid(x_gate_conv + cond_gate_conv))
 
     with tf.name_scope("residual"):
-      residual = self.conv_1x1_layer(gated_activation, x.shape[-1].value)
+      residual = self.conv_1x1_layer(
+          gated_activation, x.shape[-1].value, dtype=dtype)
     with tf.name_scope("skip"):
-      skip_connection = self.conv_1x1_layer(gated_activation,
-                                            self.hparams.skip_output_dim)
+      skip_connection = self.conv_1x1_layer(
+          gated_activation, self.hparams.skip_output_dim, dtype=dtype)
+
+    return skip_connection, x + residual
+
+  def fused_gated_residual_layer(self,
+                                 x,
+                                 conditioning_projection,
+                                 dilation_rate,
+                                 dtype=None):
+    """Creates a gated residual layer with fused convolutions.
+
+    Computes the same function as gated_residual_layer() with fewer, larger
+    convolutions: the filter and gate use a single dilated convolution with
+    twice as many output channels, and the residual and skip connections use a
+    single 1x1 convolution. The 1x1 convolutions of the conditioning stack are
+    precomputed for all layers in build_network().
+
+    Args:
+      x: tf.Tensor; Input tensor.
+      conditioning_projection: tf.Tensor; The 1x1 convolution of the
+        conditioning stack for the filter and the gate of this layer,
+        concatenated along the last axis.
+      dilation_rate: int; Dilation rate of the layer.
+      dtype: Optional dtype or mixed-precision policy of the convolutions.
+
+    Returns:
+      skip_connection: tf.Tensor; Skip connection to network_output layer.
+      residual_connection: tf.Tensor; Sum of learned residual and input tensor.
+    """
+    num_channels = x.shape[-1].value
+    with tf.name_scope("filter_gate"):
+      filter_gate_conv = self.causal_conv_layer(
+          x, 2 * num_channels, self.hparams.dilation_kernel_width,
+          dilation_rate, dtype)
+    filter_conv, gate_conv = tf.split(
+        filter_gate_conv + conditioning_projection, 2, axis=-1)
+    gated_activation = tf.tanh(filter_conv) * tf.sigmoid(gate_conv)
+
+    with tf.name_scope("residual_skip"):
+      residual_skip = self.conv_1x1_layer(
+          gated_activation,
+          num_channels + self.hparams.skip_output_dim,
+          dtype=dtype)
+    residual, skip_connection = tf.split(
+        residual_skip, [num_channels, self.hparams.skip_output_dim], axis=-1)
 
     return skip_connection, x + residual
 
@@ -187,13 +266,18 @@ class AstroWaveNet(object):
       3) Summing of skip connections
 
     The network output can then be used to predict various output distributions.
+    The dilation stack may be compiled with XLA and computed in a low-precision
+    dtype, depending on self.hparams (see tf_util/compute_util.py). If
+    self.hparams.fused_gated_conv is True, the dilation stack uses
+    fused_gated_residual_layer(); see astrowavenet/util/checkpoint_util.py for
+    converting the checkpoints of unfused models.
 
     Inputs:
       self.autoregressive_input
       self.conditioning_stack
 
     Outputs:
-      self.network_output; tf.Tensor
+      self.network_output; float32 tf.Tensor
     """
     x = self.autoregressive_input
     conditioning_stack = self.conditioning_stack
@@ -215,18 +299,50 @@ class AstroWaveNet(object):
         conditioning_stack = _shift_right(conditioning_stack, shift_num_steps)
 
     skip_connections = []
-    with tf.name_scope("preprocess"):
-      x = self.causal_conv_layer(x, self.hparams.preprocess_output_size,
-                                 self.hparams.preprocess_kernel_width)
-    for i in range(self.hparams.num_residual_blocks):
-      with tf.name_scope("block_{}".format(i)):
-        for dilation_rate in self.hparams.dilation_rates:
-          with tf.name_scope("dilation_{}".format(dilation_rate)):
-            skip_connection, x = self.gated_residual_layer(
-                x, conditioning_stack, dilation_rate)
-            skip_connections.append(skip_connection)
-
-    self.network_output = tf.add_n(skip_connections)
+    dtype = compute_util.layer_dtype(self.hparams)
+    with compute_util.jit_scope(self.hparams):
+      x = compute_util.cast_to_compute_dtype(x, self.hparams)
+      conditioning_stack = compute_util.cast_to_compute_dtype(
+          conditioning_stack, self.hparams)
+      with tf.name_scope("preprocess"):
+        x = self.causal_conv_layer(
+            x,
+            self.hparams.preprocess_output_size,
+            self.hparams.preprocess_kernel_width,
+            dtype=dtype)
+      fused = self.hparams.get("fused_gated_conv", False)
+      if fused:
+        # Compute the conditioning projections of all layers in a single 1x1
+        # convolution.
+        num_layers = (
+            self.hparams.num_residual_blocks * len(self.hparams.dilation_rates))
+        with tf.name_scope("conditioning"):
+          conditioning_projections = tf.split(
+              self.conv_1x1_layer(
+                  conditioning_stack,
+                  num_layers * 2 * x.shape[-1].value,
+                  dtype=dtype),
+              num_layers,
+              axis=-1)
+      layer_index = 0
+      for i in range(self.hparams.num_residual_blocks):
+        with tf.name_scope("block_{}".format(i)):
+          for dilation_rate in self.hparams.dilation_rates:
+            with tf.name_scope("dilation_{}".format(dilation_rate)):
+              if fused:
+                skip_connection, x = self.fused_gated_residual_layer(
+                    x, conditioning_projections[layer_index], dilation_rate,
+                    dtype)
+              else:
+                skip_connection, x = self.gated_residual_layer(
+                    x, conditioning_stack, dilation_rate, dtype)
+              skip_connections.append(skip_connection)
+              layer_index += 1
+
+      network_output = tf.add_n(skip_connections)
+
+    # The output distributions and losses are always computed in float32.
+    self.network_output = tf.cast(network_output, tf.float32)
 
   def dist_params_layer(self, x, outputs_size):
     """Converts x to the correct shape for populating a distribution object.
@@ -855,6 +855,93 @@ class AstrowavenetTest(tf.test.TestCase):
           ],
           np.greater(np.abs(network_output), 0))
 
+  def test_receptive_field(self):
+    time_series_length = 40
+    features = {
+        "autoregressive_input":
+            tf.random.normal([1, time_series_length, 1], seed=1),
+        "conditioning_stack":
+            tf.zeros([1, time_series_length, 1]),
+    }
+    mode = tf.estimator.ModeKeys.TRAIN
+    hparams = configdict.ConfigDict({
+        "use_future_context": False,
+        "predict_n_steps_ahead": 2,
+        "dilation_kernel_width": 2,
+        "skip_output_dim": 4,
+        "preprocess_output_size": 3,
+        "preprocess_kernel_width": 5,
+        "num_residual_blocks": 2,
+        "dilation_rates": [1, 2, 4],
+        "output_distribution": {
+            "type": "normal",
+            "min_scale": 0.001,
+            "predict_outlier_distribution": False
+        }
+    })
+    # 4 (preprocess) + 2 * 7 (dilation stack) + 2 (shift).
+    self.assertEqual(20, astrowavenet_model.receptive_field(hparams))
+
+    model = astrowavenet_model.AstroWaveNet(features, hparams, mode)
+    model.build()
+
+    # The prediction at index 30 depends on the inputs at indices 10 to 28.
+    gradient = tf.gradients(model.network_output[0, 30],
+                            model.autoregressive_input)[0]
+    with self.cached_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      gradient = sess.run(gradient)
+    depends_on = np.nonzero(gradient[0, :, 0])[0]
+    self.assertEqual(10, depends_on.min())
+    self.assertEqual(28, depends_on.max())
+
+  def test_mixed_precision(self):
+    time_series_length = 9
+    mode = tf.estimator.ModeKeys.TRAIN
+    hparams = configdict.ConfigDict({
+        "use_future_context": False,
+        "predict_n_steps_ahead": 1,
+        "dilation_kernel_width": 2,
+        "skip_output_dim": 4,
+        "preprocess_output_size": 3,
+        "preprocess_kernel_width": 5,
+        "num_residual_blocks": 2,
+        "dilation_rates": [1, 2, 4],
+        "output_distribution": {
+            "type": "normal",
+            "min_scale": 0.001,
+            "predict_outlier_distribution": False
+        },
+        "compute_dtype": "float16",
+    })
+    for fused in [False, True]:
+      hparams.fused_gated_conv = fused
+      with tf.Graph().as_default():
+        features = {
+            "autoregressive_input":
+                tf.random.normal([2, time_series_length, 1], seed=1),
+            "conditioning_stack":
+                tf.random.normal([2, time_series_length, 3], seed=2),
+        }
+        model = astrowavenet_model.AstroWaveNet(features, hparams, mode)
+        model.build()
+
+        # Variables are kept in float32.
+        for v in tf.trainable_variables():
+          self.assertEqual(tf.float32, v.dtype.base_dtype, v.op.name)
+
+        # The dilation stack is computed in float16, but the network output and
+        # losses are float32.
+        graph = tf.get_default_graph()
+        conv = graph.get_tensor_by_name("preprocess/causal_conv/BiasAdd:0")
+        self.assertEqual(tf.float16, conv.dtype)
+        self.assertEqual(tf.float32, model.network_output.dtype)
+        self.assertEqual(tf.float32, model.total_loss.dtype)
+
+        with self.session() as sess:
+          sess.run(tf.global_variables_initializer())
+          self.assertTrue(np.isfinite(sess.run(model.total_loss)))
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,133 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Compares the step time of AstroWaveNet with and without fused convolutions.
+
+Builds the model with random inputs of shape [--batch_size, --length, 1], with
+hparams.fused_gated_conv set to False and to True, and reports the mean time of
+an inference step (the network output and losses) and a training step (also
+computing gradients and applying an Adam update).
+
+Example usage:
+
+  bazel-bin/astrowavenet/benchmark_fused_conv \
+    --config_overrides='{"hparams": {"compute_dtype": "float16"}}' \
+    --batch_size=64 \
+    --length=1024
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import json
+import time
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+from astrowavenet import configurations
+from tf_util import compute_util
+from tf_util import configdict
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("config_name", "base",
+                    "Name of the AstroWaveNet configuration.")
+
+flags.DEFINE_string(
+    "config_overrides", "{}",
+    "JSON string containing overrides to the base configuration.")
+
+flags.DEFINE_integer("batch_size", 64, "Batch size.")
+
+flags.DEFINE_integer("length", 1024, "Length of the input sequences.")
+
+flags.DEFINE_integer("num_warmup_steps", 5,
+                     "Number of steps to run before measuring.")
+
+flags.DEFINE_integer("num_steps", 50, "Number of steps to measure.")
+
+
+def _measure_step_time(sess, fetches, num_warmup_steps, num_steps):
+  """Returns the mean time of running fetches, in milliseconds."""
+  for _ in range(num_warmup_steps):
+    sess.run(fetches)
+  start = time.time()
+  for _ in range(num_steps):
+    sess.run(fetches)
+  return 1000 * (time.time() - start) / num_steps
+
+
+def _benchmark(hparams):
+  """Returns the inference and training step times of a model, in ms."""
+  with tf.Graph().as_default():
+    # Variables hold the inputs so that feeding them is not measured.
+    features = {
+        "autoregressive_input":
+            tf.Variable(
+                tf.random.normal([FLAGS.batch_size, FLAGS.length, 1]),
+                trainable=False),
+        "conditioning_stack":
+            tf.Variable(
+                tf.ones([FLAGS.batch_size, FLAGS.length, 1]), trainable=False),
+    }
+    model = astrowavenet_model.AstroWaveNet(features, hparams,
+                                            tf.estimator.ModeKeys.TRAIN)
+    model.build()
+    optimizer = compute_util.maybe_apply_loss_scaling(
+        tf.train.AdamOptimizer(), hparams)
+    train_op = optimizer.minimize(model.total_loss, model.global_step)
+
+    session_config = compute_util.configure_session(None, hparams)
+    with tf.Session(config=session_config) as sess:
+      sess.run(tf.global_variables_initializer())
+      inference_ms = _measure_step_time(sess, model.total_loss,
+                                        FLAGS.num_warmup_steps, FLAGS.num_steps)
+      train_ms = _measure_step_time(sess, train_op, FLAGS.num_warmup_steps,
+                                    FLAGS.num_steps)
+      num_params = sum(
+          np.prod(v.shape.as_list()) for v in tf.trainable_variables())
+  return inference_ms, train_ms, num_params
+
+
+def main(argv):
+  del argv  # Unused.
+
+  config = configdict.ConfigDict(configurations.get_config(FLAGS.config_name))
+  config.hparams.update(json.loads(FLAGS.config_overrides).get("hparams", {}))
+
+  results = []
+  for fused in [False, True]:
+    hparams = copy.deepcopy(config.hparams)
+    hparams.fused_gated_conv = fused
+    inference_ms, train_ms, num_params = _benchmark(hparams)
+    results.append((str(fused), inference_ms, train_ms, num_params))
+    tf.logging.info("fused_gated_conv=%s: %.2f ms/inference step, %.2f "
+                    "ms/training step, %d parameters", *results[-1])
+
+  print("{:<8}{:>20}{:>20}{:>14}".format("fused", "inference_ms",
+                                         "train_ms", "parameters"))
+  for result in results:
+    print("{:<8}{:>20.2f}{:>20.2f}{:>14d}".format(*result))
+  print("Speedup: {:.2f}x inference, {:.2f}x training".format(
+      results[0][1] / results[1][1], results[0][2] / results[1][2]))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
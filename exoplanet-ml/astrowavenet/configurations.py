@@ -49,6 +49,16 @@ def base():
 
           # If not None, gradient norms will be clipped to this value.
           "clip_gradient_norm": 1,
+
+          # XLA compilation and mixed precision. See tf_util/compute_util.py.
+          "compute_dtype": "float32",  # Or "float16", "bfloat16".
+          "loss_scale": "dynamic",  # Only used with "float16".
+          "xla_jit_scope": False,  # Compile the dilation stack.
+          "xla_auto_clustering": False,
+
+          # Whether to use fewer, larger convolutions in the dilation stack.
+          # See AstroWaveNet.fused_gated_residual_layer().
+          "fused_gated_conv": False,
       }
   }
 
@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import functools
+
 import six
 
 import tensorflow as tf
@@ -91,6 +93,19 @@ class _ShardedDatasetBuilder(DatasetBuilder):
         "num_parallel_parser_calls": 4,
         "batches_buffer_size": None,  # Defaults to max(1, 256 / batch_size).
         "excluded_examples": [],
+        # Increasing sequence lengths that separate the buckets of
+        # bucket-by-length batching, or empty to batch examples in the order
+        # they are read. See astrowavenet/data/compute_length_stats.py.
+        "bucket_boundaries": [],
+        # If positive, each training example is replaced by this many random
+        # crops of length max_length, instead of being clipped to its first
+        # max_length values.
+        "num_crops": 0,
+        # Number of initial values of each crop (except a crop at the start of
+        # its light curve) that are excluded from the loss, because their
+        # predictions depend on values before the crop. The trainer sets this
+        # to the receptive field of the model unless it is overridden.
+        "crop_warmup_length": 0,
     })
     return config
 
@@ -106,6 +121,9 @@ class _ShardedDatasetBuilder(DatasetBuilder):
 
   def _batch_and_pad(self, dataset, batch_size):
     """Combines elements into batches of the same length, padding if needed."""
+    if self.config.bucket_boundaries:
+      return self._bucket_by_length(dataset, batch_size)
+
     if self.use_tpu:
       padded_length = self.config.max_length
       if not padded_length:
@@ -131,6 +149,86 @@ class _ShardedDatasetBuilder(DatasetBuilder):
 
     return dataset.padded_batch(batch_size, padded_shapes)
 
+  def _bucket_by_length(self, dataset, batch_size):
+    """Batches elements of similar lengths together, padding within buckets.
+
+    Bucket i contains the elements whose length is at least
+    bucket_boundaries[i - 1] and less than bucket_boundaries[i]. Each batch is
+    padded up to the length of its longest element, so less computation is
+    spent on padding than when elements of all lengths are batched together.
+
+    Args:
+      dataset: A tf.data.Dataset of unbatched elements.
+      batch_size: The number of elements in each batch.
+
+    Returns:
+      A tf.data.Dataset of batches.
+
+    Raises:
+      ValueError: If use_tpu is True, or if config.bucket_boundaries is not a
+        strictly increasing list of positive integers.
+    """
+    if self.use_tpu:
+      raise ValueError("config.bucket_boundaries is not supported on TPU, "
+                       "which requires batches of a fixed length")
+
+    boundaries = list(self.config.bucket_boundaries)
+    if boundaries[0] <= 0 or any(
+        b1 >= b2 for b1, b2 in zip(boundaries[:-1], boundaries[1:])):
+      raise ValueError(
+          "config.bucket_boundaries must be strictly increasing positive "
+          "integers. Got {}".format(boundaries))
+
+    def _element_length(features):
+      return tf.shape(features["autoregressive_input"])[0]
+
+    return dataset.apply(
+        tf.data.experimental.bucket_by_sequence_length(
+            _element_length,
+            bucket_boundaries=boundaries,
+            bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+            padded_shapes=dataset.output_shapes))
+
+  def _random_crops(self, features):
+    """Samples config.num_crops random crops of a single example.
+
+    Args:
+      features: Dictionary of an example's features. Sequence features have
+        shape [length, dim] and scalar features have shape [].
+
+    Returns:
+      A dictionary of features with an extra leading dimension of size
+      config.num_crops. Sequences are cropped to length min(length,
+      config.max_length), so the crops of a sequence no longer than
+      config.max_length are identical. Scalars are repeated.
+    """
+    num_crops = self.config.num_crops
+    length = tf.shape(features["autoregressive_input"])[0]
+    crop_length = tf.minimum(length, self.config.max_length)
+    offsets = tf.random.uniform([num_crops],
+                                maxval=length - crop_length + 1,
+                                dtype=tf.int32)
+    # Shape [num_crops, crop_length].
+    positions = tf.range(crop_length)
+    indices = tf.expand_dims(offsets, 1) + positions
+
+    output = {}
+    for name, value in features.items():
+      if value.shape.rank == 0:
+        output[name] = tf.fill([num_crops], value)
+      else:
+        output[name] = tf.gather(value, indices)
+
+    warmup_length = self.config.crop_warmup_length
+    if warmup_length:
+      # Shape [num_crops, crop_length].
+      is_warmup = tf.logical_and(
+          tf.expand_dims(offsets > 0, 1), positions < warmup_length)
+      output["weights"] *= tf.cast(
+          tf.expand_dims(tf.logical_not(is_warmup), 2), tf.float32)
+
+    return output
+
   def build(self, batch_size):
     """Builds the dataset input pipeline.
 
@@ -141,7 +239,9 @@ class _ShardedDatasetBuilder(DatasetBuilder):
       A tf.data.Dataset.
 
     Raises:
-      ValueError: If no files match self.file_pattern.
+      ValueError: If no files match self.file_pattern, or if config.num_crops
+        is positive and config.max_length is not greater than
+        config.crop_warmup_length.
     """
     file_patterns = self.file_pattern.split(",")
     filenames = []
@@ -155,6 +255,14 @@ class _ShardedDatasetBuilder(DatasetBuilder):
         len(filenames), file_patterns)
 
     is_training = self.mode == tf.estimator.ModeKeys.TRAIN
+    use_crops = is_training and self.config.num_crops > 0
+    if use_crops and (not self.config.max_length or
+                      self.config.max_length <= self.config.crop_warmup_length):
+      raise ValueError(
+          "config.max_length must be greater than config.crop_warmup_length "
+          "when config.num_crops is positive. Got max_length={} and "
+          "crop_warmup_length={}".format(self.config.max_length,
+                                         self.config.crop_warmup_length))
 
     # Create a string dataset of filenames, and possibly shuffle.
     filename_dataset = tf.data.Dataset.from_tensor_slices(filenames)
@@ -218,8 +326,9 @@ class _ShardedDatasetBuilder(DatasetBuilder):
             raise ValueError(
                 "Features should be 1D or 2D sequences. Got '{}' = {}".format(
                     name, value))
-          # Possibly clip the sequence length.
-          if self.config.max_length:
+          # Possibly clip the sequence length. Random crops are taken from
+          # the full sequence.
+          if self.config.max_length and not use_crops:
             value = value[:self.config.max_length]
         output[name] = value
 
@@ -230,6 +339,16 @@ class _ShardedDatasetBuilder(DatasetBuilder):
 
     dataset = dataset.map(_prepare_wavenet_inputs)
 
+    if use_crops:
+      # Each parsed example yields several training examples. Shuffle the crops
+      # so that crops of the same example are spread across batches.
+      dataset = dataset.map(
+          self._random_crops,
+          num_parallel_calls=self.config.num_parallel_parser_calls)
+      dataset = dataset.apply(tf.data.experimental.unbatch())
+      if self.config.shuffle_values_buffer > 0:
+        dataset = dataset.shuffle(self.config.shuffle_values_buffer)
+
     # Batch results by up to batch_size.
     dataset = self._batch_and_pad(dataset, batch_size)
 
@@ -249,14 +368,26 @@ class _ShardedDatasetBuilder(DatasetBuilder):
     return dataset
 
 
-def tfrecord_reader(filename):
+def tfrecord_reader(filename, compression_type=""):
   """Returns a tf.data.Dataset that reads a single TFRecord file shard."""
-  return tf.data.TFRecordDataset(filename, buffer_size=16 * 1000 * 1000)
+  return tf.data.TFRecordDataset(
+      filename,
+      compression_type=compression_type,
+      buffer_size=16 * 1000 * 1000)
 
 
 class TFRecordDataset(_ShardedDatasetBuilder):
   """Builder for a dataset consisting of TFRecord files."""
 
+  @staticmethod
+  def default_config():
+    config = super(TFRecordDataset, TFRecordDataset).default_config()
+    config.update({
+        "compression_type": "",  # One of "", "GZIP" or "ZLIB".
+    })
+    return config
+
   def file_reader(self):
     """Returns a function that reads a single file shard."""
-    return tfrecord_reader
+    return functools.partial(
+        tfrecord_reader, compression_type=self.config.compression_type)
@@ -771,6 +771,163 @@ class TFRecordDatasetTest(tf.test.TestCase):
       with self.assertRaises(tf.errors.OutOfRangeError):
         sess.run(next_features)
 
+  def testTrainModeBucketByLength(self):
+    # Sequences of length 1-3 are in the first bucket and 4-8 in the second.
+    config_overrides = {"bucket_boundaries": [4]}
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.TRAIN,
+        config_overrides=config_overrides)
+    next_features = builder.build(2).make_one_shot_iterator().get_next()
+
+    # Features have dynamic length but fixed batch size and input dimension.
+    next_features["autoregressive_input"].shape.assert_is_compatible_with(
+        [2, None, 1])
+
+    # Each batch is emitted when its bucket is full, and is padded up to the
+    # length of its longest sequence.
+    with self.session() as sess:
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [0]],
+          [[10], [11]],
+      ], features["autoregressive_input"])
+
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [11], [12], [13], [0]],
+          [[10], [11], [12], [13], [14]],
+      ], features["autoregressive_input"])
+      np.testing.assert_almost_equal([
+          [[1], [1], [1], [1], [0]],
+          [[1], [1], [1], [1], [1]],
+      ], features["weights"])
+
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [11], [12], [13], [14], [15], [0]],
+          [[10], [11], [12], [13], [14], [15], [16]],
+      ], features["autoregressive_input"])
+
+      # The dataset repeats, so the first bucket is filled by the first
+      # sequence of the next epoch.
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [11], [12]],
+          [[10], [0], [0]],
+      ], features["autoregressive_input"])
+
+  def testEvalModeBucketByLength(self):
+    config_overrides = {"bucket_boundaries": [4]}
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.EVAL,
+        config_overrides=config_overrides)
+    next_features = builder.build(5).make_one_shot_iterator().get_next()
+
+    with self.session() as sess:
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [11], [12], [13], [0], [0], [0], [0]],
+          [[10], [11], [12], [13], [14], [0], [0], [0]],
+          [[10], [11], [12], [13], [14], [15], [0], [0]],
+          [[10], [11], [12], [13], [14], [15], [16], [0]],
+          [[10], [11], [12], [13], [14], [15], [16], [17]],
+      ], features["autoregressive_input"])
+
+      # Partial batch of the remaining bucket.
+      features = sess.run(next_features)
+      np.testing.assert_almost_equal([
+          [[10], [0], [0]],
+          [[10], [11], [0]],
+          [[10], [11], [12]],
+      ], features["autoregressive_input"])
+      np.testing.assert_almost_equal([
+          [[1], [0], [0]],
+          [[1], [1], [0]],
+          [[1], [1], [1]],
+      ], features["weights"])
+
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(next_features)
+
+  def testTrainModeRandomCrops(self):
+    config_overrides = {
+        "max_length": 4,
+        "num_crops": 3,
+        "crop_warmup_length": 2
+    }
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.TRAIN,
+        config_overrides=config_overrides)
+    next_features = builder.build(3).make_one_shot_iterator().get_next()
+
+    with self.session() as sess:
+      # The dataset is not shuffled, so the i-th batch contains the crops of
+      # the i-th example, which has length i + 1.
+      for i in range(8):
+        features = sess.run(next_features)
+        length = i + 1
+        crop_length = min(length, 4)
+        self.assertEqual((3, crop_length, 1),
+                         features["autoregressive_input"].shape)
+        for j in range(3):
+          crop = features["autoregressive_input"][j, :, 0]
+          offset = int(crop[0]) - 10
+          self.assertBetween(offset, 0, length - crop_length)
+          np.testing.assert_almost_equal(
+              np.arange(10 + offset, 10 + offset + crop_length), crop)
+          np.testing.assert_almost_equal(
+              np.arange(30 + offset, 30 + offset + crop_length),
+              features["conditioning_stack"][j, :, 0])
+          # The first values of crops that do not start at the beginning of the
+          # sequence have zero weight.
+          expected_weights = np.ones(crop_length)
+          if offset > 0:
+            expected_weights[:2] = 0
+          np.testing.assert_almost_equal(expected_weights,
+                                         features["weights"][j, :, 0])
+
+  def testRandomCropsRequireMaxLength(self):
+    config_overrides = {
+        "max_length": 4,
+        "num_crops": 3,
+        "crop_warmup_length": 4
+    }
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.TRAIN,
+        config_overrides=config_overrides)
+    with self.assertRaises(ValueError):
+      builder.build(3)
+
+    # Crops are only used for training.
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.EVAL,
+        config_overrides=config_overrides)
+    builder.build(3)
+
+  def testBucketByLengthInvalidBoundaries(self):
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.TRAIN,
+        config_overrides={"bucket_boundaries": [4, 4]})
+    with self.assertRaises(ValueError):
+      builder.build(2)
+
+    builder = TFRecordDataset(
+        self._file_pattern,
+        tf.estimator.ModeKeys.TRAIN,
+        config_overrides={
+            "max_length": 6,
+            "bucket_boundaries": [4]
+        },
+        use_tpu=True)
+    with self.assertRaises(ValueError):
+      builder.build(2)
+
 
 if __name__ == "__main__":
   tf.test.main()
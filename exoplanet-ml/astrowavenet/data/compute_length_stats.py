@@ -0,0 +1,152 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Suggests bucket boundaries for a dataset of Kepler light curves.
+
+Scans the TFRecord files of a dataset, reports the distribution of sequence
+lengths (after clipping to the max_length of the dataset configuration), and
+suggests values of the "bucket_boundaries" dataset option. The padding fraction
+is reported for batches formed with and without bucketing, with the examples in
+a random order, as during training.
+
+Example usage:
+
+  bazel-bin/astrowavenet/data/compute_length_stats \
+    --input_files=/tmp/kepler/train-* \
+    --batch_size=16 \
+    --num_buckets=8
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet.data import kepler_light_curves
+from astrowavenet.data import length_stats
+from tf_util import config_util
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string(
+    "input_files", None,
+    "Comma-separated list of file patterns matching the TFRecord files of "
+    "light curves.")
+
+flags.DEFINE_string(
+    "dataset_overrides", "{}",
+    "JSON string or JSON file containing overrides to the dataset "
+    "configuration, e.g. max_length.")
+
+flags.DEFINE_integer("batch_size", 16, "Training batch size.")
+
+flags.DEFINE_integer("num_buckets", 8,
+                     "Number of buckets for the suggested boundaries.")
+
+flags.DEFINE_list(
+    "bucket_boundaries", None,
+    "Bucket boundaries to evaluate instead of the suggested boundaries.")
+
+flags.DEFINE_integer(
+    "max_examples", None,
+    "Maximum number of examples to scan. Defaults to all examples.")
+
+flags.DEFINE_integer("seed", 0, "Random seed for the order of the examples.")
+
+
+def _read_lengths(builder):
+  """Returns the sequence lengths of all examples in the input files."""
+  filenames = []
+  for pattern in builder.file_pattern.split(","):
+    matches = tf.gfile.Glob(pattern)
+    if not matches:
+      raise ValueError("Found no input files matching {}".format(pattern))
+    filenames.extend(matches)
+  tf.logging.info("Reading %d files", len(filenames))
+
+  with tf.Graph().as_default():
+    dataset = tf.data.Dataset.from_tensor_slices(filenames)
+    dataset = dataset.flat_map(builder.file_reader())
+    if FLAGS.max_examples:
+      dataset = dataset.take(FLAGS.max_examples)
+    parser = builder.create_example_parser()
+
+    def _element_length(serialized):
+      return tf.shape(parser(serialized)["autoregressive_input"])[0]
+
+    dataset = dataset.map(
+        _element_length,
+        num_parallel_calls=builder.config.num_parallel_parser_calls)
+    next_lengths = dataset.batch(1024).make_one_shot_iterator().get_next()
+
+    lengths = []
+    with tf.Session() as sess:
+      while True:
+        try:
+          lengths.extend(sess.run(next_lengths))
+        except tf.errors.OutOfRangeError:
+          break
+
+  lengths = np.array(lengths)
+  if builder.config.max_length:
+    lengths = np.minimum(lengths, builder.config.max_length)
+  return lengths
+
+
+def main(argv):
+  del argv  # Unused.
+
+  builder = kepler_light_curves.KeplerLightCurves(
+      FLAGS.input_files,
+      tf.estimator.ModeKeys.TRAIN,
+      config_overrides=config_util.parse_json(FLAGS.dataset_overrides))
+  lengths = _read_lengths(builder)
+  if not lengths.size:
+    raise ValueError("No examples found.")
+
+  print("Number of examples: {}".format(lengths.size))
+  print("Sequence lengths:")
+  for p in [0, 10, 25, 50, 75, 90, 100]:
+    print("  {:3d}th percentile: {:.0f}".format(p, np.percentile(lengths, p)))
+
+  if FLAGS.bucket_boundaries:
+    boundaries = [int(b) for b in FLAGS.bucket_boundaries]
+  else:
+    boundaries = length_stats.suggest_bucket_boundaries(
+        lengths, FLAGS.num_buckets)
+  print("Bucket boundaries: {}".format(boundaries))
+  bucket_sizes = np.bincount(
+      np.digitize(lengths, boundaries), minlength=len(boundaries) + 1)
+  print("Examples per bucket: {}".format(bucket_sizes.tolist()))
+
+  # Examples are shuffled during training.
+  shuffled_lengths = np.random.RandomState(FLAGS.seed).permutation(lengths)
+  print("Padding fraction without bucketing: {:.1%}".format(
+      length_stats.padding_fraction(shuffled_lengths, FLAGS.batch_size)))
+  print("Padding fraction with bucketing: {:.1%}".format(
+      length_stats.padding_fraction(shuffled_lengths, FLAGS.batch_size,
+                                    boundaries)))
+  print("Trainer --config_overrides: {}".format(
+      json.dumps({"dataset": {"bucket_boundaries": boundaries}})))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  flags.mark_flag_as_required("input_files")
+  tf.app.run()
@@ -23,27 +23,70 @@ import tensorflow as tf
 from astrowavenet.data import base
 
 
+_FEATURES = {
+    "time": tf.VarLenFeature(tf.float32),
+    "flux": tf.VarLenFeature(tf.float32),
+    "mask": tf.VarLenFeature(tf.int64),
+    "kepler_id": tf.FixedLenFeature([], dtype=tf.int64),
+    # Number of initial values of a window that are only context for the
+    # predictions of the rest of the window; see
+    # beam/astrowavenet/process_light_curve.py. Zero for whole light curves.
+    "warmup_length": tf.FixedLenFeature([], dtype=tf.int64, default_value=0),
+}
+
+
 def parse_example(serialized):
   """Parses a single tf.Example proto."""
-  features = tf.parse_single_example(
-      serialized,
-      features={
-          "time": tf.VarLenFeature(tf.float32),
-          "flux": tf.VarLenFeature(tf.float32),
-          "mask": tf.VarLenFeature(tf.int64),
-          "kepler_id": tf.FixedLenFeature([], dtype=tf.int64)
-      })
+  features = tf.parse_single_example(serialized, features=_FEATURES)
   # Extract values from SparseTensor objects.
   time = features["time"].values
   autoregressive_input = features["flux"].values
   mask = tf.cast(features["mask"].values, dtype=tf.float32)
   example_id = tf.cast(features["kepler_id"], dtype=tf.int32)
+  # Warmup values are not predicted.
+  weights = mask * tf.cast(
+      tf.range(tf.shape(mask, out_type=tf.int64)[0]) >=
+      features["warmup_length"], tf.float32)
   return {
       "time": time,
       "autoregressive_input": autoregressive_input,
       "conditioning_stack": mask,
       "example_id": example_id,
-      "weights": mask,
+      "weights": weights,
+  }
+
+
+def parse_examples(serialized):
+  """Parses a batch of tf.Example protos.
+
+  Args:
+    serialized: A 1D string Tensor of serialized tf.Example protos.
+
+  Returns:
+    A dictionary with the same features as parse_example(), each with an extra
+    leading batch dimension. Sequences are padded with zeros at the end up to
+    the longest sequence in the batch. The "length" feature contains the
+    unpadded length of each sequence.
+  """
+  features = tf.parse_example(serialized, features=_FEATURES)
+  flux = features["flux"]
+  length = tf.reduce_sum(
+      tf.sparse.to_dense(
+          tf.SparseTensor(flux.indices, tf.ones_like(flux.values, tf.int32),
+                          flux.dense_shape)),
+      axis=1)
+  mask = tf.cast(tf.sparse.to_dense(features["mask"]), dtype=tf.float32)
+  # Warmup values are not predicted.
+  weights = mask * tf.cast(
+      tf.range(tf.shape(mask, out_type=tf.int64)[1])[tf.newaxis, :] >=
+      features["warmup_length"][:, tf.newaxis], tf.float32)
+  return {
+      "time": tf.sparse.to_dense(features["time"]),
+      "autoregressive_input": tf.sparse.to_dense(flux),
+      "conditioning_stack": mask,
+      "example_id": tf.cast(features["kepler_id"], dtype=tf.int32),
+      "weights": weights,
+      "length": length,
   }
 
 
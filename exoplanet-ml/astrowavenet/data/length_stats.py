@@ -0,0 +1,78 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for choosing the bucket boundaries of bucket-by-length batching.
+
+See the "bucket_boundaries" option of astrowavenet.data.base.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+
+def suggest_bucket_boundaries(lengths, num_buckets):
+  """Suggests bucket boundaries that split sequences into equal-sized buckets.
+
+  Args:
+    lengths: 1D array of sequence lengths.
+    num_buckets: The desired number of buckets.
+
+  Returns:
+    A strictly increasing list of at most num_buckets - 1 boundaries. Fewer
+    boundaries are returned if many sequences have the same length.
+  """
+  lengths = np.asarray(lengths)
+  quantiles = np.arange(1, num_buckets) / num_buckets
+  # Bucket i contains the lengths in [boundaries[i - 1], boundaries[i]), so a
+  # boundary equal to the shortest length would give an empty first bucket.
+  boundaries = np.unique(np.ceil(np.percentile(lengths, 100 * quantiles)))
+  return [int(b) for b in boundaries if b > np.min(lengths)]
+
+
+def padding_fraction(lengths, batch_size, bucket_boundaries=None):
+  """Computes the fraction of padded values in batches of sequences.
+
+  Batches are formed in the order of the lengths, as by
+  tf.data.Dataset.padded_batch() or, if bucket_boundaries is specified,
+  tf.data.experimental.bucket_by_sequence_length(). Each batch is padded up to
+  its longest sequence.
+
+  Args:
+    lengths: 1D array of sequence lengths.
+    batch_size: The number of sequences in each batch.
+    bucket_boundaries: Optional increasing list of bucket boundaries.
+
+  Returns:
+    The number of padded values divided by the total number of values in all
+    batches.
+  """
+  lengths = np.asarray(lengths)
+  if bucket_boundaries:
+    buckets = np.digitize(lengths, bucket_boundaries)
+    groups = [lengths[buckets == i] for i in range(len(bucket_boundaries) + 1)]
+  else:
+    groups = [lengths]
+
+  total_values = 0
+  for group in groups:
+    for i in range(0, len(group), batch_size):
+      batch = group[i:i + batch_size]
+      total_values += len(batch) * np.max(batch)
+
+  if not total_values:
+    return 0.0
+  return 1 - np.sum(lengths) / total_values
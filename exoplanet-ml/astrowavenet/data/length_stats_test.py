@@ -0,0 +1,57 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for length_stats.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest
+
+from astrowavenet.data import length_stats
+
+
+class LengthStatsTest(absltest.TestCase):
+
+  def testSuggestBucketBoundaries(self):
+    lengths = list(range(1, 101))
+    self.assertEqual([26, 51, 76],
+                     length_stats.suggest_bucket_boundaries(lengths, 4))
+    self.assertEqual([], length_stats.suggest_bucket_boundaries(lengths, 1))
+
+    # Boundaries are unique and the first bucket is not empty.
+    lengths = [10] * 60 + [20] * 40
+    self.assertEqual([20], length_stats.suggest_bucket_boundaries(lengths, 4))
+    self.assertEqual([], length_stats.suggest_bucket_boundaries([5] * 10, 4))
+
+  def testPaddingFraction(self):
+    lengths = [1, 10, 2, 10]
+    # Without bucketing: batches [1, 10] and [2, 10] have 40 values, of which
+    # 23 are real.
+    self.assertAlmostEqual(
+        17 / 40, length_stats.padding_fraction(lengths, batch_size=2))
+    # With bucketing: batches [1, 2] and [10, 10] have 24 values.
+    self.assertAlmostEqual(
+        1 / 24,
+        length_stats.padding_fraction(
+            lengths, batch_size=2, bucket_boundaries=[5]))
+    # Partial batches are padded up to their own longest sequence.
+    self.assertAlmostEqual(
+        0, length_stats.padding_fraction([3, 3, 3], batch_size=2))
+    self.assertAlmostEqual(0, length_stats.padding_fraction([], batch_size=2))
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -100,22 +100,45 @@ class SyntheticTransitMaker(object):
       mask: np.array of ones and zeros, with zeros indicating masking at the
         respective position on the flux array.
     """
+    flux, mask = self.random_light_curves(time, 1, mask_prob)
+    return flux[0], mask[0]
 
-    period = np.random.uniform(*self.period_range)
-    phase = np.random.uniform(*self.phase_range) * period
-    amplitude = np.random.uniform(*self.amplitude_range)
-    threshold = np.random.uniform(*self.threshold_ratio_range) * amplitude
+  def random_light_curves(self, time, batch_size, mask_prob=0):
+    """Samples batch_size sets of parameters and generates light curves.
+
+    All light curves are generated with vectorized NumPy operations, which is
+    much faster than generating them one at a time.
+
+    Args:
+      time: np.array, x-values to sample from the thresholded sine waves.
+      batch_size: Number of light curves to generate.
+      mask_prob: value in [0,1], probability an individual datapoint is set to
+        zero
+
+    Returns:
+      flux: np.array of shape [batch_size, len(time)], values of the masked
+        sampled light curves corresponding to the provided time array.
+      mask: np.array of ones and zeros with shape [batch_size, len(time)], with
+        zeros indicating masking at the respective position on the flux array.
+    """
+    # Sample parameters with shape [batch_size, 1], which broadcast over time.
+    param_shape = (batch_size, 1)
+    period = np.random.uniform(*self.period_range, size=param_shape)
+    phase = np.random.uniform(*self.phase_range, size=param_shape) * period
+    amplitude = np.random.uniform(*self.amplitude_range, size=param_shape)
+    threshold = np.random.uniform(
+        *self.threshold_ratio_range, size=param_shape) * amplitude
 
     sin_wave = np.sin(time / period - phase) * amplitude
     flux = np.minimum(sin_wave, -threshold) + threshold
 
-    noise_sd = np.random.uniform(*self.noise_sd_range)
-    noise = np.random.normal(scale=noise_sd, size=(len(time),))
+    noise_sd = np.random.uniform(*self.noise_sd_range, size=param_shape)
+    noise = np.random.normal(size=(batch_size, len(time))) * noise_sd
     flux += noise
 
     # Array of ones and zeros, where zeros indicate masking.
-    mask = np.random.random(len(time)) > mask_prob
-    mask = mask.astype(np.float)
+    mask = np.random.random((batch_size, len(time))) > mask_prob
+    mask = mask.astype(np.float64)
 
     return flux * mask, mask
 
@@ -136,3 +159,23 @@ class SyntheticTransitMaker(object):
         yield self.random_light_curve(time, mask_prob)
 
     return generator_fn
+
+  def random_light_curve_batch_generator(self, time, batch_size, mask_prob=0):
+    """Returns a generator function yielding batches of random light curves.
+
+    Args:
+       time: An np.array of x-values to sample from the thresholded sine waves.
+       batch_size: Number of light curves in each batch.
+       mask_prob: Value in [0,1], probability an individual datapoint is set to
+         zero.
+
+    Returns:
+      A generator yielding (flux, mask) pairs of arrays with shape
+      [batch_size, len(time)]; see random_light_curves().
+    """
+
+    def generator_fn():
+      while True:
+        yield self.random_light_curves(time, batch_size, mask_prob)
+
+    return generator_fn
@@ -105,6 +105,45 @@ class SyntheticTransitMakerTest(absltest.TestCase):
       self.assertEqual(len(flux), 100)
       self.assertEqual(len(mask), 100)
 
+  def testBatchLightCurveGeneration(self):
+    # Use ranges containing one value for determinism.
+    transit_maker = synthetic_transit_maker.SyntheticTransitMaker(
+        period_range=(2, 2),
+        amplitude_range=(3, 3),
+        threshold_ratio_range=(.1, .1),
+        phase_range=(0, 0),
+        noise_sd_range=(0, 0))
+    time = np.linspace(0, 100, 100)
+    expected_flux, _ = transit_maker.random_light_curve(time)
+
+    flux, mask = transit_maker.random_light_curves(time, batch_size=3)
+    self.assertEqual((3, 100), flux.shape)
+    self.assertEqual((3, 100), mask.shape)
+    for i in range(3):
+      np.testing.assert_array_almost_equal(flux[i], expected_flux)
+    np.testing.assert_array_almost_equal(mask, np.ones((3, 100)))
+
+  def testBatchLightCurvesHaveDifferentParameters(self):
+    transit_maker = synthetic_transit_maker.SyntheticTransitMaker(
+        noise_sd_range=(0, 0))
+    time = np.linspace(0, 100, 100)
+    flux, mask = transit_maker.random_light_curves(
+        time, batch_size=4, mask_prob=0.3)
+    self.assertEqual((4, 100), flux.shape)
+    self.assertFalse(np.allclose(flux[0], flux[1]))
+    # Masked values are zero.
+    np.testing.assert_array_equal(flux[mask == 0], 0)
+
+  def testRandomLightCurveBatchGenerator(self):
+    transit_maker = synthetic_transit_maker.SyntheticTransitMaker()
+    time = np.linspace(0, 100, 100)
+    generator = transit_maker.random_light_curve_batch_generator(
+        time, batch_size=8, mask_prob=0.3)()
+    for _ in range(5):
+      flux, mask = next(generator)
+      self.assertEqual((8, 100), flux.shape)
+      self.assertEqual((8, 100), mask.shape)
+
 
 if __name__ == "__main__":
   absltest.main()
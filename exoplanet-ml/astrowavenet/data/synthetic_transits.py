@@ -59,14 +59,16 @@ class SyntheticTransits(base.DatasetBuilder):
         noise_sd_range=self.config.noise_sd_range)
     t_start, t_end = self.config.light_curve_time_range
     time = np.linspace(t_start, t_end, self.config.light_curve_num_points)
+    # Each element of the generator is a whole batch, so a batch of light
+    # curves is generated by a single vectorized NumPy call.
+    batch_shape = tf.TensorShape(
+        (batch_size, self.config.light_curve_num_points))
     dataset = tf.data.Dataset.from_generator(
-        transit_maker.random_light_curve_generator(
-            time, mask_prob=self.config.mask_probability),
+        transit_maker.random_light_curve_batch_generator(
+            time, batch_size, mask_prob=self.config.mask_probability),
         output_types=(tf.float32, tf.float32),
-        output_shapes=(tf.TensorShape((self.config.light_curve_num_points,)),
-                       tf.TensorShape((self.config.light_curve_num_points,))))
+        output_shapes=(batch_shape, batch_shape))
     dataset = dataset.map(_prepare_wavenet_inputs)
-    dataset = dataset.batch(batch_size, drop_remainder=True)
     dataset = dataset.prefetch(-1)
 
     return dataset
@@ -0,0 +1,285 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fast autoregressive generation of light curves with a trained AstroWaveNet.
+
+Implementation based on "Fast Wavenet Generation Algorithm":
+https://arxiv.org/abs/1611.09482
+
+Running the full-sequence model once per generated sample would recompute the
+whole receptive field at every step. Instead, the model is built for a single
+time step, and each causal convolution keeps a queue of its most recent inputs:
+(kernel_width - 1) * dilation_rate of them. Each step feeds one new input value,
+computes one output of every layer and pushes the layer inputs onto the queues,
+so the cost of each generated sample is proportional to the number of layers.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+
+
+class _IncrementalAstroWaveNet(astrowavenet_model.AstroWaveNet):
+  """AstroWaveNet that computes a single time step from cached activations.
+
+  The variables have the same names and shapes as those of AstroWaveNet, so a
+  checkpoint of a trained AstroWaveNet can be restored directly. The queues are
+  local variables and are not saved or restored.
+  """
+
+  def __init__(self, features, hparams, batch_size):
+    """Basic setup.
+
+    Args:
+      features: A dictionary containing "autoregressive_input" and
+        "conditioning_stack", each of which has shape [batch_size, 1, dim]. The
+        inputs are not shifted, so they must be the values at the time steps
+        used to predict the next output.
+      hparams: A ConfigDict of hyperparameters for building the model.
+      batch_size: The fixed number of sequences to generate in parallel.
+    """
+    super(_IncrementalAstroWaveNet, self).__init__(
+        features, hparams, tf.estimator.ModeKeys.PREDICT)
+    self._batch_size = batch_size
+    self.queue_updates = []  # Ops that push the current inputs onto the queues.
+
+  def causal_conv_layer(self,
+                        x,
+                        output_size,
+                        kernel_width,
+                        dilation_rate=1,
+                        dtype=None):
+    """Applies a dilated causal convolution to the current time step.
+
+    Args:
+      x: tf.Tensor of shape [batch_size, 1, num_channels]; the input at the
+        current time step.
+      output_size: int; Number of output filters for the convolution.
+      kernel_width: int; Width of the 1D convolution window.
+      dilation_rate: int; Dilation rate of the layer.
+      dtype: Optional dtype or mixed-precision policy of the layer.
+
+    Returns:
+      tf.Tensor of shape [batch_size, 1, output_size].
+    """
+    queue_length = (kernel_width - 1) * dilation_rate
+    window = x
+    if queue_length:
+      # The queue is initialized with zeros, which is equivalent to the zero
+      # padding of the full-sequence causal convolution.
+      queue = tf.Variable(
+          tf.zeros([self._batch_size, queue_length, x.shape[-1].value],
+                   dtype=x.dtype),
+          trainable=False,
+          collections=[tf.GraphKeys.LOCAL_VARIABLES],
+          name="queue")
+      window = tf.concat([queue, x], axis=1)
+      # Drop the oldest input. The update reads the window, so it runs after
+      # the queue has been read for the current step.
+      self.queue_updates.append(tf.assign(queue, window[:, 1:]))
+
+    # With "valid" padding, a window of queue_length + 1 inputs produces a
+    # single output.
+    causal_conv_op = tf.keras.layers.Conv1D(
+        output_size,
+        kernel_width,
+        padding="valid",
+        dilation_rate=dilation_rate,
+        dtype=dtype,
+        name="causal_conv")
+    return causal_conv_op(window)
+
+
+def _sample_values(dist, output_distribution, sample):
+  """Draws values from the predicted distributions.
+
+  Args:
+    dist: Predicted distribution with batch shape [batch_size, 1, input_dim].
+    output_distribution: ConfigDict of the output distribution.
+    sample: Whether to sample from the distributions. Otherwise, the mean of a
+      normal distribution or the mode of a categorical distribution is used.
+
+  Returns:
+    A float32 Tensor of shape [batch_size, 1, input_dim].
+  """
+  if output_distribution.type == "categorical":
+    classes = dist.sample() if sample else tf.argmax(dist.logits, axis=-1)
+    # Map each class to the center of its quantization bucket.
+    min_val = output_distribution.min_quantization_value
+    max_val = output_distribution.max_quantization_value
+    bucket_width = (max_val - min_val) / output_distribution.num_classes
+    return min_val + (tf.cast(classes, tf.float32) + 0.5) * bucket_width
+
+  return dist.sample() if sample else dist.mean()
+
+
+class Generator(object):
+  """Generates light curves one sample at a time with a trained AstroWaveNet.
+
+  Example usage:
+
+    generator = Generator(hparams, checkpoint_path, batch_size=8)
+    # Forecast: condition on the first 100 values and generate the rest.
+    known_mask = np.zeros(conditioning_stack.shape[:2], dtype=bool)
+    known_mask[:, :100] = True
+    light_curves = generator.generate(
+        conditioning_stack, known_values=flux, known_mask=known_mask)
+  """
+
+  def __init__(self,
+               hparams,
+               checkpoint_path,
+               batch_size=1,
+               input_dim=1,
+               conditioning_dim=1,
+               seed=None):
+    """Builds the single-step model and restores a checkpoint.
+
+    Args:
+      hparams: ConfigDict of the hyperparameters the model was trained with.
+      checkpoint_path: Path to a checkpoint of a trained AstroWaveNet.
+      batch_size: Number of sequences to generate in parallel.
+      input_dim: Number of features of the autoregressive input.
+      conditioning_dim: Number of features of the conditioning stack.
+      seed: Optional graph-level random seed for sampling.
+    """
+    self._hparams = hparams
+    self._batch_size = batch_size
+    self._input_dim = input_dim
+    self._conditioning_dim = conditioning_dim
+
+    graph = tf.Graph()
+    with graph.as_default():
+      if seed is not None:
+        tf.set_random_seed(seed)
+      self._input = tf.placeholder(
+          tf.float32, [batch_size, 1, input_dim], name="autoregressive_input")
+      self._conditioning = tf.placeholder(
+          tf.float32, [batch_size, 1, conditioning_dim],
+          name="conditioning_stack")
+      model = _IncrementalAstroWaveNet({
+          "autoregressive_input": self._input,
+          "conditioning_stack": self._conditioning,
+      }, hparams, batch_size)
+      model.build_inputs()
+      model.build_network()
+      model.build_predictions()
+
+      update_queues = tf.group(*model.queue_updates)
+      dist = model.predicted_distributions
+      self._step_ops = {
+          sample: (_sample_values(dist, hparams.output_distribution,
+                                  sample), update_queues)
+          for sample in [True, False]
+      }
+      self._reset_op = tf.variables_initializer(tf.local_variables())
+      saver = tf.train.Saver(tf.global_variables())
+
+    self._session = tf.Session(graph=graph)
+    saver.restore(self._session, checkpoint_path)
+    self.reset()
+
+  def reset(self):
+    """Clears the queues, as at the start of a new sequence."""
+    self._session.run(self._reset_op)
+
+  def step(self, autoregressive_input, conditioning, sample=True):
+    """Computes the next output and pushes the inputs onto the queues.
+
+    Args:
+      autoregressive_input: Array of shape [batch_size, input_dim]; the input
+        value at the current step, i.e. the value predict_n_steps_ahead steps
+        before the value being predicted.
+      conditioning: Array of shape [batch_size, conditioning_dim]; the
+        conditioning values at the current step.
+      sample: Whether to sample from the predicted distributions, rather than
+        take their mean (normal) or mode (categorical).
+
+    Returns:
+      Numpy array of shape [batch_size, input_dim].
+    """
+    values, _ = self._session.run(
+        self._step_ops[sample],
+        feed_dict={
+            self._input: np.reshape(autoregressive_input,
+                                    [self._batch_size, 1, self._input_dim]),
+            self._conditioning: np.reshape(
+                conditioning, [self._batch_size, 1, self._conditioning_dim]),
+        })
+    return values[:, 0]
+
+  def generate(self,
+               conditioning_stack,
+               known_values=None,
+               known_mask=None,
+               sample=True):
+    """Generates a batch of sequences.
+
+    Values where known_mask is True are taken from known_values, and all other
+    values are generated. This covers synthesis (no known values), forecasting
+    (a known prefix) and in-painting (known values around gaps).
+
+    Args:
+      conditioning_stack: Array of shape [batch_size, length,
+        conditioning_dim].
+      known_values: Optional array of shape [batch_size, length, input_dim].
+      known_mask: Optional boolean array of shape [batch_size, length]. Required
+        if known_values is specified.
+      sample: Whether to sample from the predicted distributions, rather than
+        take their mean (normal) or mode (categorical).
+
+    Returns:
+      Numpy array of shape [batch_size, length, input_dim].
+
+    Raises:
+      ValueError: If known_values is specified without known_mask.
+    """
+    if (known_values is None) != (known_mask is None):
+      raise ValueError("known_values and known_mask must be passed together.")
+
+    batch_size, length, _ = np.shape(conditioning_stack)
+    shift = self._hparams.predict_n_steps_ahead
+    use_future_context = self._hparams.use_future_context
+    zero_input = np.zeros([batch_size, self._input_dim], np.float32)
+    zero_conditioning = np.zeros([batch_size, self._conditioning_dim],
+                                 np.float32)
+
+    self.reset()
+    outputs = np.zeros([batch_size, length, self._input_dim], np.float32)
+    for t in range(length):
+      # The inputs are shifted as in training: the value predicted at step t
+      # depends on the values up to step t - shift, and on the conditioning
+      # stack up to step t (use_future_context) or t - shift.
+      autoregressive_input = outputs[:, t - shift] if t >= shift else zero_input
+      if use_future_context:
+        conditioning = conditioning_stack[:, t]
+      elif t >= shift:
+        conditioning = conditioning_stack[:, t - shift]
+      else:
+        conditioning = zero_conditioning
+      values = self.step(autoregressive_input, conditioning, sample)
+      if known_mask is not None:
+        values = np.where(known_mask[:, t, np.newaxis], known_values[:, t],
+                          values)
+      outputs[:, t] = values
+
+    return outputs
+
+  def close(self):
+    self._session.close()
@@ -0,0 +1,137 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for fast_generation."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+from astrowavenet import fast_generation
+from tf_util import configdict
+
+_BATCH_SIZE = 2
+_LENGTH = 40
+_INPUT_DIM = 2
+_CONDITIONING_DIM = 3
+
+
+class FastGenerationTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(FastGenerationTest, self).setUp()
+    self.hparams = configdict.ConfigDict({
+        "use_future_context": False,
+        "predict_n_steps_ahead": 1,
+        "dilation_kernel_width": 2,
+        "skip_output_dim": 6,
+        "preprocess_output_size": 3,
+        "preprocess_kernel_width": 5,
+        "num_residual_blocks": 2,
+        "dilation_rates": [1, 2, 4],
+        "output_distribution": {
+            "type": "normal",
+            "min_scale": 0.001,
+            "predict_outlier_distribution": False
+        }
+    })
+    np.random.seed(123)
+    self.autoregressive_input = np.random.normal(
+        size=[_BATCH_SIZE, _LENGTH, _INPUT_DIM]).astype(np.float32)
+    self.conditioning_stack = np.random.normal(
+        size=[_BATCH_SIZE, _LENGTH, _CONDITIONING_DIM]).astype(np.float32)
+
+  def _save_checkpoint(self):
+    """Saves a randomly initialized model and returns its predicted means."""
+    with tf.Graph().as_default():
+      features = {
+          "autoregressive_input":
+              tf.constant(self.autoregressive_input),
+          "conditioning_stack":
+              tf.constant(self.conditioning_stack),
+      }
+      # In PREDICT mode the inputs are not shifted, so the output at step t is
+      # a function of the inputs up to step t.
+      model = astrowavenet_model.AstroWaveNet(features, self.hparams,
+                                              tf.estimator.ModeKeys.PREDICT)
+      model.build()
+      saver = tf.train.Saver()
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        means = sess.run(model.predicted_distributions.mean())
+        checkpoint_path = saver.save(
+            sess, os.path.join(self.get_temp_dir(), "model.ckpt"))
+    return checkpoint_path, means
+
+  def test_step_matches_full_sequence(self):
+    checkpoint_path, expected_means = self._save_checkpoint()
+    generator = fast_generation.Generator(
+        self.hparams,
+        checkpoint_path,
+        batch_size=_BATCH_SIZE,
+        input_dim=_INPUT_DIM,
+        conditioning_dim=_CONDITIONING_DIM)
+
+    for t in range(_LENGTH):
+      means = generator.step(
+          self.autoregressive_input[:, t],
+          self.conditioning_stack[:, t],
+          sample=False)
+      self.assertAllClose(expected_means[:, t], means, atol=1e-5)
+
+    # After a reset, the first step only depends on the first input.
+    generator.reset()
+    means = generator.step(
+        self.autoregressive_input[:, 0],
+        self.conditioning_stack[:, 0],
+        sample=False)
+    self.assertAllClose(expected_means[:, 0], means, atol=1e-5)
+    generator.close()
+
+  def test_generate(self):
+    checkpoint_path, _ = self._save_checkpoint()
+    generator = fast_generation.Generator(
+        self.hparams,
+        checkpoint_path,
+        batch_size=_BATCH_SIZE,
+        input_dim=_INPUT_DIM,
+        conditioning_dim=_CONDITIONING_DIM,
+        seed=0)
+
+    # Forecast the second half of each sequence.
+    known_mask = np.zeros([_BATCH_SIZE, _LENGTH], dtype=bool)
+    known_mask[:, :_LENGTH // 2] = True
+    generated = generator.generate(
+        self.conditioning_stack,
+        known_values=self.autoregressive_input,
+        known_mask=known_mask)
+    self.assertEqual((_BATCH_SIZE, _LENGTH, _INPUT_DIM), generated.shape)
+    self.assertAllEqual(self.autoregressive_input[:, :_LENGTH // 2],
+                        generated[:, :_LENGTH // 2])
+    self.assertTrue(np.all(np.isfinite(generated)))
+
+    with self.assertRaises(ValueError):
+      generator.generate(
+          self.conditioning_stack, known_values=self.autoregressive_input)
+    generator.close()
+
+
+if __name__ == "__main__":
+  tf.test.main()
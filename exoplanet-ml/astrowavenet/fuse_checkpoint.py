@@ -0,0 +1,85 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Converts an AstroWaveNet checkpoint for use with fused convolutions.
+
+Reads a model directory written by astrowavenet.trainer and writes a new model
+directory containing the converted checkpoint and a config.json with
+hparams.fused_gated_conv = True. The new directory can be used anywhere the
+original one can, e.g. for resuming training or generating light curves.
+
+Example usage:
+
+  bazel-bin/astrowavenet/fuse_checkpoint \
+    --model_dir=/tmp/astrowavenet/ \
+    --output_dir=/tmp/astrowavenet_fused/
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+from absl import flags
+import tensorflow as tf
+
+from astrowavenet.util import checkpoint_util
+from tf_util import config_util
+from tf_util import configdict
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string(
+    "model_dir", None,
+    "Directory written by astrowavenet.trainer, containing config.json and "
+    "model checkpoints.")
+
+flags.DEFINE_string(
+    "checkpoint_path", None,
+    "Checkpoint to convert. Defaults to the latest checkpoint in --model_dir.")
+
+flags.DEFINE_string("output_dir", None,
+                    "Directory in which to write the converted model.")
+
+
+def main(argv):
+  del argv  # Unused.
+
+  config = configdict.ConfigDict(
+      config_util.parse_json(os.path.join(FLAGS.model_dir, "config.json")))
+  if config.hparams.get("fused_gated_conv"):
+    raise ValueError("Model in {} already uses fused convolutions".format(
+        FLAGS.model_dir))
+  checkpoint_path = (
+      FLAGS.checkpoint_path or tf.train.latest_checkpoint(FLAGS.model_dir))
+  if not checkpoint_path:
+    raise ValueError("No checkpoint file found in: {}".format(FLAGS.model_dir))
+
+  values = checkpoint_util.fuse_checkpoint_values(checkpoint_path,
+                                                  config.hparams)
+  tf.gfile.MakeDirs(FLAGS.output_dir)
+  output_checkpoint_path = os.path.join(FLAGS.output_dir,
+                                        os.path.basename(checkpoint_path))
+  checkpoint_util.save_checkpoint_values(values, output_checkpoint_path)
+
+  config.hparams.fused_gated_conv = True
+  config_util.log_and_save_config(config, FLAGS.output_dir)
+  tf.logging.info("Wrote fused checkpoint to %s", output_checkpoint_path)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  flags.mark_flags_as_required(["model_dir", "output_dir"])
+  tf.app.run()
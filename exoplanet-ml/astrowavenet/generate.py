@@ -0,0 +1,245 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Script for generating light curves with a trained AstroWaveNet model.
+
+Light curves are read from --dataset and, depending on --mode, are:
+  synthesize: Generated from scratch. The input light curves only determine the
+    number of light curves and their lengths.
+  forecast: Generated after the first --context_length values of each input
+    light curve.
+  inpaint: Generated at the points with zero weight (e.g. the gaps in Kepler
+    light curves), keeping the observed points.
+
+The conditioning stack of both datasets is the observation mask, so generated
+points are conditioned as observed points.
+
+The output is a .npz file containing the arrays generated, original and
+known_mask (which is True for the values copied from the original light curves),
+each with shape [num_light_curves, length, ...], and example_id if the dataset
+has example ids. Shorter light curves are padded with zeros at the end.
+
+Example usage:
+
+  bazel-bin/astrowavenet/generate \
+    --model_dir=/tmp/astrowavenet/ \
+    --dataset=kepler_light_curves \
+    --input_files=/tmp/kepler/test-* \
+    --mode=forecast \
+    --context_length=500 \
+    --output_file=/tmp/astrowavenet/forecast.npz
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import fast_generation
+from astrowavenet.data import kepler_light_curves
+from astrowavenet.data import synthetic_transits
+from tf_util import config_util
+from tf_util import configdict
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string(
+    "model_dir", None,
+    "Directory written by astrowavenet.trainer, containing config.json and "
+    "model checkpoints.")
+
+flags.DEFINE_string(
+    "checkpoint_path", None,
+    "Checkpoint to restore. Defaults to the latest checkpoint in --model_dir.")
+
+flags.DEFINE_enum("dataset", None,
+                  ["synthetic_transits", "kepler_light_curves"],
+                  "Dataset of light curves to generate from.")
+
+flags.DEFINE_string(
+    "input_files", None,
+    "Comma-separated list of file patterns matching the TFRecord files of "
+    "light curves. Required with --dataset=kepler_light_curves.")
+
+flags.DEFINE_string(
+    "dataset_overrides", "{}",
+    "JSON string or JSON file containing overrides to the dataset "
+    "configuration.")
+
+flags.DEFINE_enum("mode", "synthesize", ["synthesize", "forecast", "inpaint"],
+                  "Which values of the input light curves to generate.")
+
+flags.DEFINE_integer(
+    "context_length", None,
+    "Number of initial values of each light curve to keep when "
+    "--mode=forecast.")
+
+flags.DEFINE_integer(
+    "num_examples", None,
+    "Maximum number of light curves to generate. Required with "
+    "--dataset=synthetic_transits.")
+
+flags.DEFINE_integer("batch_size", 16,
+                     "Number of light curves to generate in parallel.")
+
+flags.DEFINE_boolean(
+    "sample", True,
+    "Whether to sample from the predicted distributions. Otherwise, the mean "
+    "(normal) or mode (categorical) of each distribution is used.")
+
+flags.DEFINE_integer("seed", None, "Random seed for sampling.")
+
+flags.DEFINE_string("output_file", None, "Path of the output .npz file.")
+
+
+def _create_dataset_builder(dataset_overrides):
+  """Creates a dataset builder for the input light curves."""
+  if FLAGS.dataset == "synthetic_transits":
+    return synthetic_transits.SyntheticTransits(dataset_overrides)
+
+  if not FLAGS.input_files:
+    raise ValueError("--input_files is required for dataset '{}'".format(
+        FLAGS.dataset))
+  return kepler_light_curves.KeplerLightCurves(
+      FLAGS.input_files,
+      tf.estimator.ModeKeys.PREDICT,
+      config_overrides=dataset_overrides)
+
+
+def _read_batches(builder):
+  """Yields batches of input light curves as dictionaries of numpy arrays."""
+  with tf.Graph().as_default():
+    dataset = builder.build(FLAGS.batch_size)
+    next_batch = dataset.make_one_shot_iterator().get_next()
+    with tf.Session() as sess:
+      num_examples = 0
+      while FLAGS.num_examples is None or num_examples < FLAGS.num_examples:
+        try:
+          batch = sess.run(next_batch)
+        except tf.errors.OutOfRangeError:
+          break
+        if FLAGS.num_examples is not None:
+          batch = {
+              name: value[:FLAGS.num_examples - num_examples]
+              for name, value in batch.items()
+          }
+        num_examples += len(batch["autoregressive_input"])
+        yield batch
+
+
+def _known_mask(batch):
+  """Returns a boolean array of shape [batch_size, length] of values to keep."""
+  mask = np.zeros(batch["autoregressive_input"].shape[:2], dtype=bool)
+  if FLAGS.mode == "forecast":
+    mask[:, :FLAGS.context_length] = True
+  elif FLAGS.mode == "inpaint":
+    if "weights" not in batch:
+      raise ValueError("--mode=inpaint requires a dataset with weights.")
+    mask = np.all(batch["weights"] > 0, axis=2)
+  return mask
+
+
+def _pad(value, length):
+  """Pads the first dimension of an array with zeros up to length."""
+  padding = [(0, length - len(value))] + [(0, 0)] * (value.ndim - 1)
+  return np.pad(value, padding, "constant")
+
+
+def _stack_and_pad(values):
+  """Stacks arrays whose first dimensions may have different sizes."""
+  length = max(len(value) for value in values)
+  return np.stack([_pad(value, length) for value in values])
+
+
+def main(argv):
+  del argv  # Unused.
+
+  if FLAGS.mode == "forecast" and not FLAGS.context_length:
+    raise ValueError("--context_length is required with --mode=forecast")
+  if FLAGS.dataset == "synthetic_transits" and not FLAGS.num_examples:
+    raise ValueError("--num_examples is required with "
+                     "--dataset=synthetic_transits")
+
+  config = configdict.ConfigDict(
+      config_util.parse_json(os.path.join(FLAGS.model_dir, "config.json")))
+  checkpoint_path = (
+      FLAGS.checkpoint_path or tf.train.latest_checkpoint(FLAGS.model_dir))
+  if not checkpoint_path:
+    raise ValueError("No checkpoint file found in: {}".format(FLAGS.model_dir))
+
+  builder = _create_dataset_builder(
+      config_util.parse_json(FLAGS.dataset_overrides))
+  generator = None
+  outputs = {"generated": [], "original": [], "known_mask": []}
+  for batch in _read_batches(builder):
+    original = batch["autoregressive_input"]
+    conditioning_stack = batch["conditioning_stack"]
+    num_light_curves = len(original)
+    if generator is None:
+      generator = fast_generation.Generator(
+          config.hparams,
+          checkpoint_path,
+          batch_size=FLAGS.batch_size,
+          input_dim=original.shape[2],
+          conditioning_dim=conditioning_stack.shape[2],
+          seed=FLAGS.seed)
+
+    known_mask = _known_mask(batch)
+    # Generated points are conditioned as observed points.
+    conditioning_stack = np.where(known_mask[:, :, np.newaxis],
+                                  conditioning_stack, 1.0)
+
+    # The generator has a fixed batch size.
+    generated = generator.generate(
+        _pad(conditioning_stack, FLAGS.batch_size),
+        known_values=_pad(original, FLAGS.batch_size),
+        known_mask=_pad(known_mask, FLAGS.batch_size),
+        sample=FLAGS.sample)[:num_light_curves]
+
+    outputs["generated"].extend(generated)
+    outputs["original"].extend(original)
+    outputs["known_mask"].extend(known_mask)
+    if "example_id" in batch:
+      outputs.setdefault("example_id", []).extend(batch["example_id"])
+    tf.logging.info("Generated %d light curves", len(outputs["generated"]))
+
+  if generator is None:
+    raise ValueError("No input light curves.")
+  generator.close()
+
+  # Light curves in different batches may have different lengths, so they
+  # are padded to the longest light curve.
+  outputs = {
+      name: (np.array(values)
+             if name == "example_id" else _stack_and_pad(values))
+      for name, values in outputs.items()
+  }
+  output_dir = os.path.dirname(FLAGS.output_file)
+  if output_dir:
+    tf.gfile.MakeDirs(output_dir)
+  with tf.gfile.Open(FLAGS.output_file, "wb") as f:
+    np.savez(f, **outputs)
+  tf.logging.info("Wrote %d light curves to %s", len(outputs["generated"]),
+                  FLAGS.output_file)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  flags.mark_flags_as_required(["model_dir", "dataset", "output_file"])
+  tf.app.run()
@@ -32,6 +32,7 @@ from astrowavenet.util import estimator_util
 from tf_util import config_util
 from tf_util import configdict
 from tf_util import estimator_runner
+from tf_util import training_hooks
 
 FLAGS = flags.FLAGS
 
@@ -85,6 +86,12 @@ flags.DEFINE_integer("save_checkpoints_secs", None,
 flags.DEFINE_integer("keep_checkpoint_max", 1,
                      "The maximum number of model checkpoints to keep.")
 
+flags.DEFINE_integer(
+    "throughput_log_steps", None,
+    "If set, the training examples/sec, step time, input stall fraction and "
+    "host memory are logged every this many steps, as summaries and in "
+    "throughput.jsonl in --model_dir. Not supported on TPU.")
+
 # ------------------------------------------------------------------------------
 # TPU-only flags
 # ------------------------------------------------------------------------------
@@ -189,6 +196,13 @@ def main(argv):
     if key not in ["dataset", "hparams"]:
       raise ValueError("Unrecognized config override: {}".format(key))
   config.hparams.update(config_overrides.get("hparams", {}))
+  dataset_overrides = config_overrides.get("dataset", {})
+  if (dataset_overrides.get("num_crops") and
+      "crop_warmup_length" not in dataset_overrides):
+    # Exclude the start of each random crop from the loss, where predictions
+    # depend on values before the crop.
+    dataset_overrides["crop_warmup_length"] = (
+        astrowavenet_model.receptive_field(config.hparams))
 
   # Log configs.
   configs_json = [
@@ -216,6 +230,13 @@ def main(argv):
                                       config_overrides.get("dataset"))
 
     train_hooks = []
+    if FLAGS.throughput_log_steps:
+      if FLAGS.use_tpu:
+        raise ValueError("--throughput_log_steps is not supported on TPU.")
+      train_hooks.append(
+          training_hooks.ThroughputHook(config.hparams.batch_size,
+                                        FLAGS.model_dir,
+                                        FLAGS.throughput_log_steps))
     if FLAGS.schedule == "train":
       estimator.train(
           train_input_fn, hooks=train_hooks, max_steps=FLAGS.train_steps)
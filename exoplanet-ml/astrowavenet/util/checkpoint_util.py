@@ -0,0 +1,138 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for converting AstroWaveNet checkpoints to fused convolutions.
+
+An AstroWaveNet with hparams.fused_gated_conv = True computes the same function
+as an unfused model, but each fused convolution kernel is the concatenation of
+several unfused kernels along the output channel axis. See
+AstroWaveNet.fused_gated_residual_layer().
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+
+def fused_variable_sources(hparams):
+  """Returns the unfused variables that make up each fused variable.
+
+  Args:
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    A dictionary mapping the name of each fused variable to the list of names of
+    the unfused variables whose values are concatenated along the last axis.
+  """
+  layers = [
+      "block_{}/dilation_{}".format(i, dilation_rate)
+      for i in range(hparams.num_residual_blocks)
+      for dilation_rate in hparams.dilation_rates
+  ]
+  sources = {}
+  for suffix in ["kernel", "bias"]:
+    # The conditioning projections of all layers, ordered by layer, then filter
+    # before gate.
+    sources["conditioning/conv1x1/" + suffix] = [
+        "{}/{}/conv1x1/{}".format(layer, part, suffix)
+        for layer in layers
+        for part in ["filter", "gate"]
+    ]
+    for layer in layers:
+      sources["{}/filter_gate/causal_conv/{}".format(layer, suffix)] = [
+          "{}/filter/causal_conv/{}".format(layer, suffix),
+          "{}/gate/causal_conv/{}".format(layer, suffix),
+      ]
+      sources["{}/residual_skip/conv1x1/{}".format(layer, suffix)] = [
+          "{}/residual/conv1x1/{}".format(layer, suffix),
+          "{}/skip/conv1x1/{}".format(layer, suffix),
+      ]
+  return sources
+
+
+def _slot_suffixes(variable_names, name):
+  """Returns the suffixes of a variable and its optimizer slots, e.g. "/Adam".
+
+  Args:
+    variable_names: Collection of all variable names in a checkpoint.
+    name: Name of a variable.
+
+  Returns:
+    A list of suffixes s such that name + s is in variable_names.
+
+  Raises:
+    ValueError: If the variable is not in the checkpoint.
+  """
+  if name not in variable_names:
+    raise ValueError("Variable {} not found in checkpoint".format(name))
+  return [""] + sorted(
+      var_name[len(name):]
+      for var_name in variable_names
+      if var_name.startswith(name + "/"))
+
+
+def fuse_checkpoint_values(checkpoint_path, hparams):
+  """Reads an unfused checkpoint and maps its values to fused variables.
+
+  Optimizer slot variables (e.g. Adam moments) are mapped in the same way as
+  their variables, so training can resume from the converted checkpoint.
+
+  Args:
+    checkpoint_path: Path to a checkpoint of an AstroWaveNet with
+      hparams.fused_gated_conv = False.
+    hparams: ConfigDict of the model hyperparameters.
+
+  Returns:
+    A dictionary mapping variable names to numpy arrays.
+  """
+  reader = tf.train.load_checkpoint(checkpoint_path)
+  variable_names = set(reader.get_variable_to_shape_map())
+  values = {}
+  converted = set()
+  for fused_name, source_names in fused_variable_sources(hparams).items():
+    for suffix in _slot_suffixes(variable_names, source_names[0]):
+      names = [name + suffix for name in source_names]
+      values[fused_name + suffix] = np.concatenate(
+          [reader.get_tensor(name) for name in names], axis=-1)
+      converted.update(names)
+
+  # Copy all other variables, e.g. the preprocessing layer and global step.
+  for name in variable_names - converted:
+    values[name] = reader.get_tensor(name)
+
+  return values
+
+
+def save_checkpoint_values(values, checkpoint_path):
+  """Writes a checkpoint containing the given variable values.
+
+  Args:
+    values: Dictionary mapping variable names to numpy arrays.
+    checkpoint_path: Path prefix of the output checkpoint, e.g.
+      "/tmp/model/model.ckpt-1000".
+  """
+  with tf.Graph().as_default():
+    variables = {
+        name: tf.get_variable(
+            name, shape=value.shape, dtype=tf.as_dtype(value.dtype))
+        for name, value in values.items()
+    }
+    saver = tf.train.Saver(variables)
+    with tf.Session() as sess:
+      for name, variable in variables.items():
+        variable.load(values[name], sess)
+      saver.save(sess, checkpoint_path, write_meta_graph=False)
@@ -0,0 +1,114 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for checkpoint_util."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+from astrowavenet.util import checkpoint_util
+from tf_util import configdict
+
+
+class CheckpointUtilTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(CheckpointUtilTest, self).setUp()
+    self.hparams = configdict.ConfigDict({
+        "use_future_context": False,
+        "predict_n_steps_ahead": 1,
+        "dilation_kernel_width": 2,
+        "skip_output_dim": 6,
+        "preprocess_output_size": 3,
+        "preprocess_kernel_width": 5,
+        "num_residual_blocks": 2,
+        "dilation_rates": [1, 2, 4],
+        "output_distribution": {
+            "type": "normal",
+            "min_scale": 0.001,
+            "predict_outlier_distribution": False
+        },
+        "fused_gated_conv": False,
+    })
+    np.random.seed(123)
+    self.features = {
+        "autoregressive_input":
+            np.random.normal(size=[2, 30, 1]).astype(np.float32),
+        "conditioning_stack":
+            np.random.normal(size=[2, 30, 2]).astype(np.float32),
+    }
+
+  def _build_model(self, hparams):
+    features = {
+        name: tf.constant(value) for name, value in self.features.items()
+    }
+    model = astrowavenet_model.AstroWaveNet(features, hparams,
+                                            tf.estimator.ModeKeys.PREDICT)
+    model.build()
+    return model
+
+  def test_fused_variable_sources(self):
+    with tf.Graph().as_default():
+      self._build_model(self.hparams)
+      unfused_names = {v.op.name for v in tf.global_variables()}
+
+    fused_hparams = copy.deepcopy(self.hparams)
+    fused_hparams.fused_gated_conv = True
+    with tf.Graph().as_default():
+      self._build_model(fused_hparams)
+      fused_names = {v.op.name for v in tf.global_variables()}
+
+    sources = checkpoint_util.fused_variable_sources(self.hparams)
+    # Every fused variable is either converted or has the same name.
+    self.assertEmpty(fused_names - set(sources) - unfused_names)
+    for source_names in sources.values():
+      self.assertContainsSubset(source_names, unfused_names)
+
+  def test_fused_model_matches_unfused_model(self):
+    checkpoint_path = os.path.join(self.get_temp_dir(), "unfused.ckpt")
+    with tf.Graph().as_default():
+      model = self._build_model(self.hparams)
+      saver = tf.train.Saver()
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        expected_output = sess.run(model.network_output)
+        saver.save(sess, checkpoint_path)
+
+    fused_checkpoint_path = os.path.join(self.get_temp_dir(), "fused.ckpt")
+    values = checkpoint_util.fuse_checkpoint_values(checkpoint_path,
+                                                    self.hparams)
+    checkpoint_util.save_checkpoint_values(values, fused_checkpoint_path)
+
+    fused_hparams = copy.deepcopy(self.hparams)
+    fused_hparams.fused_gated_conv = True
+    with tf.Graph().as_default():
+      model = self._build_model(fused_hparams)
+      saver = tf.train.Saver()
+      with tf.Session() as sess:
+        saver.restore(sess, fused_checkpoint_path)
+        output = sess.run(model.network_output)
+
+    self.assertAllClose(expected_output, output, atol=1e-5)
+
+
+if __name__ == "__main__":
+  tf.test.main()
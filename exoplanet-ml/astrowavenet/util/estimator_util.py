@@ -23,6 +23,7 @@ import copy
 import tensorflow as tf
 
 from astronet.ops import training
+from tf_util import compute_util
 
 
 class _InputFn(object):
@@ -162,6 +163,12 @@ def create_estimator(model_class,
   else:
     run_config = copy.deepcopy(run_config)
 
+  # Possibly enable XLA auto-clustering.
+  session_config = compute_util.configure_session(run_config.session_config,
+                                                  hparams)
+  if session_config is not run_config.session_config:
+    run_config = run_config.replace(session_config=session_config)
+
   use_tpu = isinstance(run_config, tf.contrib.tpu.RunConfig)
   model_fn = create_model_fn(model_class, hparams, use_tpu)
 
@@ -52,6 +52,21 @@ flags.DEFINE_string(
     "checkpoint_filename", None,
     "Optional filename for a specific model checkpoint to use.")
 
+flags.DEFINE_integer(
+    "embedding_batch_size", 16,
+    "Maximum number of light curves whose embeddings are computed in a single "
+    "session run.")
+
+flags.DEFINE_enum(
+    "embedding_encoding", "float_list",
+    ["float_list"] + list(example_util.QUANTIZED_ENCODINGS),
+    "Encoding of the embedding views in the output. 'float_list' writes a "
+    "float feature '{view}_emb_{i}' per embedding dimension. 'float16' and "
+    "'int8' write a single bytes feature '{view}_emb' of shape [nbins, "
+    "embedding_dim] per view, which must be read with a subcomponent "
+    "{'name': '{view}_emb', 'ndims': embedding_dim, 'encoding': ...}; see "
+    "astronet.ops.dataset_ops.build_dataset().")
+
 flags.DEFINE_string("output_dir", None,
                     "Directory in which to save the output.")
 
@@ -64,6 +79,12 @@ flags.DEFINE_integer("num_shards_val", 8,
 flags.DEFINE_integer("num_shards_test", 8,
                      "Number of shards for the test sets.")
 
+flags.DEFINE_enum("compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the output TFRecord files.")
+
+flags.DEFINE_enum("astrowavenet_compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the input AstroWaveNet TFRecord files.")
+
 
 FLAGS = flags.FLAGS
 
@@ -105,6 +126,9 @@ def _parse_configs():
         },
         "model_dir": FLAGS.model_dir,
         "checkpoint_filename": FLAGS.checkpoint_filename,
+        "embedding_batch_size": FLAGS.embedding_batch_size,
+        "embedding_encoding": FLAGS.embedding_encoding,
+        "astrowavenet_compression_type": FLAGS.astrowavenet_compression_type,
         "column_value_whitelists": {
             _LABEL_COLUMN: ["PC", "AFP", "NTP", "INV", "INJ1", "INJ2", "SCR1"]
         },
@@ -225,43 +249,48 @@ class _GroupEventsAndExamplesDoFn(beam.DoFn):
       yield outputs
 
 
-def _make_views(tce, time, values, global_view_nbins,
-                global_view_bin_width_factor, local_view_nbins,
-                local_view_bin_width_factor, local_view_num_durations, aggr_fn):
-  """Creates global and local views with embeddings or flux."""
-  # Extract event attributes.
+def _view_bins(tce, global_view_nbins, global_view_bin_width_factor,
+               local_view_nbins, local_view_bin_width_factor,
+               local_view_num_durations):
+  """Returns the binning arguments of the global and local views of a TCE."""
   period = tce["tce_period"]
-  t0 = tce["tce_time0bk"]
   duration = tce["tce_duration"]
   t_min = -period / 2
   t_max = period / 2
+  return {
+      "global_view": {
+          "num_bins": global_view_nbins,
+          "bin_width": period * global_view_bin_width_factor,
+          "x_min": t_min,
+          "x_max": t_max,
+      },
+      "local_view": {
+          "num_bins": local_view_nbins,
+          "bin_width": duration * local_view_bin_width_factor,
+          "x_min": max(t_min, -duration * local_view_num_durations),
+          "x_max": min(t_max, duration * local_view_num_durations),
+      },
+  }
+
 
+def _make_views(tce, time, values, aggr_fn, **view_config):
+  """Creates global and local views with embeddings or flux."""
   time, values = preprocess.phase_fold_and_sort_light_curve(
-      time, values, period, t0)
+      time, values, tce["tce_period"], tce["tce_time0bk"])
 
   aggr_fn = getattr(np, aggr_fn)
+  return {
+      name: binning.bin_and_aggregate(time, values, aggr_fn=aggr_fn, **bins)
+      for name, bins in _view_bins(tce, **view_config).items()
+  }
 
-  global_view, global_view_counts = binning.bin_and_aggregate(
-      time,
-      values,
-      num_bins=global_view_nbins,
-      bin_width=period * global_view_bin_width_factor,
-      x_min=t_min,
-      x_max=t_max,
-      aggr_fn=aggr_fn)
-
-  local_view, local_view_counts = binning.bin_and_aggregate(
-      time,
-      values,
-      num_bins=local_view_nbins,
-      bin_width=duration * local_view_bin_width_factor,
-      x_min=max(t_min, -duration * local_view_num_durations),
-      x_max=min(t_max, duration * local_view_num_durations),
-      aggr_fn=aggr_fn)
 
+def _make_sum_views(tce, folded_sums, **view_config):
+  """Creates global and local views with aggr_fn "sum" from PhaseFoldedSums."""
   return {
-      "global_view": (global_view, global_view_counts),
-      "local_view": (local_view, local_view_counts),
+      name: folded_sums.bin_and_sum(tce["tce_period"], tce["tce_time0bk"],
+                                    **bins)
+      for name, bins in _view_bins(tce, **view_config).items()
   }
 
 
@@ -270,10 +299,27 @@ class _GenerateExampleDoFn(beam.DoFn):
 
   def __init__(self, config):
     self.config = config
+    # Cumulative sums of the embeddings of the most recent Kepler ID. The TCEs
+    # of each Kepler ID are output consecutively by _GroupEventsAndExamplesDoFn,
+    # so they share the sums when the two stages are fused.
+    self._emb_sums_kepid = None
+    self._emb_sums = None
 
   def inc_counter(self, name):
     Metrics.counter(self.__class__.__name__, name).inc()
 
+  def _make_emb_views(self, tce, kepler_id, time, embedding):
+    """Creates the embedding views of a TCE."""
+    view_config = dict(self.config.emb_views)
+    if view_config.pop("aggr_fn") != "sum":
+      return _make_views(tce, time, embedding, **self.config.emb_views)
+
+    if self._emb_sums_kepid != kepler_id:
+      self._emb_sums = binning.PhaseFoldedSums(time, embedding)
+      self._emb_sums_kepid = kepler_id
+      self.inc_counter("embedding-sums-computed")
+    return _make_sum_views(tce, self._emb_sums, **view_config)
+
   def process(self, inputs):
     """Processes the light curve for a Kepler event and returns a tf.Example.
 
@@ -306,21 +352,30 @@ class _GenerateExampleDoFn(beam.DoFn):
       view -= np.median(view)
       view /= np.abs(np.min(view))
       # Set features.
-      example_util.set_float_feature(ex, "{}_flux".format(name), view)
-      example_util.set_float_feature(ex, "{}_flux_counts".format(name), counts)
+      example_util.set_float_array_feature(ex, "{}_flux".format(name), view)
+      example_util.set_float_array_feature(ex, "{}_flux_counts".format(name),
+                                           counts)
 
     # From AstroWaveNet.
     awn_time = inputs["time"]
     embedding = inputs["embedding"]
 
     # Make the embedding views.
-    emb_views = _make_views(tce, awn_time, embedding, **self.config.emb_views)
+    emb_views = self._make_emb_views(tce, inputs["kepler_id"], awn_time,
+                                     embedding)
+    encoding = self.config.get("embedding_encoding", "float_list")
     for name, (view, counts) in emb_views.items():
       assert view.ndim == 2
-      view = np.transpose(view)  # Turn into rows of features.
-      for i in range(len(view)):
-        example_util.set_float_feature(ex, "{}_emb_{}".format(name, i), view[i])
-      example_util.set_float_feature(ex, "{}_emb_counts".format(name), counts)
+      if encoding == "float_list":
+        view = np.transpose(view)  # Turn into rows of features.
+        for i in range(len(view)):
+          example_util.set_float_array_feature(ex, "{}_emb_{}".format(name, i),
+                                               view[i])
+      else:
+        example_util.set_quantized_array_feature(ex, "{}_emb".format(name),
+                                                 view, encoding)
+      example_util.set_float_array_feature(ex, "{}_emb_counts".format(name),
+                                           counts)
 
     # Set other features in `tce`.
     for name, value in tce.items():
@@ -368,7 +423,8 @@ def _write_subset(dataset_name, name, values):
       value_name="example",
       value_coder=beam.coders.ProtoCoder(tf.train.Example),
       num_shards=num_shards,
-      stage_name_suffix=dataset_name)
+      stage_name_suffix=dataset_name,
+      compression_type=FLAGS.compression_type)
 
 
 def _process_tces(root, config):
@@ -428,7 +484,9 @@ def _process_tces(root, config):
       | "{}-read_wavenet_inputs".format(name) >>
       beam.io.tfrecordio.ReadFromTFRecord(
           config.astrowavenet_file_pattern,
-          coder=beam.coders.ProtoCoder(tf.train.Example))
+          coder=beam.coders.ProtoCoder(tf.train.Example),
+          compression_type=utils.get_beam_compression_type(
+              config.astrowavenet_compression_type))
       | "{}-key_examples_by_kepid".format(name) >>
       beam.Map(_key_example_by_kepid))
   results = (
@@ -436,6 +494,8 @@ def _process_tces(root, config):
       | "{}-join_events_and_inputs".format(name) >> beam.CoGroupByKey()
       | "{}-group_events_and_inputs".format(name) >> beam.ParDo(
           _GroupEventsAndExamplesDoFn())
+      | "{}-batch_inputs".format(name) >> beam.BatchElements(
+          max_batch_size=config.embedding_batch_size)
       | "{}-extract_embeddings".format(name) >> beam.ParDo(extract_embeddings)
       | "{}-generate_examples".format(name) >> beam.ParDo(generate_example)
       | "{}-reshuffle".format(name) >> beam.Reshuffle()
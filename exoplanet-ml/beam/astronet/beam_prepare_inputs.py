@@ -66,6 +66,13 @@ flags.DEFINE_string(
     "light_curve_scramble_type", None,
     "What scrambling procedure to use. One of 'SCR1', 'SCR2', 'SCR3', or None.")
 
+flags.DEFINE_enum(
+    "time_series_format", "float_list", preprocess.TIME_SERIES_FORMATS,
+    "Encoding of the light curve views in the output tf.Examples.")
+
+flags.DEFINE_enum("compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the output TFRecord files.")
+
 FLAGS = flags.FLAGS
 
 _LABEL_COLUMN = "av_training_set"
@@ -128,6 +135,15 @@ def _prepare_pipeline_inputs(events, config):
 class GenerateExampleDoFn(beam.DoFn):
   """Processes the light curve for a Kepler event and returns a tf.Example."""
 
+  def __init__(self, time_series_format="float_list"):
+    """Initializes the DoFn.
+
+    Args:
+      time_series_format: Encoding of the light curve views; one of
+        preprocess.TIME_SERIES_FORMATS.
+    """
+    self.time_series_format = time_series_format
+
   def process(self, inputs):
     """Processes the light curve for a Kepler event and returns a tf.Example.
 
@@ -148,7 +164,8 @@ class GenerateExampleDoFn(beam.DoFn):
     flux /= norm_curve
 
     # Generate example.
-    inputs["example"] = preprocess.generate_example_for_tce(time, flux, event)
+    inputs["example"] = preprocess.generate_example_for_tce(
+        time, flux, event, self.time_series_format)
 
     yield inputs
 
@@ -182,6 +199,7 @@ def main(argv):
       "column_value_whitelists": {
           _LABEL_COLUMN: ["PC", "AFP", "NTP", "INV", "INJ1", "SCR1"]
       },
+      "time_series_format": FLAGS.time_series_format,
   })
 
   def pipeline(root):
@@ -208,7 +226,7 @@ def main(argv):
         normalize_args=config.normalize_args,
         upward_outlier_sigma_cut=config.upward_outlier_sigma_cut,
         remove_events_width_factor=config.remove_events_width_factor)
-    generate_example = GenerateExampleDoFn()
+    generate_example = GenerateExampleDoFn(config.time_series_format)
     partition_fn = utils.TrainValTestPartitionFn(
         key_name="tce_id",
         partitions={
@@ -247,7 +265,8 @@ def main(argv):
           output_name=name,
           value_name="example",
           value_coder=beam.coders.ProtoCoder(tf.train.Example),
-          num_shards=num_shards)
+          num_shards=num_shards,
+          compression_type=FLAGS.compression_type)
 
   pipeline.run()
   logging.info("Preprocessing complete.")
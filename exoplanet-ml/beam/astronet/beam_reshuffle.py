@@ -26,6 +26,7 @@ from absl import logging
 import apache_beam as beam
 import tensorflow as tf
 
+from beam import utils
 from tf_util import example_util
 
 flags.DEFINE_string("input_file_patterns", None,
@@ -37,6 +38,12 @@ flags.DEFINE_string("output_name", None, "Base name of output TFRecords.")
 
 flags.DEFINE_integer("num_shards", None, "Number of output shards.")
 
+flags.DEFINE_enum("input_compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the input TFRecord files.")
+
+flags.DEFINE_enum("compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the output TFRecord files.")
+
 FLAGS = flags.FLAGS
 
 
@@ -74,7 +81,10 @@ def main(argv):
       logging.info("Reading TFRecords from %s", file_pattern)
       stage_name = "read_tfrecords_{}".format(i)
       tfrecords.append(root | stage_name >> beam.io.tfrecordio.ReadFromTFRecord(
-          file_pattern, coder=beam.coders.ProtoCoder(tf.train.Example)))
+          file_pattern,
+          coder=beam.coders.ProtoCoder(tf.train.Example),
+          compression_type=utils.get_beam_compression_type(
+              FLAGS.input_compression_type)))
 
     # pylint: disable=expression-not-assigned
     (tfrecords
@@ -84,7 +94,9 @@ def main(argv):
      | "write_tfrecord" >> beam.io.tfrecordio.WriteToTFRecord(
          os.path.join(FLAGS.output_dir, FLAGS.output_name),
          coder=beam.coders.ProtoCoder(tf.train.Example),
-         num_shards=FLAGS.num_shards))
+         num_shards=FLAGS.num_shards,
+         compression_type=utils.get_beam_compression_type(
+             FLAGS.compression_type)))
     # pylint: enable=expression-not-assigned
 
   pipeline.run()
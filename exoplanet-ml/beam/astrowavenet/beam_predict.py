@@ -32,6 +32,7 @@ import tensorflow as tf
 from astrowavenet import configurations
 from astrowavenet.beam import prediction_fns
 from astrowavenet.beam import visualize_fns
+from beam import utils
 from tf_util import configdict
 
 flags.DEFINE_string(
@@ -51,6 +52,13 @@ flags.DEFINE_string(
     "config_overrides", "{}",
     "JSON string or JSON file containing overrides to the base configuration.")
 
+flags.DEFINE_boolean(
+    "stream_checkpoints", True,
+    "Whether each worker should build the model once, and restore each "
+    "checkpoint into the same graph before streaming all input files through "
+    "it. Otherwise, an Estimator is created for each pair of checkpoint and "
+    "input file.")
+
 flags.DEFINE_boolean("save_losses_per_step", True,
                      "Whether to save a csv of losses for each step.")
 
@@ -64,6 +72,10 @@ flags.DEFINE_boolean(
     "save_animations", False,
     "Whether to save animations of training for each example.")
 
+flags.DEFINE_enum(
+    "compression_type", "", utils.COMPRESSION_TYPES,
+    "Compression type of the TFRecord files written by --save_all_predictions.")
+
 FLAGS = flags.FLAGS
 
 
@@ -115,15 +127,24 @@ def main(unused_argv):
     if not tf.gfile.Exists(FLAGS.output_dir):
       tf.gfile.MakeDirs(FLAGS.output_dir)
 
-    # Initialize DoFns.
-    make_predictions = prediction_fns.MakePredictionsDoFn(
-        config.hparams, config_overrides.get("dataset"))
-
     # Create pipeline.
-    predictions = (
-        root
-        | beam.Create(itertools.product(checkpoint_paths, input_files))
-        | "make_predictions" >> beam.ParDo(make_predictions))
+    if FLAGS.stream_checkpoints:
+      make_predictions = prediction_fns.SweepCheckpointsDoFn(
+          config.hparams, config_overrides.get("dataset"),
+          ",".join(input_files))
+      predictions = (
+          root
+          | beam.Create(checkpoint_paths)
+          # Distribute checkpoints among workers.
+          | "reshuffle_checkpoints" >> beam.Reshuffle()
+          | "make_predictions" >> beam.ParDo(make_predictions))
+    else:
+      make_predictions = prediction_fns.MakePredictionsDoFn(
+          config.hparams, config_overrides.get("dataset"))
+      predictions = (
+          root
+          | beam.Create(itertools.product(checkpoint_paths, input_files))
+          | "make_predictions" >> beam.ParDo(make_predictions))
     predictions_per_example = (
         predictions
         | "key_by_example_id" >> beam.Map(key_by("example_id"))
@@ -144,7 +165,8 @@ def main(unused_argv):
       predictions | "make_plots" >> beam.ParDo(make_plots)
     if FLAGS.save_all_predictions:
       save_predictions = prediction_fns.SavePredictionsDoFn(
-          os.path.join(FLAGS.output_dir, "predictions"))
+          os.path.join(FLAGS.output_dir, "predictions"),
+          FLAGS.compression_type)
       (predictions_per_example
        | "save_predictions" >> beam.ParDo(save_predictions))
     if FLAGS.save_animations:
@@ -63,6 +63,9 @@ flags.DEFINE_integer("num_shards_val", 1,
 
 flags.DEFINE_integer("num_shards_test", 1, "Number of shards for the test set.")
 
+flags.DEFINE_enum("compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the output TFRecord files.")
+
 flags.DEFINE_integer("upward_outlier_clipping", 5,
                      "Maximum allowed standard deviations above the median.")
 
@@ -75,6 +78,20 @@ flags.DEFINE_integer("clip_lowest_n_values", 20,
 flags.DEFINE_boolean("normalize_stddev", True,
                      "Whether or not to normalize the standard deviation.")
 
+flags.DEFINE_integer(
+    "window_length", None,
+    "If specified, each light curve is split into overlapping windows of this "
+    "many cadences, which are output as separate examples. This bounds the "
+    "size of each example, e.g. for short cadence data, and lets training "
+    "shuffle windows rather than whole light curves.")
+
+flags.DEFINE_integer(
+    "window_overlap", 0,
+    "Number of cadences shared by consecutive windows. Should be at least the "
+    "receptive field of the model (see astrowavenet_model.receptive_field()); "
+    "the first window_overlap values of each window after the first are only "
+    "used as context and have zero weight in training.")
+
 FLAGS = flags.FLAGS
 
 
@@ -93,6 +110,8 @@ def main(argv):
       "downward_outlier_clipping": FLAGS.downward_outlier_clipping,
       "clip_lowest_n_values": FLAGS.clip_lowest_n_values,
       "normalize_stddev": FLAGS.normalize_stddev,
+      "window_length": FLAGS.window_length,
+      "window_overlap": FLAGS.window_overlap,
   })
 
   def pipeline(root):
@@ -127,7 +146,9 @@ def main(argv):
         upward_outlier_clipping=config.upward_outlier_clipping,
         downward_outlier_clipping=config.downward_outlier_clipping,
         clip_lowest_n_values=config.clip_lowest_n_values,
-        normalize_stddev=config.normalize_stddev)
+        normalize_stddev=config.normalize_stddev,
+        window_length=config.window_length,
+        window_overlap=config.window_overlap)
     partition_fn = utils.TrainValTestPartitionFn(
         key_name="kepler_id",
         partitions={
@@ -160,11 +181,12 @@ def main(argv):
 
       utils.write_to_tfrecord(
           subset,
-          key="example",
           output_dir=FLAGS.output_dir,
           output_name=name,
-          coder=beam.coders.ProtoCoder(tf.train.Example),
-          num_shards=num_shards)
+          value_name="example",
+          value_coder=beam.coders.ProtoCoder(tf.train.Example),
+          num_shards=num_shards,
+          compression_type=FLAGS.compression_type)
 
   pipeline.run()
   logging.info("Preprocessing complete.")
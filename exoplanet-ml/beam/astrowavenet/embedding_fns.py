@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 import os.path
+import threading
 
 import apache_beam as beam
 from apache_beam.metrics import Metrics
@@ -33,8 +34,85 @@ from tf_util import configdict
 from tf_util import example_util
 
 
+class _EmbeddingModel(object):
+  """An AstroWaveNet model restored from a checkpoint in its own session.
+
+  The model computes the embeddings of a batch of serialized tf.Example protos.
+  Sequences are padded with zeros at the end up to the longest sequence in the
+  batch. The network is causal, so the embeddings of each sequence do not
+  depend on its padding.
+  """
+
+  def __init__(self, checkpoint_file, hparams):
+    graph = tf.Graph()
+    with graph.as_default():
+      self._serialized = tf.placeholder(tf.string, shape=[None])
+      parsed_features = kepler_light_curves.parse_examples(self._serialized)
+      features = {
+          # Add an extra dimension: [batch_size, length] ->
+          # [batch_size, length, 1].
+          feature_name: tf.expand_dims(parsed_features[feature_name], -1)
+          for feature_name in [
+              "autoregressive_input", "conditioning_stack", "weights"
+          ]
+      }
+      model = astrowavenet_model.AstroWaveNet(
+          features=features,
+          hparams=hparams,
+          mode=tf.estimator.ModeKeys.PREDICT)
+      model.build()
+      saver = tf.train.Saver()
+      self._outputs = {
+          "example_id": parsed_features["example_id"],
+          "length": parsed_features["length"],
+          "embedding": model.network_output,
+      }
+
+    self._session = tf.Session(graph=graph)
+    saver.restore(self._session, checkpoint_file)
+    tf.logging.info("Successfully loaded checkpoint %s at global step %d.",
+                    checkpoint_file, self._session.run(model.global_step))
+
+  def embed(self, serialized_examples):
+    """Computes the embeddings of a batch of serialized tf.Example protos.
+
+    Args:
+      serialized_examples: List of serialized tf.Example protos.
+
+    Returns:
+      A list of (example_id, embedding) pairs, where embedding is a numpy array
+      with the same length as the example's sequences.
+    """
+    outputs = self._session.run(
+        self._outputs, feed_dict={self._serialized: serialized_examples})
+    return [(outputs["example_id"][i],
+             np.squeeze(outputs["embedding"][i:i + 1, :outputs["length"][i]]))
+            for i in range(len(serialized_examples))]
+
+
+# Models shared by all DoFn instances in the same worker process, keyed by
+# checkpoint file and hyperparameters, so each worker builds the graph and
+# restores the checkpoint only once.
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def _get_shared_model(checkpoint_file, hparams):
+  """Returns the _EmbeddingModel for a checkpoint, creating it if needed."""
+  key = (checkpoint_file, config_util.to_json(hparams))
+  with _MODELS_LOCK:
+    if key not in _MODELS:
+      _MODELS[key] = _EmbeddingModel(checkpoint_file, hparams)
+    return _MODELS[key]
+
+
 class ExtractEmbeddingsDoFn(beam.DoFn):
-  """Generates predictions for a particular checkpoint."""
+  """Generates predictions for a particular checkpoint.
+
+  Elements are either single input dictionaries or lists of input dictionaries,
+  e.g. created by beam.BatchElements(). The embeddings of each list are
+  computed in a single session run.
+  """
 
   def __init__(self,
                model_dir,
@@ -73,67 +151,37 @@ class ExtractEmbeddingsDoFn(beam.DoFn):
     self.interpolate_missing_time = interpolate_missing_time
 
   def start_bundle(self):
-    # Build the model.
-    g = tf.Graph()
-    with g.as_default():
-      example_placeholder = tf.placeholder(tf.string, shape=[])
-      parsed_features = kepler_light_curves.parse_example(example_placeholder)
-      parsed_example_id = parsed_features.pop("example_id")
-      parsed_time = parsed_features.pop("time")
-      features = {
-          # Add extra dimensions: [length] -> [1, length, 1].
-          feature_name: tf.reshape(value, [1, -1, 1])
-          for feature_name, value in parsed_features.items()
-      }
-      model = astrowavenet_model.AstroWaveNet(
-          features=features,
-          hparams=self.config.hparams,
-          mode=tf.estimator.ModeKeys.PREDICT)
-      model.build()
-      saver = tf.train.Saver()
-
-    sess = tf.Session(graph=g)
-    saver.restore(sess, self.checkpoint_file)
-    tf.logging.info("Successfully loaded checkpoint %s at global step %d.",
-                    self.checkpoint_file, sess.run(model.global_step))
-
-    self.example_placeholder = example_placeholder
-    self.parsed_example_id = parsed_example_id
-    self.parsed_time = parsed_time
-    self.model = model
-    self.session = sess
-
-  def finish_bundle(self):
-    self.session.close()
+    self.model = _get_shared_model(self.checkpoint_file, self.config.hparams)
 
   def process(self, inputs):
+    batch = [inputs] if isinstance(inputs, dict) else inputs
+    embeddings = self.model.embed(
+        [inputs["wavenet_example"].SerializeToString() for inputs in batch])
+    Metrics.distribution(self.__class__.__name__,
+                         "embedding-batch-size").update(len(batch))
+    for inputs, (example_id, embedding) in zip(batch, embeddings):
+      yield self._postprocess(inputs, example_id, embedding)
+
+  def _postprocess(self, inputs, example_id, embedding):
+    """Aligns an embedding with the time values of its example."""
     kepler_id = inputs["kepler_id"]
     example = inputs["wavenet_example"]
 
     # Get time, cadence number, and mask vectors from the example.
-    time = example_util.get_float_feature(example, "time")
+    time = example_util.get_float_array_feature(example, "time")
     cadence_no = example_util.get_int64_feature(example, "cadence_no")
-    mask = example_util.get_int64_feature(example, "mask").astype(np.bool)
+    mask = example_util.get_int64_feature(example, "mask").astype(bool)
     assert len(time) == len(cadence_no), (
         "len(time)={}, len(cadence_no)={}".format(len(time), len(cadence_no)))
     assert len(time) == len(mask), "len(time)={}, len(mask)={}".format(
         len(time), len(mask))
 
-    # Generate embeddings from AstroWavenet model.
-    model_output = self.session.run(
-        {
-            "example_id": self.parsed_example_id,
-            "embedding": self.model.network_output
-        },
-        feed_dict={self.example_placeholder: example.SerializeToString()})
-
     # Sanity check Kepler ID.
-    if kepler_id != model_output["example_id"]:
+    if kepler_id != example_id:
       raise ValueError("Expected Kepler ID {}, got {}".format(
-          kepler_id, model_output["example_id"]))
+          kepler_id, example_id))
 
-    # Extract and postprocess embedding.
-    embedding = np.squeeze(model_output["embedding"])
+    # Postprocess embedding.
     if self.align_to_predictions:
       shift_num_steps = self.config.hparams.predict_n_steps_ahead
       time = time[shift_num_steps:]
@@ -172,4 +220,4 @@ class ExtractEmbeddingsDoFn(beam.DoFn):
 
     inputs.update({"time": time, "embedding": embedding})
     Metrics.counter(self.__class__.__name__, "example-embeddings-output").inc()
-    yield inputs
+    return inputs
@@ -0,0 +1,137 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for embedding_fns.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+from astrowavenet import configurations
+from beam.astrowavenet import embedding_fns
+from tf_util import config_util
+from tf_util import configdict
+from tf_util import example_util
+
+_EmbeddingModel = embedding_fns._EmbeddingModel  # pylint:disable=protected-access
+
+# Lengths of the test light curves.
+_LENGTHS = [30, 51, 17]
+
+
+def _build_config():
+  """Returns the configuration of a tiny AstroWaveNet model."""
+  config = configdict.ConfigDict(configurations.base())
+  config.hparams.skip_output_dim = 4
+  config.hparams.preprocess_kernel_width = 5
+  config.hparams.num_residual_blocks = 2
+  config.hparams.dilation_rates = [1, 2, 4]
+  return config
+
+
+def _save_checkpoint(hparams, model_dir):
+  """Saves a checkpoint of a randomly initialized model."""
+  with tf.Graph().as_default():
+    tf.set_random_seed(1)
+    features = {
+        "autoregressive_input": tf.placeholder(tf.float32, [None, None, 1]),
+        "conditioning_stack": tf.placeholder(tf.float32, [None, None, 1]),
+    }
+    model = astrowavenet_model.AstroWaveNet(features, hparams,
+                                            tf.estimator.ModeKeys.PREDICT)
+    model.build()
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+      sess.run(tf.global_variables_initializer())
+      return saver.save(sess, os.path.join(model_dir, "model.ckpt"))
+
+
+def _make_examples():
+  """Returns a random light curve Example of each length in _LENGTHS."""
+  rng = np.random.RandomState(0)
+  examples = []
+  for i, length in enumerate(_LENGTHS):
+    ex = tf.train.Example()
+    mask = (rng.uniform(size=length) > 0.2).astype(np.int64)
+    cadence_no = np.arange(length)
+    time = np.where(mask, 1 + 0.02 * cadence_no, 0)
+    example_util.set_int64_feature(ex, "kepler_id", [1000 + i])
+    example_util.set_float_array_feature(ex, "time", time)
+    example_util.set_float_array_feature(ex, "flux", rng.normal(size=length))
+    example_util.set_int64_array_feature(ex, "cadence_no", cadence_no)
+    example_util.set_int64_array_feature(ex, "mask", mask)
+    examples.append(ex)
+  return examples
+
+
+class EmbeddingFnsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(EmbeddingFnsTest, self).setUp()
+    self._config = _build_config()
+    self._model_dir = self.get_temp_dir()
+    self._checkpoint_file = _save_checkpoint(self._config.hparams,
+                                             self._model_dir)
+    self._examples = _make_examples()
+
+  def testBatchedEmbeddings(self):
+    model = _EmbeddingModel(self._checkpoint_file, self._config.hparams)
+    serialized = [ex.SerializeToString() for ex in self._examples]
+
+    # Examples embedded one at a time are not padded.
+    expected = [model.embed([s])[0] for s in serialized]
+    for length, (_, embedding) in zip(_LENGTHS, expected):
+      self.assertEqual((length, 4), embedding.shape)
+
+    # In a batch, the shorter examples are padded up to the longest example.
+    embeddings = model.embed(serialized)
+    self.assertEqual(len(serialized), len(embeddings))
+    for (expected_id, expected_embedding), (example_id, embedding) in zip(
+        expected, embeddings):
+      self.assertEqual(expected_id, example_id)
+      self.assertAllClose(expected_embedding, embedding)
+
+  def testExtractEmbeddingsDoFn(self):
+    config_util.log_and_save_config(self._config, self._model_dir)
+    dofn = embedding_fns.ExtractEmbeddingsDoFn(self._model_dir)
+    dofn.start_bundle()
+
+    def _inputs():
+      return [{
+          "kepler_id": 1000 + i,
+          "wavenet_example": ex
+      } for i, ex in enumerate(self._examples)]
+
+    # A list of inputs gives the same outputs as each input on its own.
+    expected = [list(dofn.process(inputs))[0] for inputs in _inputs()]
+    outputs = list(dofn.process(_inputs()))
+    self.assertEqual(len(expected), len(outputs))
+    for expected_output, output in zip(expected, outputs):
+      self.assertEqual(expected_output["kepler_id"], output["kepler_id"])
+      self.assertAllClose(expected_output["time"], output["time"])
+      self.assertAllClose(expected_output["embedding"], output["embedding"])
+      self.assertEqual(
+          len(output["time"]),
+          np.sum(example_util.get_int64_feature(output["wavenet_example"],
+                                                "mask")))
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -28,6 +28,7 @@ import tensorflow as tf
 from astrowavenet import astrowavenet_model
 from astrowavenet.data import kepler_light_curves
 from astrowavenet.util import estimator_util
+from tf_util import compute_util
 from tf_util import config_util
 from tf_util import example_util
 
@@ -40,6 +41,34 @@ def _get_step_from_checkpoint_path(path):
   return int(split_path[1])
 
 
+def _unpad_predictions(predictions, global_step):
+  """Adds the global step to a single example's predictions and un-pads them.
+
+  Args:
+    predictions: Dictionary of the predictions for a single example.
+    global_step: Global step of the checkpoint the predictions were made with.
+
+  Returns:
+    The predictions dictionary, with squeezed sequences clipped to the length of
+    the example.
+  """
+  # Add global_step.
+  predictions["global_step"] = global_step
+
+  # Squeeze and un-pad the sequences.
+  weights = np.squeeze(predictions["seq_weights"])
+  real_length = len(weights)
+  while real_length > 0 and weights[real_length - 1] == 0:
+    real_length -= 1
+  for name, value in predictions.items():
+    value = np.squeeze(predictions[name])
+    if value.shape:
+      value = value[0:real_length]
+      predictions[name] = value
+
+  return predictions
+
+
 class MakePredictionsDoFn(beam.DoFn):
   """Generates predictions for a particular checkpoint."""
 
@@ -68,21 +97,79 @@ class MakePredictionsDoFn(beam.DoFn):
     # Generate predictions.
     for predictions in estimator.predict(
         input_fn, checkpoint_path=checkpoint_path):
-      # Add global_step.
-      predictions["global_step"] = global_step
+      yield _unpad_predictions(predictions, global_step)
+
+
+class SweepCheckpointsDoFn(beam.DoFn):
+  """Generates predictions for checkpoints using a single long-lived graph.
+
+  Unlike MakePredictionsDoFn, which creates an Estimator for each
+  (checkpoint, input file) pair, each instance of this DoFn builds the input
+  pipeline and the model once. Each element is a checkpoint path. The
+  checkpoint is restored into the existing graph, which replaces the values of
+  the variables in place, and all input files are streamed through the model.
+  """
+
+  def __init__(self, hparams, dataset_overrides, input_file_pattern):
+    """Initializes the DoFn.
+
+    Args:
+      hparams: ConfigDict of hyperparameters for building the model.
+      dataset_overrides: Dict or ConfigDict containing overrides to the
+        dataset configuration.
+      input_file_pattern: File pattern matching the input TFRecord files. May
+        also be a comma-separated list of file patterns.
+    """
+    self.hparams = hparams
+    self.dataset_overrides = dataset_overrides
+    self.input_file_pattern = input_file_pattern
+    self._session = None
 
-      # Squeeze and un-pad the sequences.
-      weights = np.squeeze(predictions["seq_weights"])
-      real_length = len(weights)
-      while real_length > 0 and weights[real_length - 1] == 0:
-        real_length -= 1
-      for name, value in predictions.items():
-        value = np.squeeze(predictions[name])
-        if value.shape:
-          value = value[0:real_length]
-          predictions[name] = value
+  def _build(self):
+    """Builds the input pipeline and the model."""
+    dataset_builder = kepler_light_curves.KeplerLightCurves(
+        self.input_file_pattern,
+        mode=tf.estimator.ModeKeys.PREDICT,
+        config_overrides=self.dataset_overrides)
+    tf.logging.info("Dataset config: %s",
+                    config_util.to_json(dataset_builder.config))
 
-      yield predictions
+    graph = tf.Graph()
+    with graph.as_default():
+      dataset = dataset_builder.build(self.hparams.batch_size)
+      iterator = dataset.make_initializable_iterator()
+      model_fn = estimator_util.create_model_fn(astrowavenet_model.AstroWaveNet,
+                                                self.hparams)
+      estimator_spec = model_fn(
+          iterator.get_next(), tf.estimator.ModeKeys.PREDICT,
+          {"batch_size": self.hparams.batch_size})
+      self._iterator_initializer = iterator.initializer
+      self._predictions = estimator_spec.predictions
+      self._saver = tf.train.Saver()
+
+    self._session = tf.Session(
+        graph=graph,
+        config=compute_util.configure_session(None, self.hparams))
+
+  def start_bundle(self):
+    if self._session is None:
+      self._build()
+
+  def process(self, checkpoint_path):
+    global_step = _get_step_from_checkpoint_path(checkpoint_path)
+    self._saver.restore(self._session, checkpoint_path)
+    self._session.run(self._iterator_initializer)
+    while True:
+      try:
+        batch_predictions = self._session.run(self._predictions)
+      except tf.errors.OutOfRangeError:
+        break
+      batch_size = len(batch_predictions["mean_loss"])
+      for i in range(batch_size):
+        predictions = {
+            name: value[i] for name, value in batch_predictions.items()
+        }
+        yield _unpad_predictions(predictions, global_step)
 
 
 class SaveLossesDoFn(beam.DoFn):
@@ -118,8 +205,16 @@ class SaveLossesDoFn(beam.DoFn):
 class SavePredictionsDoFn(beam.DoFn):
   """Writes predictions for a particular example to a TFRecord file."""
 
-  def __init__(self, output_dir):
+  def __init__(self, output_dir, compression_type=""):
+    """Initializes the DoFn.
+
+    Args:
+      output_dir: Directory in which to save the output.
+      compression_type: Compression type of the output TFRecord files; one of
+        "", "GZIP" or "ZLIB".
+    """
     self.output_dir = output_dir
+    self.compression_type = compression_type
 
   def start_bundle(self):
     if not tf.gfile.Exists(self.output_dir):
@@ -133,7 +228,8 @@ class SavePredictionsDoFn(beam.DoFn):
       return
 
     filename = os.path.join(self.output_dir, "{}.tfrecord".format(example_id))
-    with tf.python_io.TFRecordWriter(filename) as writer:
+    with tf.python_io.TFRecordWriter(
+        filename, options=self.compression_type) as writer:
       for predictions in all_predictions:
         ex = tf.train.Example()
         for name, value in predictions.items():
@@ -0,0 +1,137 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for prediction_fns.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+import tensorflow as tf
+
+from astrowavenet import astrowavenet_model
+from astrowavenet import configurations
+from astrowavenet.data import kepler_light_curves
+from astrowavenet.util import estimator_util
+from beam.astrowavenet import prediction_fns
+from tf_util import configdict
+from tf_util import example_util
+
+# Lengths of the test light curves.
+_LENGTHS = [30, 51, 17]
+
+
+def _build_hparams():
+  """Returns the hyperparameters of a tiny AstroWaveNet model."""
+  hparams = configdict.ConfigDict(configurations.base()["hparams"])
+  hparams.batch_size = 2
+  hparams.skip_output_dim = 4
+  hparams.preprocess_kernel_width = 5
+  hparams.num_residual_blocks = 2
+  hparams.dilation_rates = [1, 2, 4]
+  return hparams
+
+
+def _write_examples(filename):
+  """Writes a random light curve Example of each length in _LENGTHS."""
+  rng = np.random.RandomState(0)
+  with tf.python_io.TFRecordWriter(filename) as writer:
+    for i, length in enumerate(_LENGTHS):
+      ex = tf.train.Example()
+      example_util.set_int64_feature(ex, "kepler_id", [1000 + i])
+      example_util.set_float_array_feature(ex, "time",
+                                           1 + 0.02 * np.arange(length))
+      example_util.set_float_array_feature(ex, "flux", rng.normal(size=length))
+      example_util.set_int64_array_feature(
+          ex, "mask", (rng.uniform(size=length) > 0.2).astype(np.int64))
+      writer.write(ex.SerializeToString())
+
+
+class PredictionFnsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(PredictionFnsTest, self).setUp()
+    self._hparams = _build_hparams()
+    self._input_file = os.path.join(self.get_temp_dir(), "input.tfrecord")
+    _write_examples(self._input_file)
+
+  def _save_checkpoint(self, global_step, seed):
+    """Saves a checkpoint of a randomly initialized model."""
+    with tf.Graph().as_default():
+      tf.set_random_seed(seed)
+      dataset = kepler_light_curves.KeplerLightCurves(
+          self._input_file, mode=tf.estimator.ModeKeys.PREDICT).build(
+              self._hparams.batch_size)
+      model_fn = estimator_util.create_model_fn(astrowavenet_model.AstroWaveNet,
+                                                self._hparams)
+      model_fn(dataset.make_one_shot_iterator().get_next(),
+               tf.estimator.ModeKeys.PREDICT, {})
+      saver = tf.train.Saver()
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        return saver.save(
+            sess,
+            os.path.join(self.get_temp_dir(), "model.ckpt"),
+            global_step=global_step)
+
+  def assertPredictionsEqual(self, expected, actual):
+    """Asserts that two lists of predictions are equal, in any order."""
+
+    def _key(predictions):
+      return predictions["global_step"], predictions["example_id"]
+
+    self.assertEqual(len(expected), len(actual))
+    for expected_predictions, predictions in zip(
+        sorted(expected, key=_key), sorted(actual, key=_key)):
+      self.assertCountEqual(expected_predictions.keys(), predictions.keys())
+      for name, value in expected_predictions.items():
+        self.assertAllClose(value, predictions[name], msg=name)
+
+  def testSweepCheckpointsMatchesMakePredictions(self):
+    checkpoint_paths = [
+        self._save_checkpoint(global_step=i + 1, seed=i) for i in range(2)
+    ]
+
+    expected = []
+    make_predictions = prediction_fns.MakePredictionsDoFn(self._hparams, {})
+    for checkpoint_path in checkpoint_paths:
+      expected.extend(
+          make_predictions.process((checkpoint_path, self._input_file)))
+    self.assertEqual(2 * len(_LENGTHS), len(expected))
+    # The checkpoints make different predictions.
+    self.assertNotAllClose(expected[0]["mean_loss"],
+                           expected[len(_LENGTHS)]["mean_loss"])
+
+    sweep_checkpoints = prediction_fns.SweepCheckpointsDoFn(
+        self._hparams, {}, self._input_file)
+    sweep_checkpoints.start_bundle()
+    actual = []
+    for checkpoint_path in checkpoint_paths:
+      actual.extend(sweep_checkpoints.process(checkpoint_path))
+
+    self.assertPredictionsEqual(expected, actual)
+    # Sequences are un-padded, which also removes trailing values with zero
+    # weight.
+    for predictions in actual:
+      length = len(predictions["seq_weights"])
+      self.assertLessEqual(length, _LENGTHS[predictions["example_id"] - 1000])
+      self.assertNotEqual(0, predictions["seq_weights"][-1])
+      self.assertEqual((length,), predictions["seq_losses"].shape)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -46,7 +46,9 @@ class ProcessLightCurveDoFn(beam.DoFn):
                upward_outlier_clipping=None,
                downward_outlier_clipping=None,
                clip_lowest_n_values=None,
-               normalize_stddev=False):
+               normalize_stddev=False,
+               window_length=None,
+               window_overlap=0):
     """Initializes the DoFn.
 
     Args:
@@ -65,7 +67,22 @@ class ProcessLightCurveDoFn(beam.DoFn):
       clip_lowest_n_values: If specified, clip lowest flux values to the value
         of the nth lowest value.
       normalize_stddev: Whether to divide the flux by the standard deviation.
+      window_length: If specified, each light curve is output as overlapping
+        windows of this many cadences, each in a separate tf.Example, instead of
+        a single tf.Example. See util.uniform_cadence_windows().
+      window_overlap: Number of cadences shared by consecutive windows. This
+        should be at least the receptive field of the model, so that every
+        prediction outside the warmup of a window has its full context. The
+        number of warmup values of each window is stored in the feature
+        "warmup_length".
+
+    Raises:
+      ValueError: If window_overlap is not less than window_length.
     """
+    if window_length and not 0 <= window_overlap < window_length:
+      raise ValueError(
+          "window_overlap (got: {}) must be in [0, window_length) (got "
+          "window_length: {})".format(window_overlap, window_length))
     self.kepler_data_dir = kepler_data_dir
     self.flux_column = flux_column
     self.injected_group = injected_group
@@ -76,6 +93,8 @@ class ProcessLightCurveDoFn(beam.DoFn):
     self.downward_outlier_clipping = downward_outlier_clipping
     self.clip_lowest_n_values = clip_lowest_n_values
     self.normalize_stddev = normalize_stddev
+    self.window_length = window_length
+    self.window_overlap = window_overlap
 
   def _scramble_light_curve(self, all_cadence_no, all_time, all_flux,
                             all_quarters, scramble_type):
@@ -92,8 +111,19 @@ class ProcessLightCurveDoFn(beam.DoFn):
 
     return scr_cadence_no, scr_time, scr_flux
 
-  def _read_kepler_light_curve(self, filenames):
-    """Reads cadence numbers, time, and flux for a Kepler target star."""
+  def _read_kepler_segments(self, filenames):
+    """Reads cadence numbers, time, and flux of each quarter of a target star.
+
+    Args:
+      filenames: List of light curve files, one per quarter, in ascending order
+        of time.
+
+    Returns:
+      all_cadence_no: List of numpy arrays; the cadence numbers of each quarter.
+      all_time: List of numpy arrays; the time values of each quarter.
+      all_flux: List of numpy arrays; the flux values of each quarter.
+      Timestamps with NaN time or flux values are removed.
+    """
     # Read light curve data.
     all_cadence_no = []
     all_time = []
@@ -141,17 +171,61 @@ class ProcessLightCurveDoFn(beam.DoFn):
       all_cadence_no, all_time, all_flux = self._scramble_light_curve(
           all_cadence_no, all_time, all_flux, all_quarters, self.scramble_type)
 
-    cadence_no = np.concatenate(all_cadence_no)
-    time = np.concatenate(all_time)
+    # Remove timestamps with NaN time or flux values.
+    for i, (time, flux) in enumerate(zip(all_time, all_flux)):
+      flux_and_time_finite = np.logical_and(
+          np.isfinite(flux), np.isfinite(time))
+      all_cadence_no[i] = all_cadence_no[i][flux_and_time_finite]
+      all_time[i] = time[flux_and_time_finite]
+      all_flux[i] = flux[flux_and_time_finite]
+
+    return all_cadence_no, all_time, all_flux
+
+  def _normalize_flux(self, all_flux):
+    """Applies the additional normalization to the flux of each quarter.
+
+    The statistics are computed over all quarters, so the result is the same as
+    normalizing the concatenated flux.
+    """
     flux = np.concatenate(all_flux)
+    stddev = 1.4826 * np.median(np.abs(flux))  # 1.4826 * MAD (median is zero).
 
-    # Remove timestamps with NaN time or flux values.
-    flux_and_time_finite = np.logical_and(np.isfinite(flux), np.isfinite(time))
-    cadence_no = cadence_no[flux_and_time_finite]
-    time = time[flux_and_time_finite]
-    flux = flux[flux_and_time_finite]
+    def _clip_outliers(flux):
+      if self.upward_outlier_clipping:
+        # Clip values greater than n stddev from the median (which is zero).
+        flux = np.minimum(flux, self.upward_outlier_clipping * stddev)
+      if self.downward_outlier_clipping:
+        # pylint: disable=invalid-unary-operand-type
+        flux = np.maximum(flux, -self.downward_outlier_clipping * stddev)
+      return flux
 
-    return cadence_no, time, flux
+    nth_flux = None
+    if self.clip_lowest_n_values:
+      nth_flux = _nth_smallest(
+          _clip_outliers(flux), self.clip_lowest_n_values)
+
+    normalized = []
+    for flux in all_flux:
+      flux = _clip_outliers(flux)
+      if nth_flux is not None:
+        flux = np.maximum(flux, nth_flux)
+      if self.normalize_stddev:
+        flux = flux / stddev
+      normalized.append(flux)
+    return normalized
+
+  def _make_example(self, kep_id, cadence_no, time, flux, mask):
+    """Creates a tf.Example from a light curve with uniform cadence numbers."""
+    ex = tf.train.Example()
+    example_util.set_int64_feature(ex, "kepler_id", [kep_id])
+    example_util.set_bytes_feature(ex, "flux_column", [self.flux_column])
+    example_util.set_bytes_feature(ex, "injected_group", [self.injected_group])
+    example_util.set_bytes_feature(ex, "scramble_type", [self.scramble_type])
+    example_util.set_float_array_feature(ex, "time", time)
+    example_util.set_float_array_feature(ex, "flux", flux)
+    example_util.set_int64_array_feature(ex, "cadence_no", cadence_no)
+    example_util.set_int64_array_feature(ex, "mask", mask)
+    return ex
 
   def process(self, inputs):
     """Reads the light curve of a particular Kepler ID."""
@@ -168,35 +242,32 @@ class ProcessLightCurveDoFn(beam.DoFn):
                       "no-fits-{}".format(kep_id)).inc()
       return
 
-    cadence_no, time, flux = self._read_kepler_light_curve(filenames)
-
-    # Additional normalization.
-    stddev = 1.4826 * np.median(np.abs(flux))  # 1.4826 * MAD (median is zero).
-    if self.upward_outlier_clipping:
-      # Clip values greater than n stddev from the median (which is zero).
-      flux = np.minimum(flux, self.upward_outlier_clipping * stddev)
-    if self.downward_outlier_clipping:
-      # pylint: disable=invalid-unary-operand-type
-      flux = np.maximum(flux, -self.downward_outlier_clipping * stddev)
-    if self.clip_lowest_n_values:
-      nth_flux = _nth_smallest(flux, self.clip_lowest_n_values)
-      flux = np.maximum(flux, nth_flux)
-    if self.normalize_stddev:
-      flux /= stddev
+    all_cadence_no, all_time, all_flux = self._read_kepler_segments(filenames)
+    all_flux = self._normalize_flux(all_flux)
+
+    if self.window_length:
+      # Each window is built from the quarters that overlap it, and is output
+      # before the next window is built.
+      num_windows = 0
+      for cadence_no, time, flux, mask, warmup_length in (
+          util.uniform_cadence_windows(all_cadence_no, all_time, all_flux,
+                                       self.window_length,
+                                       self.window_overlap)):
+        ex = self._make_example(kep_id, cadence_no, time, flux, mask)
+        example_util.set_int64_feature(ex, "warmup_length", [warmup_length])
+        outputs = dict(inputs)
+        outputs["example"] = ex
+        num_windows += 1
+        yield outputs
+
+      Metrics.counter(self.__class__.__name__, "outputs").inc()
+      Metrics.counter(self.__class__.__name__, "windows").inc(num_windows)
+      return
 
     cadence_no, time, flux, mask = util.uniform_cadence_light_curve(
-        cadence_no, time, flux)
-
-    ex = tf.train.Example()
-    example_util.set_int64_feature(ex, "kepler_id", [kep_id])
-    example_util.set_bytes_feature(ex, "flux_column", [self.flux_column])
-    example_util.set_bytes_feature(ex, "injected_group", [self.injected_group])
-    example_util.set_bytes_feature(ex, "scramble_type", [self.scramble_type])
-    example_util.set_float_feature(ex, "time", time)
-    example_util.set_float_feature(ex, "flux", flux)
-    example_util.set_int64_feature(ex, "cadence_no", cadence_no)
-    example_util.set_int64_feature(ex, "mask", mask)
-    inputs["example"] = ex
+        np.concatenate(all_cadence_no), np.concatenate(all_time),
+        np.concatenate(all_flux))
+    inputs["example"] = self._make_example(kep_id, cadence_no, time, flux, mask)
 
     Metrics.counter(self.__class__.__name__, "outputs").inc()
     yield inputs
@@ -26,6 +26,7 @@ from absl import logging
 import apache_beam as beam
 import tensorflow as tf
 
+from beam import utils
 from tf_util import example_util
 
 flags.DEFINE_string("input_file_pattern", None,
@@ -40,6 +41,12 @@ flags.DEFINE_integer("num_shards", None, "Number of output shards.")
 flags.DEFINE_string("kepid_whitelist", None,
                     "Comma-separated list of allowed labels.")
 
+flags.DEFINE_enum("input_compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the input TFRecord files.")
+
+flags.DEFINE_enum("compression_type", "", utils.COMPRESSION_TYPES,
+                  "Compression type of the output TFRecord files.")
+
 FLAGS = flags.FLAGS
 
 
@@ -85,13 +92,17 @@ def main(argv):
     (root
      | "read_tfrecord" >> beam.io.tfrecordio.ReadFromTFRecord(
          FLAGS.input_file_pattern,
-         coder=beam.coders.ProtoCoder(tf.train.Example))
+         coder=beam.coders.ProtoCoder(tf.train.Example),
+         compression_type=utils.get_beam_compression_type(
+             FLAGS.input_compression_type))
      | "process_examples" >> beam.ParDo(process_example)
      | "reshuffle" >> beam.Reshuffle()
      | "write_tfrecord" >> beam.io.tfrecordio.WriteToTFRecord(
          os.path.join(FLAGS.output_dir, FLAGS.output_name),
          coder=beam.coders.ProtoCoder(tf.train.Example),
-         num_shards=FLAGS.num_shards))
+         num_shards=FLAGS.num_shards,
+         compression_type=utils.get_beam_compression_type(
+             FLAGS.compression_type)))
     # pylint: enable=expression-not-assigned
 
   pipeline.run()
@@ -21,9 +21,40 @@ from __future__ import print_function
 import os.path
 
 import apache_beam as beam
+from apache_beam.io.filesystem import CompressionTypes
 from apache_beam.metrics import Metrics
 import numpy as np
 
+# TFRecord compression types, named as in TensorFlow (e.g. the compression_type
+# argument of tf.data.TFRecordDataset).
+COMPRESSION_TYPES = ("", "GZIP", "ZLIB")
+
+# Beam's DEFLATE type writes zlib-wrapped streams, which is the same format as
+# TensorFlow's ZLIB type.
+_BEAM_COMPRESSION_TYPES = {
+    "": CompressionTypes.UNCOMPRESSED,
+    "GZIP": CompressionTypes.GZIP,
+    "ZLIB": CompressionTypes.DEFLATE,
+}
+
+
+def get_beam_compression_type(compression_type):
+  """Converts a TensorFlow TFRecord compression type to a Beam CompressionType.
+
+  Args:
+    compression_type: One of COMPRESSION_TYPES.
+
+  Returns:
+    A apache_beam.io.filesystem.CompressionTypes value.
+
+  Raises:
+    ValueError: If compression_type is not recognized.
+  """
+  if compression_type not in _BEAM_COMPRESSION_TYPES:
+    raise ValueError("Unrecognized compression_type: {}. Expected one of {}".
+                     format(compression_type, COMPRESSION_TYPES))
+  return _BEAM_COMPRESSION_TYPES[compression_type]
+
 
 def write_to_tfrecord(pcollection,
                       output_dir,
@@ -31,7 +62,8 @@ def write_to_tfrecord(pcollection,
                       value_name,
                       value_coder=beam.coders.BytesCoder(),
                       num_shards=0,
-                      stage_name_suffix=""):
+                      stage_name_suffix="",
+                      compression_type=""):
   """Extracts items and writes them to sharded TFRecord files.
 
   This is a simple wrapper around beam.io.tfrecordio.WriteToTFRecord that first
@@ -47,6 +79,7 @@ def write_to_tfrecord(pcollection,
     value_coder: Coder used to encode each value.
     num_shards: The number of files (shards) used for output.
     stage_name_suffix: Optional suffix for the stage names.
+    compression_type: One of COMPRESSION_TYPES.
 
   Returns:
     A WriteToTFRecord transform object.
@@ -61,7 +94,8 @@ def write_to_tfrecord(pcollection,
           | write_stage_name >> beam.io.tfrecordio.WriteToTFRecord(
               os.path.join(output_dir, output_name),
               coder=value_coder,
-              num_shards=num_shards))
+              num_shards=num_shards,
+              compression_type=get_beam_compression_type(compression_type)))
 
 
 class TrainValTestPartitionFn(beam.PartitionFn):
@@ -1,16 +1,18 @@
 import os
 import sys
-import subprocess
 import numpy as np
 from lightkurve import search_lightcurve
 from astropy.io import fits
 
+from astronet import prediction_client
+
 # ----------------------------
 # CONFIGURACIÓN GENERAL
 # ----------------------------
 MODEL_DIR = "/workspace/exoplanet-ml/MODEL_DIR"
 KEPLER_DATA_DIR = "/workspace/exoplanet-ml/KEPLER_DATA_DIR"
 OUTPUT_DIR = "/workspace/exoplanet-ml/kepler_pictures"
+PREDICTION_SERVER = os.environ.get("PREDICTION_SERVER", "http://localhost:8500")
 
 # ----------------------------
 # OBTENER Y CREAR ARCHIVO FITS
@@ -86,21 +88,21 @@ def run_astronet(k2_id: str, period: float, t0: float, duration: float):
     output_file = os.path.join(OUTPUT_DIR, f"{k2_id}.png")
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    cmd = [
-        "python", "-m", "astronet.predict",
-        "--model=AstroCNNModel",
-        "--config_name=local_global",
-        f"--model_dir={MODEL_DIR}",
-        f"--kepler_data_dir={KEPLER_DATA_DIR}",
-        f"--kepler_id={k2_id}",
-        f"--period={period}",
-        f"--t0={t0}",
-        f"--duration={duration}",
-        f"--output_image_file={output_file}"
-    ]
+    # El modelo se carga una sola vez en el servidor de predicciones, que se
+    # inicia automáticamente si no está en ejecución.
+    client = prediction_client.PredictionClient(PREDICTION_SERVER)
+    client.start_server_if_needed(
+        model="AstroCNNModel",
+        config_name="local_global",
+        model_dir=MODEL_DIR,
+        kepler_data_dir=KEPLER_DATA_DIR,
+        output_image_dir=OUTPUT_DIR)
 
     print(f"🚀 Ejecutando modelo Astronet...")
-    subprocess.run(cmd, check=True)
+    prediction = client.predict_kepler_id(
+        k2_id, period, t0, duration,
+        output_image_file=os.path.basename(output_file))
+    print(f"   Predicción = {prediction[0]}")
     print(f"✅ Predicción completada. Imagen guardada en {output_file}")
 
 
@@ -3,6 +3,8 @@ import sys
 import subprocess
 import requests
 
+from astronet import prediction_client
+
 # ----------------------------
 # CONFIGURACIÓN GENERAL
 # ----------------------------
@@ -12,6 +14,7 @@ MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "MODEL_DIR"))
 KEPLER_DATA_DIR = os.environ.get("KEPLER_DATA_DIR", os.path.join(BASE_DIR, "KEPLER_DATA_DIR"))
 OUTPUT_DIR = os.environ.get("OUTPUT_DIR", os.path.join(BASE_DIR, "kepler_pictures"))
 API_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+PREDICTION_SERVER = os.environ.get("PREDICTION_SERVER", "http://localhost:8500")
 
 # ----------------------------
 # FUNCIÓN PARA OBTENER DATOS DEL ARCHIVO NASA
@@ -81,21 +84,21 @@ def run_astronet(kepler_id: str, period: float, t0: float, duration: float):
     output_file = os.path.join(OUTPUT_DIR, f"{kepler_id}.png")
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    cmd = [
-        "python", "-m", "astronet.predict",
-        "--model=AstroCNNModel",
-        "--config_name=local_global",
-        f"--model_dir={MODEL_DIR}",
-        f"--kepler_data_dir={KEPLER_DATA_DIR}",
-        f"--kepler_id={kepler_id}",
-        f"--period={period}",
-        f"--t0={t0}",
-        f"--duration={duration}",
-        f"--output_image_file={output_file}"
-    ]
+    # El modelo se carga una sola vez en el servidor de predicciones, que se
+    # inicia automáticamente si no está en ejecución.
+    client = prediction_client.PredictionClient(PREDICTION_SERVER)
+    client.start_server_if_needed(
+        model="AstroCNNModel",
+        config_name="local_global",
+        model_dir=MODEL_DIR,
+        kepler_data_dir=KEPLER_DATA_DIR,
+        output_image_dir=OUTPUT_DIR)
 
     print("🚀 Ejecutando modelo Astronet...")
-    subprocess.run(cmd, check=True)
+    prediction = client.predict_kepler_id(
+        kepler_id, period, t0, duration,
+        output_image_file=os.path.basename(output_file))
+    print(f"   Predicción = {prediction[0]}")
     print(f"✅ Predicción completada. Imagen guardada en {output_file}")
     return output_file
 
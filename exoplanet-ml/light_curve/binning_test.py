@@ -22,6 +22,7 @@ from absl.testing import absltest
 import numpy as np
 
 from light_curve.binning import bin_and_aggregate
+from light_curve.binning import PhaseFoldedSums
 
 
 class BinningTest(absltest.TestCase):
@@ -240,5 +241,79 @@ class BinningTest(absltest.TestCase):
     np.testing.assert_array_equal([1, 2, 3, 4, 5], bin_counts)
 
 
+class PhaseFoldedSumsTest(absltest.TestCase):
+
+  def testErrors(self):
+    # time and values not the same size.
+    with self.assertRaises(ValueError):
+      PhaseFoldedSums(np.array([1, 2]), np.array([1, 2, 3]))
+
+    # time size less than 2.
+    with self.assertRaises(ValueError):
+      PhaseFoldedSums(np.array([1]), np.array([1]))
+
+    sums = PhaseFoldedSums(np.arange(10), np.ones(10))
+
+    # Bins outside [-period / 2, period / 2].
+    with self.assertRaises(ValueError):
+      sums.bin_and_sum(
+          period=4, t0=0, num_bins=2, bin_width=1, x_min=-3, x_max=2)
+
+    # num_bins less than 2.
+    with self.assertRaises(ValueError):
+      sums.bin_and_sum(
+          period=4, t0=0, num_bins=1, bin_width=1, x_min=-2, x_max=2)
+
+    # bin_width greater than or equal to x_max - x_min.
+    with self.assertRaises(ValueError):
+      sums.bin_and_sum(
+          period=4, t0=0, num_bins=2, bin_width=4, x_min=-2, x_max=2)
+
+  def testSmall(self):
+    # Unsorted time. Folded with period 4 and t0 1, the times 0, 1, ..., 9 map
+    # to [-1, 0, 1, -2, -1, 0, 1, -2, -1, 0].
+    time = np.array([9, 3, 0, 1, 2, 4, 5, 6, 7, 8])
+    values = np.array([9, 3, 0, 1, 2, 4, 5, 6, 7, 8])
+    sums = PhaseFoldedSums(time, values)
+    result, bin_counts = sums.bin_and_sum(
+        period=4, t0=1, num_bins=4, bin_width=1, x_min=-2, x_max=2)
+    np.testing.assert_array_equal([3 + 7, 0 + 4 + 8, 1 + 5 + 9, 2 + 6], result)
+    np.testing.assert_array_equal([2, 3, 3, 2], bin_counts)
+
+  def testMatchesBinAndAggregate(self):
+    rs = np.random.RandomState(123)
+    time = rs.uniform(0, 100, size=1000)
+    values = rs.normal(size=[1000, 3])
+    sums = PhaseFoldedSums(time, values)
+
+    # Short periods use the folded light curve, and long periods use one range
+    # of time per period.
+    for period in [0.3, 7.1, 60.0]:
+      t0 = rs.uniform(0, period)
+      folded_time = np.mod(time + (period / 2 - t0), period) - period / 2
+      order = np.argsort(folded_time)
+      for num_bins, bin_width, x_min, x_max in [
+          (11, period / 11, -period / 2, period / 2),
+          (7, 0.1, max(-period / 2, -0.3), min(period / 2, 0.3)),
+      ]:
+        expected, expected_counts = bin_and_aggregate(
+            folded_time[order],
+            values[order],
+            num_bins=num_bins,
+            bin_width=bin_width,
+            x_min=x_min,
+            x_max=x_max,
+            aggr_fn=np.sum)
+        result, bin_counts = sums.bin_and_sum(
+            period=period,
+            t0=t0,
+            num_bins=num_bins,
+            bin_width=bin_width,
+            x_min=x_min,
+            x_max=x_max)
+        np.testing.assert_array_almost_equal(expected, result)
+        np.testing.assert_array_equal(expected_counts, bin_counts)
+
+
 if __name__ == "__main__":
   absltest.main()
@@ -265,6 +265,108 @@ def uniform_cadence_light_curve(cadence_no, time, flux):
   return out_cadence_no, out_time, out_flux, out_mask
 
 
+def uniform_cadence_windows(all_cadence_no,
+                            all_time,
+                            all_flux,
+                            window_length,
+                            overlap=0):
+  """Splits a light curve into overlapping windows with uniform cadence numbers.
+
+  This is equivalent to calling uniform_cadence_light_curve() on the whole light
+  curve and splitting the outputs into windows, but each window is built only
+  from the segments that overlap it, so the uniform cadence light curve of the
+  whole light curve is never materialized.
+
+  The window starting at cadence number c covers [c, c + window_length), and
+  the next window starts at c + window_length - overlap. The first overlap
+  values of each window after the first are the last values of the previous
+  window; they are the warmup values of the window. Every value is outside the
+  warmup of exactly one window. The last window ends at the maximum cadence
+  number, so it may be shorter than window_length. Windows with no valid values
+  outside their warmup are skipped.
+
+  Args:
+    all_cadence_no: A list of numpy arrays; the cadence numbers of each segment
+      of the light curve, e.g. each quarter. Each array must be sorted in
+      ascending order, and each segment must start after the previous one ends.
+    all_time: A list of numpy arrays; the time values of each segment.
+    all_flux: A list of numpy arrays; the flux values of each segment.
+    window_length: The number of cadences of each window.
+    overlap: The number of cadences shared by consecutive windows. Must be less
+      than window_length.
+
+  Yields:
+    cadence_no: numpy array; the cadence numbers of the window with no gaps.
+    time: numpy array; the time values of the window. Missing data points have
+      value zero and correspond to a False value in the mask.
+    flux: numpy array; the flux values of the window. Missing data points have
+      value zero and correspond to a False value in the mask.
+    mask: Boolean numpy array; False indicates missing data points, as in
+      uniform_cadence_light_curve().
+    warmup_length: The number of warmup values at the start of the window: 0
+      for the first window and overlap for all others.
+
+  Raises:
+    ValueError: If window_length or overlap are invalid, or if there are
+        duplicate cadence numbers in the input.
+  """
+  if window_length < 1:
+    raise ValueError(
+        "window_length must be positive. Got: {}".format(window_length))
+  if overlap < 0 or overlap >= window_length:
+    raise ValueError(
+        "overlap (got: {}) must be in [0, window_length) (got window_length: "
+        "{})".format(overlap, window_length))
+
+  segments = [(cadence_no, time, flux)
+              for cadence_no, time, flux in zip(all_cadence_no, all_time,
+                                                all_flux)
+              if len(cadence_no)]
+  if not segments:
+    return
+
+  min_cadence_no = segments[0][0][0]
+  max_cadence_no = segments[-1][0][-1]
+  stride = window_length - overlap
+  start = min_cadence_no
+  warmup_length = 0
+  first_segment = 0
+  while True:
+    end = min(start + window_length, max_cadence_no + 1)
+
+    # Skip the segments that end before this window.
+    while segments[first_segment][0][-1] < start:
+      first_segment += 1
+
+    out_cadence_no = np.arange(start, end, dtype=segments[0][0].dtype)
+    out_time = np.zeros_like(out_cadence_no, dtype=segments[0][1].dtype)
+    out_flux = np.zeros_like(out_cadence_no, dtype=segments[0][2].dtype)
+    out_mask = np.zeros_like(out_cadence_no, dtype=bool)
+    for cadence_no, time, flux in segments[first_segment:]:
+      if cadence_no[0] >= end:
+        break
+      i_start, i_end = np.searchsorted(cadence_no, [start, end])
+      cadence_no = cadence_no[i_start:i_end]
+      time = time[i_start:i_end]
+      flux = flux[i_start:i_end]
+      valid = np.isfinite(cadence_no) & np.isfinite(time) & np.isfinite(flux)
+      i = (cadence_no[valid] - start).astype(np.int64)
+      if np.any(out_mask[i]) or len(np.unique(i)) < len(i):
+        raise ValueError("Duplicate cadence number in [{}, {})".format(
+            start, end))
+      out_time[i] = time[valid]
+      out_flux[i] = flux[valid]
+      out_mask[i] = True
+
+    if np.any(out_mask[warmup_length:]):
+      yield out_cadence_no, out_time, out_flux, out_mask, warmup_length
+
+    if end > max_cadence_no:
+      return
+    start += stride
+    warmup_length = overlap
+
+
 def count_transit_points(time, event):
   """Computes the number of points in each transit of a given event.
 
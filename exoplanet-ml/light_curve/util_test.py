@@ -300,6 +300,78 @@ class LightCurveUtilTest(absltest.TestCase):
     with self.assertRaisesRegexp(ValueError, "Duplicate cadence number"):
       util.uniform_cadence_light_curve(input_cadence_no, input_time, input_flux)
 
+  def testUniformCadenceWindows(self):
+    # Two segments with a gap between them, and a NaN flux value.
+    all_cadence_no = [np.array([4, 5, 6, 8, 9]), np.array([11, 12, 13])]
+    all_time = [np.array([40, 50, 60, 80, 90]), np.array([110, 120, 130])]
+    all_flux = [
+        np.array([400, 500, 600, 800, np.nan]),
+        np.array([1100, 1200, 1300])
+    ]
+    windows = list(
+        util.uniform_cadence_windows(
+            all_cadence_no, all_time, all_flux, window_length=4, overlap=1))
+    self.assertLen(windows, 3)
+
+    cadence_no, time, flux, mask, warmup_length = windows[0]
+    np.testing.assert_array_equal([4, 5, 6, 7], cadence_no)
+    np.testing.assert_array_equal([40, 50, 60, 0], time)
+    np.testing.assert_array_equal([400, 500, 600, 0], flux)
+    np.testing.assert_array_equal([1, 1, 1, 0], mask)
+    self.assertEqual(0, warmup_length)
+
+    cadence_no, time, flux, mask, warmup_length = windows[1]
+    np.testing.assert_array_equal([7, 8, 9, 10], cadence_no)
+    np.testing.assert_array_equal([0, 80, 0, 0], time)
+    np.testing.assert_array_equal([0, 800, 0, 0], flux)
+    np.testing.assert_array_equal([0, 1, 0, 0], mask)
+    self.assertEqual(1, warmup_length)
+
+    # The last window is shorter.
+    cadence_no, time, flux, mask, warmup_length = windows[2]
+    np.testing.assert_array_equal([10, 11, 12, 13], cadence_no)
+    np.testing.assert_array_equal([0, 110, 120, 130], time)
+    np.testing.assert_array_equal([0, 1100, 1200, 1300], flux)
+    np.testing.assert_array_equal([0, 1, 1, 1], mask)
+    self.assertEqual(1, warmup_length)
+
+    # Outside the warmup values, the windows are the uniform cadence light
+    # curve.
+    expected = util.uniform_cadence_light_curve(
+        np.concatenate(all_cadence_no), np.concatenate(all_time),
+        np.concatenate(all_flux))
+    for window_length, overlap in [(3, 0), (4, 2), (20, 5)]:
+      windows = list(
+          util.uniform_cadence_windows(all_cadence_no, all_time, all_flux,
+                                       window_length, overlap))
+      for i in range(4):
+        np.testing.assert_array_equal(
+            expected[i],
+            np.concatenate([w[i][w[4]:] for w in windows]))
+
+    # Windows with no valid values outside the warmup are skipped.
+    windows = list(
+        util.uniform_cadence_windows(
+            all_cadence_no, all_time, all_flux, window_length=3, overlap=2))
+    np.testing.assert_array_equal([4, 6, 9, 10, 11],
+                                  [w[0][0] for w in windows])
+
+    # Invalid window arguments.
+    with self.assertRaises(ValueError):
+      list(util.uniform_cadence_windows(all_cadence_no, all_time, all_flux, 0))
+    with self.assertRaises(ValueError):
+      list(
+          util.uniform_cadence_windows(all_cadence_no, all_time, all_flux, 4,
+                                       4))
+
+    # Duplicate cadence number.
+    all_cadence_no = [np.array([4, 5, 6]), np.array([6, 7])]
+    all_time = [np.array([40, 50, 60]), np.array([60, 70])]
+    all_flux = [np.array([400, 500, 600]), np.array([600, 700])]
+    with self.assertRaisesRegexp(ValueError, "Duplicate cadence number"):
+      list(
+          util.uniform_cadence_windows(all_cadence_no, all_time, all_flux, 10))
+
   def testCountTransitPoints(self):
     time = np.concatenate([
         np.arange(0, 10, 0.1, dtype=np.float),
@@ -0,0 +1,158 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for XLA compilation and mixed-precision computation.
+
+The following optional hyperparameters are recognized:
+  compute_dtype: One of "float32" (default), "float16" or "bfloat16". With
+    "float16" or "bfloat16", the layers that use layer_dtype() compute in that
+    dtype while their variables are kept in float32; their inputs must be cast
+    with cast_to_compute_dtype(). Training with "float16" also applies loss
+    scaling (see hparams.loss_scale).
+  loss_scale: Loss scale for training with compute_dtype "float16". Either
+    "dynamic" (default) or a fixed number.
+  xla_jit_scope: Whether to compile the ops created in jit_scope() with XLA.
+  xla_auto_clustering: Whether to let XLA compile any clusters of supported ops
+    in the graph. See configure_session().
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+
+import tensorflow as tf
+
+# Mixed-precision Keras policy of each low-precision compute dtype.
+_MIXED_PRECISION_POLICIES = {
+    "float16": "mixed_float16",
+    "bfloat16": "mixed_bfloat16",
+}
+
+
+def compute_dtype(hparams):
+  """Returns the name of the compute dtype.
+
+  Args:
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    One of "float32", "float16" or "bfloat16".
+
+  Raises:
+    ValueError: If hparams.compute_dtype is unrecognized.
+  """
+  dtype = hparams.get("compute_dtype") or "float32"
+  if dtype != "float32" and dtype not in _MIXED_PRECISION_POLICIES:
+    raise ValueError("Unrecognized compute_dtype: {}".format(dtype))
+  return dtype
+
+
+def layer_dtype(hparams):
+  """Returns the dtype argument for Keras layers that may use low precision.
+
+  Args:
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    None if the compute dtype is float32, so that layers keep their default
+    dtype. Otherwise a mixed-precision tf.keras Policy; layers with that policy
+    compute in the compute dtype and keep their variables in float32. In graph
+    mode, layers do not cast their inputs, so the inputs of a stack of such
+    layers should be cast with cast_to_compute_dtype(), and its outputs should
+    be cast back to float32 before the losses are computed.
+  """
+  dtype = compute_dtype(hparams)
+  if dtype == "float32":
+    return None
+  return tf.keras.mixed_precision.experimental.Policy(
+      _MIXED_PRECISION_POLICIES[dtype])
+
+
+def cast_to_compute_dtype(x, hparams):
+  """Casts a Tensor to the compute dtype.
+
+  Args:
+    x: Floating point Tensor.
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    x cast to the compute dtype, or x itself if it already has that dtype.
+  """
+  return tf.cast(x, compute_dtype(hparams))
+
+
+@contextlib.contextmanager
+def _null_scope():
+  yield
+
+
+def jit_scope(hparams):
+  """Returns a context manager in which ops are compiled with XLA, if enabled.
+
+  Args:
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    tf.xla.experimental.jit_scope() if hparams.xla_jit_scope is True, otherwise
+    a context manager that does nothing. The gradients of ops created in the
+    scope are also compiled.
+  """
+  if hparams.get("xla_jit_scope"):
+    return tf.xla.experimental.jit_scope()
+  return _null_scope()
+
+
+def maybe_apply_loss_scaling(optimizer, hparams):
+  """Wraps an optimizer with loss scaling if the compute dtype is float16.
+
+  Gradients of float16 activations can underflow to zero. The loss scale
+  optimizer multiplies the loss by the loss scale before computing gradients,
+  and divides the gradients by the loss scale before applying them. bfloat16 has
+  the same exponent range as float32 and does not need loss scaling.
+
+  Args:
+    optimizer: Instance of tf.train.Optimizer.
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    The optimizer, possibly wrapped in a MixedPrecisionLossScaleOptimizer.
+  """
+  if compute_dtype(hparams) != "float16":
+    return optimizer
+  return tf.train.experimental.MixedPrecisionLossScaleOptimizer(
+      optimizer, loss_scale=hparams.get("loss_scale") or "dynamic")
+
+
+def configure_session(session_config, hparams):
+  """Enables XLA auto-clustering in a session config, if enabled in hparams.
+
+  Args:
+    session_config: tf.ConfigProto or None.
+    hparams: ConfigDict of model hyperparameters.
+
+  Returns:
+    session_config, or a copy with XLA auto-clustering enabled if
+    hparams.xla_auto_clustering is True.
+  """
+  if not hparams.get("xla_auto_clustering"):
+    return session_config
+
+  config = tf.ConfigProto()
+  if session_config is not None:
+    config.CopyFrom(session_config)
+  config.graph_options.optimizer_options.global_jit_level = (
+      tf.OptimizerOptions.ON_1)
+  return config
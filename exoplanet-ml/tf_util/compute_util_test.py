@@ -0,0 +1,97 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for compute_util.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_util import compute_util
+from tf_util import configdict
+
+
+class ComputeUtilTest(tf.test.TestCase):
+
+  def testComputeDtype(self):
+    self.assertEqual("float32",
+                     compute_util.compute_dtype(configdict.ConfigDict({})))
+    self.assertEqual(
+        "bfloat16",
+        compute_util.compute_dtype(
+            configdict.ConfigDict({"compute_dtype": "bfloat16"})))
+    with self.assertRaises(ValueError):
+      compute_util.compute_dtype(
+          configdict.ConfigDict({"compute_dtype": "float64"}))
+
+  def testLayerDtype(self):
+    self.assertIsNone(
+        compute_util.layer_dtype(configdict.ConfigDict({})))
+    policy = compute_util.layer_dtype(
+        configdict.ConfigDict({"compute_dtype": "float16"}))
+    self.assertEqual("mixed_float16", policy.name)
+
+  def testCastToComputeDtype(self):
+    with tf.Graph().as_default():
+      x = tf.constant([1.0, 2.0])
+      self.assertIs(
+          x,
+          compute_util.cast_to_compute_dtype(x, configdict.ConfigDict({})))
+      y = compute_util.cast_to_compute_dtype(
+          x, configdict.ConfigDict({"compute_dtype": "bfloat16"}))
+      self.assertEqual(tf.bfloat16, y.dtype)
+
+  def testJitScope(self):
+    with tf.Graph().as_default():
+      with compute_util.jit_scope(configdict.ConfigDict({})):
+        a = tf.constant(1.0)
+      with compute_util.jit_scope(
+          configdict.ConfigDict({"xla_jit_scope": True})):
+        b = tf.constant(1.0)
+      self.assertNotIn("_XlaCompile", a.op.node_def.attr)
+      self.assertTrue(b.op.get_attr("_XlaCompile"))
+
+  def testMaybeApplyLossScaling(self):
+    optimizer = tf.train.GradientDescentOptimizer(0.1)
+    self.assertIs(
+        optimizer,
+        compute_util.maybe_apply_loss_scaling(
+            optimizer, configdict.ConfigDict({"compute_dtype": "bfloat16"})))
+    self.assertIsInstance(
+        compute_util.maybe_apply_loss_scaling(
+            optimizer, configdict.ConfigDict({"compute_dtype": "float16"})),
+        tf.train.experimental.MixedPrecisionLossScaleOptimizer)
+
+  def testConfigureSession(self):
+    session_config = tf.ConfigProto(allow_soft_placement=True)
+    self.assertIs(
+        session_config,
+        compute_util.configure_session(session_config,
+                                       configdict.ConfigDict({})))
+
+    config = compute_util.configure_session(
+        session_config, configdict.ConfigDict({"xla_auto_clustering": True}))
+    self.assertTrue(config.allow_soft_placement)
+    self.assertEqual(tf.OptimizerOptions.ON_1,
+                     config.graph_options.optimizer_options.global_jit_level)
+    # The original config is not modified.
+    self.assertEqual(
+        tf.OptimizerOptions.DEFAULT,
+        session_config.graph_options.optimizer_options.global_jit_level)
+
+
+if __name__ == "__main__":
+  tf.test.main()
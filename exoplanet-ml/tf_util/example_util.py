@@ -20,6 +20,21 @@ from __future__ import print_function
 
 import numpy as np
 
+# Little-endian float32, the wire format of packed `float` fields.
+_FLOAT32_LE = np.dtype("<f4")
+
+# Encodings of 2D float arrays stored as a single bytes value; see
+# set_quantized_array_feature().
+#   float16: Little-endian float16 values.
+#   int8: Little-endian float32 scale of each channel, followed by the int8
+#     values. Each value is approximately its int8 value times the scale.
+QUANTIZED_ENCODINGS = ("float16", "int8")
+_FLOAT16_LE = np.dtype("<f2")
+
+# Tag of field 1 (`value`) with wire type 2 (length-delimited). The `value`
+# fields of FloatList and Int64List are declared [packed = true].
+_PACKED_VALUE_TAG = b"\x0a"
+
 
 def get_feature(ex, name, kind=None, strict=True):
   """Gets a feature value from a tf.train.Example.
@@ -69,6 +84,115 @@ def get_int64_feature(ex, name, strict=True):
   return get_feature(ex, name, "int64_list", strict)
 
 
+def _encode_varint(n):
+  """Encodes a non-negative integer as a protocol buffer varint."""
+  out = bytearray()
+  while True:
+    bits = n & 0x7f
+    n >>= 7
+    if n:
+      out.append(bits | 0x80)
+    else:
+      out.append(bits)
+      return bytes(out)
+
+
+def _decode_varint(buf, pos):
+  """Decodes a protocol buffer varint starting at buf[pos].
+
+  Returns:
+    (value, pos): The decoded integer and the index of the next byte.
+  """
+  value = 0
+  shift = 0
+  while True:
+    b = buf[pos]
+    pos += 1
+    value |= (b & 0x7f) << shift
+    if not b & 0x80:
+      return value, pos
+    shift += 7
+
+
+def get_float_array_feature(ex, name, strict=True):
+  """Gets the value of a float feature from a tf.train.Example.
+
+  Unlike get_float_feature(), the values are decoded directly from the packed
+  wire format of the FloatList, without creating a Python float per value.
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to look up.
+    strict: Whether to raise a KeyError if there is no such feature.
+
+  Returns:
+    A 1D float32 numpy array containing the values of the specified feature.
+
+  Raises:
+    KeyError: If there is no feature with the specified name.
+    TypeError: If the feature is not a float feature.
+  """
+  if name not in ex.features.feature:
+    if strict:
+      raise KeyError(name)
+    return np.array([], dtype=np.float32)
+
+  feature = ex.features.feature[name]
+  kind = feature.WhichOneof("kind")
+  if not kind:
+    return np.array([], dtype=np.float32)  # Feature exists, but it's empty.
+
+  if kind != "float_list":
+    raise TypeError("Requested float_list, but Feature has {}".format(kind))
+
+  serialized = feature.float_list.SerializeToString()
+  if not serialized:
+    return np.array([], dtype=np.float32)
+
+  # Skip the tag and the length prefix of the packed values.
+  _, offset = _decode_varint(serialized, len(_PACKED_VALUE_TAG))
+  return np.frombuffer(
+      serialized, dtype=_FLOAT32_LE, offset=offset).astype(np.float32)
+
+
+def _get_single_bytes_value(ex, name, strict):
+  """Gets the single value of a bytes feature, or b"" if there is none.
+
+  Unlike get_bytes_feature(), the value is not converted to a numpy array, which
+  would strip trailing zero bytes.
+  """
+  get_bytes_feature(ex, name, strict)  # Checks the name and kind.
+  if name not in ex.features.feature:
+    return b""
+  values = ex.features.feature[name].bytes_list.value
+  if len(values) > 1:
+    raise ValueError("Expected a single bytes value in feature {}, got {}"
+                     .format(name, len(values)))
+  return values[0] if values else b""
+
+
+def get_raw_float_feature(ex, name, strict=True):
+  """Gets the value of a float array stored as raw bytes in a tf.train.Example.
+
+  See set_raw_float_feature().
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to look up.
+    strict: Whether to raise a KeyError if there is no such feature.
+
+  Returns:
+    A 1D float32 numpy array.
+
+  Raises:
+    KeyError: If there is no feature with the specified name.
+    TypeError: If the feature is not a bytes feature.
+    ValueError: If the feature contains more than one value.
+  """
+  data = _get_single_bytes_value(ex, name, strict)
+  return np.frombuffer(data, dtype=_FLOAT32_LE).astype(np.float32)
+
+
 def _infer_kind(value):
   """Infers the tf.train.Feature kind from a value."""
   if np.issubdtype(type(value[0]), np.integer):
@@ -80,6 +204,17 @@ def _infer_kind(value):
     return "bytes_list"
 
 
+def _check_overwrite(ex, name, allow_overwrite):
+  """Deletes an existing feature, or raises if overwriting is not allowed."""
+  if name in ex.features.feature:
+    if allow_overwrite:
+      del ex.features.feature[name]
+    else:
+      raise ValueError(
+          "Attempting to overwrite feature with name: {}. "
+          "Set allow_overwrite=True if this is desired.".format(name))
+
+
 def set_feature(ex,
                 name,
                 value,
@@ -101,13 +236,7 @@ def set_feature(ex,
     ValueError: If `allow_overwrite` is False and the feature already exists, or
         if `kind` is unrecognized.
   """
-  if name in ex.features.feature:
-    if allow_overwrite:
-      del ex.features.feature[name]
-    else:
-      raise ValueError(
-          "Attempting to overwrite feature with name: {}. "
-          "Set allow_overwrite=True if this is desired.".format(name))
+  _check_overwrite(ex, name, allow_overwrite)
 
   if not kind:
     kind = _infer_kind(value)
@@ -141,3 +270,161 @@ def set_bytes_feature(ex,
 def set_int64_feature(ex, name, value, allow_overwrite=False):
   """Sets the value of an int64 feature in a tf.train.Example."""
   set_feature(ex, name, value, "int64_list", allow_overwrite)
+
+
+def set_float_array_feature(ex, name, value, allow_overwrite=False):
+  """Sets the value of a float feature in a tf.train.Example from an array.
+
+  Unlike set_float_feature(), the values are converted to float32 in a single
+  numpy operation and merged into the Example in the packed wire format,
+  without creating a Python float per value. The stored values are identical.
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to set.
+    value: Array-like of values. Will be flattened.
+    allow_overwrite: Whether to overwrite the existing value of the feature.
+
+  Raises:
+    ValueError: If `allow_overwrite` is False and the feature already exists.
+  """
+  _check_overwrite(ex, name, allow_overwrite)
+
+  data = np.ascontiguousarray(value, dtype=_FLOAT32_LE).ravel().tobytes()
+  float_list = ex.features.feature[name].float_list
+  if data:
+    float_list.MergeFromString(_PACKED_VALUE_TAG + _encode_varint(len(data)) +
+                               data)
+  else:
+    float_list.SetInParent()
+
+
+def set_int64_array_feature(ex, name, value, allow_overwrite=False):
+  """Sets the value of an int64 feature in a tf.train.Example from an array.
+
+  Unlike set_int64_feature(), the values are converted to Python integers in a
+  single numpy operation rather than one at a time.
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to set.
+    value: Array-like of values. Will be flattened.
+    allow_overwrite: Whether to overwrite the existing value of the feature.
+
+  Raises:
+    ValueError: If `allow_overwrite` is False and the feature already exists.
+  """
+  _check_overwrite(ex, name, allow_overwrite)
+
+  int64_list = ex.features.feature[name].int64_list
+  int64_list.SetInParent()
+  int64_list.value.extend(np.asarray(value, dtype=np.int64).ravel().tolist())
+
+
+def set_raw_float_feature(ex, name, value, allow_overwrite=False):
+  """Sets a float array as a single raw bytes value in a tf.train.Example.
+
+  The values are stored as little-endian float32, which can be decoded in a
+  TensorFlow input pipeline with tf.io.decode_raw(..., tf.float32).
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to set.
+    value: Array-like of values. Will be flattened.
+    allow_overwrite: Whether to overwrite the existing value of the feature.
+
+  Raises:
+    ValueError: If `allow_overwrite` is False and the feature already exists.
+  """
+  _check_overwrite(ex, name, allow_overwrite)
+
+  data = np.ascontiguousarray(value, dtype=_FLOAT32_LE).ravel().tobytes()
+  ex.features.feature[name].bytes_list.value.append(data)
+
+
+def set_quantized_array_feature(ex,
+                                name,
+                                value,
+                                encoding,
+                                allow_overwrite=False):
+  """Sets a 2D float array as a single reduced-precision bytes value.
+
+  The array has shape [length, num_channels] and is stored in row-major order,
+  so it can be decoded in a TensorFlow input pipeline into a Tensor of shape
+  [length, num_channels] with tf.io.decode_raw() and a single reshape. With the
+  "int8" encoding, each channel is scaled so that its maximum absolute value
+  maps to 127.
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to set.
+    value: Array-like of shape [length, num_channels].
+    encoding: One of QUANTIZED_ENCODINGS.
+    allow_overwrite: Whether to overwrite the existing value of the feature.
+
+  Raises:
+    ValueError: If `allow_overwrite` is False and the feature already exists, if
+        the value is not 2D or contains values that are not finite in the
+        encoding, or if `encoding` is unrecognized.
+  """
+  value = np.asarray(value, dtype=np.float32)
+  if value.ndim != 2:
+    raise ValueError("Expected a 2D array for feature {}, got shape {}".format(
+        name, value.shape))
+
+  if encoding == "float16":
+    with np.errstate(over="ignore"):  # Overflow is checked below.
+      encoded = value.astype(_FLOAT16_LE)
+    if not np.all(np.isfinite(encoded)):
+      raise ValueError(
+          "Feature {} has values that are not finite in float16".format(name))
+    data = np.ascontiguousarray(encoded).tobytes()
+  elif encoding == "int8":
+    if not np.all(np.isfinite(value)):
+      raise ValueError("Feature {} has values that are not finite".format(name))
+    max_abs = np.max(np.abs(value), axis=0) if value.size else np.zeros(
+        value.shape[1], np.float32)
+    # Channels that are all zero get scale 1, so they decode to exactly zero.
+    scale = np.where(max_abs > 0, max_abs / 127, 1).astype(_FLOAT32_LE)
+    quantized = np.clip(np.round(value / scale), -127, 127).astype(np.int8)
+    data = scale.tobytes() + np.ascontiguousarray(quantized).tobytes()
+  else:
+    raise ValueError("Unrecognized encoding: {}".format(encoding))
+
+  _check_overwrite(ex, name, allow_overwrite)
+  ex.features.feature[name].bytes_list.value.append(data)
+
+
+def get_quantized_array_feature(ex, name, encoding, num_channels, strict=True):
+  """Gets a 2D float array stored by set_quantized_array_feature().
+
+  Args:
+    ex: A tf.train.Example.
+    name: Name of the feature to look up.
+    encoding: One of QUANTIZED_ENCODINGS.
+    num_channels: Number of channels of the stored array.
+    strict: Whether to raise a KeyError if there is no such feature.
+
+  Returns:
+    A float32 numpy array of shape [length, num_channels].
+
+  Raises:
+    KeyError: If there is no feature with the specified name.
+    TypeError: If the feature is not a bytes feature.
+    ValueError: If the feature contains more than one value, or if
+        `encoding` is unrecognized.
+  """
+  data = _get_single_bytes_value(ex, name, strict)
+  if not data:
+    return np.zeros([0, num_channels], dtype=np.float32)
+
+  if encoding == "float16":
+    decoded = np.frombuffer(data, dtype=_FLOAT16_LE).astype(np.float32)
+  elif encoding == "int8":
+    scale_size = _FLOAT32_LE.itemsize * num_channels
+    scale = np.frombuffer(data[:scale_size], dtype=_FLOAT32_LE)
+    quantized = np.frombuffer(data[scale_size:], dtype=np.int8)
+    decoded = np.reshape(quantized, [-1, num_channels]) * scale
+  else:
+    raise ValueError("Unrecognized encoding: {}".format(encoding))
+  return np.reshape(decoded, [-1, num_channels]).astype(np.float32)
@@ -0,0 +1,139 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Microbenchmarks for the feature setters and getters in example_util.py.
+
+Compares the per-value setters and getters with the array versions on feature
+sizes that occur in practice: the AstroNet local and global views, and the
+per-channel AstroWaveNet embedding views written by
+beam_prepare_embedding_inputs. The embedding views are also written with the
+reduced-precision encodings of set_quantized_array_feature().
+
+Usage:
+
+  python -m tf_util.example_util_benchmark --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_util import example_util
+
+# Name, number of features and length of each feature.
+_EXAMPLE_SIZES = [
+    ("local_view", 1, 201),
+    ("global_view", 1, 2001),
+    ("local_global_views", 2, 2001),
+    ("embedding_views", 2 * 16, 2001),
+]
+
+
+def _time_fn(fn, min_iters=10, min_secs=1.0):
+  """Returns (iters, wall time per iteration) of calling fn repeatedly."""
+  fn()  # Warm up.
+  iters = 0
+  start = time.time()
+  while iters < min_iters or time.time() - start < min_secs:
+    fn()
+    iters += 1
+  return iters, (time.time() - start) / iters
+
+
+class ExampleUtilBenchmark(tf.test.Benchmark):
+  """Benchmarks for setting and getting float features in tf.train.Example."""
+
+  def _report(self, name, fn):
+    iters, wall_time = _time_fn(fn)
+    self.report_benchmark(iters=iters, wall_time=wall_time, name=name)
+    print("{}: {:.1f} us/example".format(name, wall_time * 1e6))
+
+  def benchmark_set_float_feature(self):
+    for name, num_features, length in _EXAMPLE_SIZES:
+      values = [np.random.normal(size=length) for _ in range(num_features)]
+
+      def set_per_value(values=values):
+        ex = tf.train.Example()
+        for i, value in enumerate(values):
+          example_util.set_float_feature(ex, str(i), value)
+
+      def set_array(values=values):
+        ex = tf.train.Example()
+        for i, value in enumerate(values):
+          example_util.set_float_array_feature(ex, str(i), value)
+
+      self._report("set_float_feature/{}".format(name), set_per_value)
+      self._report("set_float_array_feature/{}".format(name), set_array)
+
+  def benchmark_get_float_feature(self):
+    for name, num_features, length in _EXAMPLE_SIZES:
+      ex = tf.train.Example()
+      for i in range(num_features):
+        example_util.set_float_array_feature(ex, str(i),
+                                             np.random.normal(size=length))
+      # Parse from a string so the Example is laid out as it is when read from
+      # a TFRecord file.
+      ex = tf.train.Example.FromString(ex.SerializeToString())
+      feature_names = [str(i) for i in range(num_features)]
+
+      def get_per_value(ex=ex, feature_names=feature_names):
+        for feature_name in feature_names:
+          example_util.get_float_feature(ex, feature_name).astype(np.float32)
+
+      def get_array(ex=ex, feature_names=feature_names):
+        for feature_name in feature_names:
+          example_util.get_float_array_feature(ex, feature_name)
+
+      self._report("get_float_feature/{}".format(name), get_per_value)
+      self._report("get_float_array_feature/{}".format(name), get_array)
+
+  def benchmark_embedding_encodings(self):
+    # Global and local embedding views with 16 channels each.
+    views = [
+        np.random.normal(size=[2001, 16]),
+        np.random.normal(size=[201, 16]),
+    ]
+
+    def set_float_list():
+      ex = tf.train.Example()
+      for i, view in enumerate(views):
+        for j, channel in enumerate(np.transpose(view)):
+          example_util.set_float_array_feature(ex, "{}_{}".format(i, j),
+                                               channel)
+      return ex
+
+    self._report("set_embedding_views/float_list", set_float_list)
+    print("float_list: {} bytes/example".format(
+        set_float_list().ByteSize()))
+
+    for encoding in example_util.QUANTIZED_ENCODINGS:
+
+      def set_quantized(encoding=encoding):
+        ex = tf.train.Example()
+        for i, view in enumerate(views):
+          example_util.set_quantized_array_feature(ex, str(i), view, encoding)
+        return ex
+
+      self._report("set_embedding_views/{}".format(encoding), set_quantized)
+      print("{}: {} bytes/example".format(encoding,
+                                          set_quantized().ByteSize()))
+
+
+if __name__ == "__main__":
+  tf.test.main()
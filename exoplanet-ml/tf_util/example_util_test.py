@@ -175,6 +175,175 @@ class ExampleUtilTest(tf.test.TestCase):
     np.testing.assert_array_equal(
         ex.features.feature["c3_int64"].int64_list.value, [1234])
 
+  def test_get_float_array_feature(self):
+    float_list = tf.train.FloatList(value=[1.0, 2.5, -3.0])
+    int64_list = tf.train.Int64List(value=[11, 22, 33])
+    ex = tf.train.Example(
+        features=tf.train.Features(
+            feature={
+                "a_float": tf.train.Feature(float_list=float_list),
+                "b_int64": tf.train.Feature(int64_list=int64_list),
+                "c_empty": tf.train.Feature(),
+            }))
+
+    value = example_util.get_float_array_feature(ex, "a_float")
+    self.assertEqual(np.float32, value.dtype)
+    np.testing.assert_array_equal([1.0, 2.5, -3.0], value)
+    value[0] = 100.0  # The returned array should be writable.
+
+    np.testing.assert_array_equal(
+        example_util.get_float_array_feature(ex, "c_empty"), [])
+    with self.assertRaises(TypeError):
+      example_util.get_float_array_feature(ex, "b_int64")
+    with self.assertRaises(KeyError):
+      example_util.get_float_array_feature(ex, "nonexistent")
+    np.testing.assert_array_equal(
+        example_util.get_float_array_feature(
+            ex, "nonexistent", strict=False), [])
+
+    # Long features have a multi-byte length prefix.
+    long_value = np.random.normal(size=3000)
+    example_util.set_float_feature(ex, "d_float", long_value)
+    np.testing.assert_array_equal(
+        ex.features.feature["d_float"].float_list.value,
+        example_util.get_float_array_feature(ex, "d_float"))
+
+  def test_set_array_features(self):
+    ex = tf.train.Example()
+
+    # Float features should be identical to those set by set_float_feature().
+    value = np.random.normal(size=2001)
+    example_util.set_float_feature(ex, "a1_float", value)
+    example_util.set_float_array_feature(ex, "a2_float", value)
+    self.assertEqual(ex.features.feature["a1_float"],
+                     ex.features.feature["a2_float"])
+    example_util.set_float_array_feature(ex, "a3_float", [[1.0, 2.0], [3, 4]])
+    np.testing.assert_array_almost_equal(
+        ex.features.feature["a3_float"].float_list.value, [1.0, 2.0, 3.0, 4.0])
+    example_util.set_float_array_feature(ex, "a4_float", [])
+    self.assertEqual("float_list",
+                     ex.features.feature["a4_float"].WhichOneof("kind"))
+    with self.assertRaises(ValueError):
+      example_util.set_float_array_feature(ex, "a3_float", [1.0])  # Duplicate.
+
+    # Set int64 features.
+    example_util.set_int64_array_feature(ex, "b1_int64",
+                                         np.array([1, 2, 3], dtype=np.int32))
+    example_util.set_int64_array_feature(ex, "b2_int64",
+                                         np.array([True, False, True]))
+    np.testing.assert_array_equal(
+        ex.features.feature["b1_int64"].int64_list.value, [1, 2, 3])
+    np.testing.assert_array_equal(
+        ex.features.feature["b2_int64"].int64_list.value, [1, 0, 1])
+    with self.assertRaises(ValueError):
+      example_util.set_int64_array_feature(ex, "b2_int64", [1])  # Duplicate.
+
+    # Overwrite features.
+    example_util.set_float_array_feature(
+        ex, "a3_float", [1234.0], allow_overwrite=True)
+    np.testing.assert_array_almost_equal(
+        ex.features.feature["a3_float"].float_list.value, [1234.0])
+
+    example_util.set_int64_array_feature(
+        ex, "b2_int64", [1234], allow_overwrite=True)
+    np.testing.assert_array_equal(
+        ex.features.feature["b2_int64"].int64_list.value, [1234])
+
+  def test_raw_float_feature(self):
+    ex = tf.train.Example()
+
+    value = np.random.normal(size=201)
+    example_util.set_raw_float_feature(ex, "a_raw", value)
+    self.assertLen(ex.features.feature["a_raw"].bytes_list.value, 1)
+    self.assertLen(ex.features.feature["a_raw"].bytes_list.value[0], 4 * 201)
+    decoded = example_util.get_raw_float_feature(ex, "a_raw")
+    self.assertEqual(np.float32, decoded.dtype)
+    np.testing.assert_array_equal(value.astype(np.float32), decoded)
+
+    example_util.set_raw_float_feature(ex, "b_raw", [[1, 2], [3, 4]])
+    np.testing.assert_array_equal([1.0, 2.0, 3.0, 4.0],
+                                  example_util.get_raw_float_feature(
+                                      ex, "b_raw"))
+
+    with self.assertRaises(ValueError):
+      example_util.set_raw_float_feature(ex, "b_raw", [1.0])  # Duplicate.
+    example_util.set_raw_float_feature(
+        ex, "b_raw", [1234.0], allow_overwrite=True)
+    np.testing.assert_array_equal([1234.0],
+                                  example_util.get_raw_float_feature(
+                                      ex, "b_raw"))
+
+    example_util.set_float_feature(ex, "c_float", [1.0, 2.0])
+    with self.assertRaises(TypeError):
+      example_util.get_raw_float_feature(ex, "c_float")
+    example_util.set_bytes_feature(ex, "d_bytes", ["a", "b"])
+    with self.assertRaises(ValueError):
+      example_util.get_raw_float_feature(ex, "d_bytes")
+    with self.assertRaises(KeyError):
+      example_util.get_raw_float_feature(ex, "nonexistent")
+    np.testing.assert_array_equal(
+        example_util.get_raw_float_feature(ex, "nonexistent", strict=False), [])
+
+    # Trailing zero bytes are preserved.
+    example_util.set_raw_float_feature(ex, "e_raw", [1.0, 0.0])
+    np.testing.assert_array_equal([1.0, 0.0],
+                                  example_util.get_raw_float_feature(
+                                      ex, "e_raw"))
+
+  def test_quantized_array_feature(self):
+    ex = tf.train.Example()
+
+    # Channels of different magnitudes, including an all-zero channel, and a
+    # trailing zero.
+    value = np.random.normal(size=[201, 4]) * [1, 10, 1000, 0]
+    value[-1] = 0
+
+    example_util.set_quantized_array_feature(ex, "a_float16", value, "float16")
+    self.assertLen(ex.features.feature["a_float16"].bytes_list.value, 1)
+    self.assertLen(ex.features.feature["a_float16"].bytes_list.value[0],
+                   2 * 201 * 4)
+    decoded = example_util.get_quantized_array_feature(ex, "a_float16",
+                                                       "float16", 4)
+    self.assertEqual(np.float32, decoded.dtype)
+    np.testing.assert_array_equal(
+        value.astype(np.float16).astype(np.float32), decoded)
+
+    example_util.set_quantized_array_feature(ex, "b_int8", value, "int8")
+    self.assertLen(ex.features.feature["b_int8"].bytes_list.value[0],
+                   4 * 4 + 201 * 4)
+    decoded = example_util.get_quantized_array_feature(ex, "b_int8", "int8", 4)
+    self.assertEqual(np.float32, decoded.dtype)
+    self.assertEqual((201, 4), decoded.shape)
+    # The error is at most half of the quantization step of each channel.
+    max_error = np.max(np.abs(value), axis=0) / 127 / 2
+    self.assertTrue(np.all(np.abs(decoded - value) <= max_error + 1e-6))
+    np.testing.assert_array_equal(decoded[:, 3], 0)
+    np.testing.assert_array_equal(decoded[-1], 0)
+
+    with self.assertRaises(ValueError):
+      example_util.set_quantized_array_feature(ex, "b_int8", value, "int8")
+    example_util.set_quantized_array_feature(
+        ex, "b_int8", [[1.0, -2.0]], "int8", allow_overwrite=True)
+    np.testing.assert_array_almost_equal([[1.0, -2.0]],
+                                         example_util
+                                         .get_quantized_array_feature(
+                                             ex, "b_int8", "int8", 2))
+
+    with self.assertRaises(ValueError):
+      example_util.set_quantized_array_feature(ex, "c", [1.0, 2.0], "int8")
+    with self.assertRaises(ValueError):
+      example_util.set_quantized_array_feature(ex, "c", [[1e6]], "float16")
+    with self.assertRaises(ValueError):
+      example_util.set_quantized_array_feature(ex, "c", [[np.nan]], "int8")
+    with self.assertRaises(ValueError):
+      example_util.set_quantized_array_feature(ex, "c", [[1.0]], "int4")
+    self.assertNotIn("c", ex.features.feature)
+    with self.assertRaises(KeyError):
+      example_util.get_quantized_array_feature(ex, "c", "int8", 1)
+    self.assertEqual((0, 3),
+                     example_util.get_quantized_array_feature(
+                         ex, "c", "int8", 3, strict=False).shape)
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,163 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""SessionRunHooks for measuring training throughput."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os.path
+import resource
+import time
+
+import numpy as np
+import tensorflow as tf
+
+# Name of the file, in the output directory, to which ThroughputHook appends a
+# JSON object per report.
+THROUGHPUT_LOG_FILE_NAME = "throughput.jsonl"
+
+
+def _host_memory_mb():
+  """Returns the resident memory of this process, in megabytes."""
+  try:
+    # The second field is the resident set size, in pages.
+    with open("/proc/self/statm") as f:
+      rss_pages = int(f.read().split()[1])
+    return rss_pages * resource.getpagesize() / 2**20
+  except (IOError, OSError):
+    # Not Linux. Fall back to the peak resident set size, which macOS reports
+    # in bytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20
+
+
+class ThroughputHook(tf.train.SessionRunHook):
+  """Records step time, input stall time, examples/sec and host memory.
+
+  The time spent waiting for the input pipeline is measured by a timestamp op
+  that runs as soon as every IteratorGetNext op in the graph has produced its
+  outputs. The input stall fraction is the time from the start of a step to
+  that timestamp, divided by the step time. A fraction close to 1 means the
+  training job is input-bound; close to 0 means it is compute-bound.
+
+  Every every_n_steps steps, the statistics of the preceding steps are written
+  as TensorBoard summaries (under "throughput/") and appended as a JSON object
+  to throughput.jsonl in output_dir. The first step of each session is excluded,
+  since it includes one-off initialization.
+  """
+
+  def __init__(self, batch_size, output_dir, every_n_steps=100):
+    """Initializes the hook.
+
+    Args:
+      batch_size: Number of examples per training step.
+      output_dir: Directory for the summaries and the JSON log, e.g. the model
+        directory.
+      every_n_steps: Number of steps between reports.
+    """
+    self._batch_size = batch_size
+    self._output_dir = output_dir
+    self._every_n_steps = every_n_steps
+
+  def begin(self):
+    self._global_step_tensor = tf.train.get_global_step()
+    if self._global_step_tensor is None:
+      raise RuntimeError("ThroughputHook requires a global step.")
+
+    get_next_ops = [
+        op for op in tf.get_default_graph().get_operations()
+        if op.type == "IteratorGetNext"
+    ]
+    self._input_timestamp = None
+    if get_next_ops:
+      with tf.control_dependencies(get_next_ops):
+        self._input_timestamp = tf.timestamp(name="input_timestamp")
+    else:
+      tf.logging.warning(
+          "No IteratorGetNext op found; input stall time will not be reported.")
+
+    self._summary_writer = tf.summary.FileWriterCache.get(self._output_dir)
+    self._log_file = os.path.join(self._output_dir, THROUGHPUT_LOG_FILE_NAME)
+
+  def after_create_session(self, session, coord):
+    self._is_first_step = True
+    self._step_times = []
+    self._input_times = []
+
+  def before_run(self, run_context):
+    self._step_start_time = time.time()
+    fetches = {"global_step": self._global_step_tensor}
+    if self._input_timestamp is not None:
+      fetches["input_timestamp"] = self._input_timestamp
+    return tf.train.SessionRunArgs(fetches)
+
+  def after_run(self, run_context, run_values):
+    step_end_time = time.time()
+    if self._is_first_step:
+      self._is_first_step = False
+      return
+
+    self._step_times.append(step_end_time - self._step_start_time)
+    if "input_timestamp" in run_values.results:
+      # tf.timestamp() and time.time() both return seconds since the epoch.
+      self._input_times.append(
+          max(0, run_values.results["input_timestamp"] - self._step_start_time))
+
+    if len(self._step_times) >= self._every_n_steps:
+      self._report(run_values.results["global_step"])
+
+  def end(self, session):
+    if self._step_times:
+      self._report(session.run(self._global_step_tensor))
+
+  def _report(self, global_step):
+    """Writes the statistics of the steps since the last report."""
+    step_times = np.array(self._step_times)
+    values = {
+        "global_step": int(global_step),
+        "num_steps": len(step_times),
+        "step_time_ms": 1000 * np.mean(step_times),
+        "step_time_p50_ms": 1000 * np.percentile(step_times, 50),
+        "step_time_p90_ms": 1000 * np.percentile(step_times, 90),
+        "examples_per_sec": self._batch_size * len(step_times) /
+                            np.sum(step_times),
+        "host_memory_mb": _host_memory_mb(),
+    }
+    if self._input_times:
+      values["input_time_ms"] = 1000 * np.mean(self._input_times)
+      values["input_stall_fraction"] = (
+          np.sum(self._input_times) / np.sum(step_times))
+    self._step_times = []
+    self._input_times = []
+
+    summary = tf.Summary(value=[
+        tf.Summary.Value(tag="throughput/{}".format(name), simple_value=value)
+        for name, value in sorted(values.items())
+        if name not in ["global_step", "num_steps"]
+    ])
+    self._summary_writer.add_summary(summary, global_step)
+
+    values["timestamp"] = time.time()
+    with tf.gfile.Open(self._log_file, "a") as f:
+      f.write(json.dumps(values, sort_keys=True) + "\n")
+
+    tf.logging.info(
+        "Step %d: %.1f examples/sec, %.1f ms/step, input stall %s, host memory "
+        "%.0f MB", global_step, values["examples_per_sec"],
+        values["step_time_ms"],
+        "{:.1%}".format(values["input_stall_fraction"])
+        if "input_stall_fraction" in values else "n/a",
+        values["host_memory_mb"])
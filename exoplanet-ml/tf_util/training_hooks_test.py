@@ -0,0 +1,65 @@
+# Copyright 2018 The Exoplanet ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for training_hooks.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os.path
+
+import tensorflow as tf
+
+from tf_util import training_hooks
+
+
+class ThroughputHookTest(tf.test.TestCase):
+
+  def _train(self, hook, num_steps):
+    with tf.Graph().as_default():
+      global_step = tf.train.get_or_create_global_step()
+      dataset = tf.data.Dataset.range(1000).batch(4)
+      batch = dataset.make_one_shot_iterator().get_next()
+      train_op = tf.group(
+          tf.reduce_sum(batch), tf.assign_add(global_step, 1))
+      with tf.train.MonitoredSession(hooks=[hook]) as sess:
+        for _ in range(num_steps):
+          sess.run(train_op)
+
+  def testReport(self):
+    output_dir = self.get_temp_dir()
+    hook = training_hooks.ThroughputHook(
+        batch_size=4, output_dir=output_dir, every_n_steps=3)
+
+    # The first step is excluded. Steps 2-4 and 5-7 are reported every 3 steps,
+    # and step 8 is reported at the end of the session.
+    self._train(hook, num_steps=8)
+
+    log_file = os.path.join(output_dir, training_hooks.THROUGHPUT_LOG_FILE_NAME)
+    with tf.gfile.Open(log_file) as f:
+      reports = [json.loads(line) for line in f]
+
+    self.assertEqual([4, 7, 8], [report["global_step"] for report in reports])
+    self.assertEqual([3, 3, 1], [report["num_steps"] for report in reports])
+    for report in reports:
+      self.assertGreater(report["examples_per_sec"], 0)
+      self.assertGreater(report["step_time_ms"], 0)
+      self.assertGreater(report["host_memory_mb"], 0)
+      self.assertBetween(report["input_stall_fraction"], 0, 1)
+
+
+if __name__ == "__main__":
+  tf.test.main()